@@ -1,5 +1,5 @@
 # Import all routes
-from . import root, enhance, prompts, history
+from . import root, enhance, prompts, history, debug
 
 # Export all routers
-__all__ = ["root", "enhance", "prompts", "history"]
+__all__ = ["root", "enhance", "prompts", "history", "debug"]
@@ -0,0 +1,52 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+import logging
+from ...utils.caching import cache_registry
+from ...services.rule_engine import rule_engine
+from ..deps import CurrentUser
+
+# Logger for debug routes
+logger = logging.getLogger("routes.debug")
+
+# Create router
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    responses={
+        401: {"description": "Unauthorized"},
+    },
+)
+
+@router.get("/caches", response_model=Dict[str, Any])
+async def get_caches(
+    user_id: CurrentUser,
+) -> Dict[str, Any]:
+    """
+    Get counters of every registered cache
+    
+    Args:
+        user_id: Current user ID
+    
+    Returns:
+        Cache stats keyed by cache name
+    """
+    logger.debug(f"Cache stats requested by user {user_id}")
+    
+    return {"caches": cache_registry.stats()}
+
+@router.get("/rules", response_model=Dict[str, Any])
+async def get_rules(
+    user_id: CurrentUser,
+) -> Dict[str, Any]:
+    """
+    Get per-rule hit counts and timings of the enhancement rule engine
+    
+    Args:
+        user_id: Current user ID
+    
+    Returns:
+        Rule engine stats
+    """
+    logger.debug(f"Rule stats requested by user {user_id}")
+    
+    return {"rules": rule_engine.stats()}
@@ -1,7 +1,18 @@
-from fastapi import APIRouter, Response, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, Response, Depends, Request, HTTPException, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, AsyncIterator
+import codecs
 import logging
-from ...models.prompt import PromptRequest, PromptResponse
+import tempfile
+from ...config.settings import settings
+from ...core import deadline
+from ...models.prompt import (
+    PromptRequest,
+    PromptResponse,
+    BatchEnhanceRequest,
+    BatchEnhanceItem,
+    BatchEnhanceResponse,
+)
 from ..deps import CurrentUser, EnhanceService
 
 # Logger for enhance routes
@@ -27,6 +38,9 @@ async def enhance_prompt(
     """
     Enhance a prompt using AI techniques
     
+    Prompts are limited to ENHANCE_MAX_PROMPT_CHARS characters, since the
+    whole request is parsed in memory; larger ones go to /enhance/stream.
+    
     Args:
         prompt: Prompt request with text to enhance
         response: FastAPI response object
@@ -51,4 +65,98 @@ async def enhance_prompt(
     except Exception as e:
         logger.error(f"Error enhancing prompt: {str(e)}")
         # In case of error, return the original text
+        deadline.mark_degraded("unenhanced")
         return PromptResponse(enhancedText=prompt.text)
+
+@router.post("/batch", response_model=BatchEnhanceResponse)
+async def enhance_batch(
+    batch: BatchEnhanceRequest,
+    user_id: CurrentUser,
+    enhance_service: EnhanceService,
+) -> BatchEnhanceResponse:
+    """
+    Enhance several prompts in one request
+    
+    Args:
+        batch: Batch request with the texts to enhance
+        user_id: Current user ID
+        enhance_service: Enhance service
+    
+    Returns:
+        Enhanced text or error for every input text, in input order
+    """
+    logger.info(f"Enhancing batch of {len(batch.texts)} prompts for user {user_id}")
+    
+    outcomes = await enhance_service.enhance_batch(batch.texts, user_id)
+    
+    return BatchEnhanceResponse(
+        results=[BatchEnhanceItem(enhancedText=enhanced, error=error) for enhanced, error in outcomes]
+    )
+
+@router.post("/stream")
+async def enhance_stream(
+    request: Request,
+    user_id: CurrentUser,
+    enhance_service: EnhanceService,
+) -> StreamingResponse:
+    """
+    Enhance a prompt sent as a raw text body, streaming the result back
+    
+    The body is spooled to a temporary file (on disk beyond one chunk) while it
+    is received and then enhanced and sent back chunk by chunk, so memory use
+    does not grow with the prompt size. Bodies over ENHANCE_STREAM_MAX_BYTES
+    are rejected.
+    
+    Args:
+        request: Request with the prompt text as its body
+        user_id: Current user ID
+        enhance_service: Enhance service
+    
+    Returns:
+        Enhanced prompt text as a chunked text/plain response
+    """
+    max_bytes = settings.ENHANCE_STREAM_MAX_BYTES
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Prompt larger than {max_bytes} bytes",
+        )
+    
+    logger.info(f"Streaming prompt enhancement for user {user_id}")
+    
+    # The body must be read before the response starts: a streaming response
+    # listens for the client disconnecting and would consume the body messages
+    chunk_size = settings.ENHANCE_STREAM_CHUNK_SIZE
+    spool = tempfile.SpooledTemporaryFile(max_size=chunk_size)
+    received = 0
+    try:
+        async for data in request.stream():
+            received += len(data)
+            if received > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Prompt larger than {max_bytes} bytes",
+                )
+            spool.write(data)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    
+    async def body_chunks() -> AsyncIterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            while True:
+                data = spool.read(chunk_size)
+                if not data:
+                    break
+                yield decoder.decode(data)
+            yield decoder.decode(b"", final=True)
+        finally:
+            spool.close()
+    
+    return StreamingResponse(
+        enhance_service.enhance_stream(body_chunks(), user_id),
+        media_type="text/plain; charset=utf-8",
+    )
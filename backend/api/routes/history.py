@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Query, Path
+from fastapi import APIRouter, HTTPException, status, Query, Path, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 import logging
-from ...models.history import HistoryEntry, HistoryResponse
-from ...core.exceptions import NotFoundException
+from ...models.history import HistoryEntry, HistoryResponse, HistoryClearStatus, HistoryLookupRequest
+from ...core.exceptions import NotFoundException, DeadlineExceededException
+from ...core.conditional import check_etag, check_last_modified
 from ..deps import CurrentUser, HistoryService
 
 # Logger for history routes
@@ -20,30 +24,78 @@ router = APIRouter(
 
 @router.get("", response_model=HistoryResponse)
 async def get_history(
+    request: Request,
+    response: Response,
     user_id: CurrentUser,
     history_service: HistoryService,
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    start: Optional[datetime] = Query(None, alias="from", description="Only entries created at or after this time"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only entries created before this time"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
 ) -> HistoryResponse:
     """
-    Get history entries for the current user
+    Get history entries for the current user, newest first
+    
+    Pages are linked by next_cursor, which is null on the last page. offset
+    paging reads every skipped entry and is kept for existing clients only;
+    such responses carry a Deprecation header.
+    
+    Answers 304 Not Modified without reading history if If-None-Match
+    matches the ETag of the user's current history.
     
     Args:
+        request: Incoming request
+        response: Outgoing response
         user_id: Current user ID
         history_service: History service
         limit: Maximum number of entries to return
-        offset: Number of entries to skip
+        cursor: Cursor of the page to return
+        start: Lower bound of created_at, inclusive
+        end: Upper bound of created_at, exclusive
+        offset: Number of entries to skip (deprecated)
     
     Returns:
-        List of history entries
+        Page of history entries and the cursor of the next page
     """
+    if offset and (cursor or start or end):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="offset cannot be combined with cursor, from or to",
+        )
+    
     try:
         logger.info(f"Getting history for user {user_id}")
         
+        # Read the version before the entries so a concurrent write changes the next ETag
+        version = history_service.get_collection_version(user_id)
+        not_modified = check_etag(request, response, version, limit, offset, cursor, start, end)
+        if not_modified:
+            return not_modified
+        
+        if offset:
+            logger.warning(f"Deprecated offset paging of history for user {user_id} (offset {offset})")
+            response.headers["Deprecation"] = "true"
+            entries = await history_service.get_history(user_id, limit, offset)
+            return HistoryResponse(history=entries)
+        
         # Get history from service
-        entries = await history_service.get_history(user_id, limit, offset)
+        entries, next_cursor = await history_service.get_history_page(user_id, limit, cursor, start, end)
         
-        return HistoryResponse(history=entries)
+        return HistoryResponse(history=entries, next_cursor=next_cursor)
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
     
     except Exception as e:
         logger.error(f"Error getting history: {str(e)}")
@@ -52,8 +104,48 @@ async def get_history(
             detail=f"Error getting history: {str(e)}",
         )
 
+@router.post("/lookup", response_model=HistoryResponse)
+async def lookup_history(
+    lookup: HistoryLookupRequest,
+    user_id: CurrentUser,
+    history_service: HistoryService,
+) -> HistoryResponse:
+    """
+    Get history entries by ID with one batched read
+    
+    Args:
+        lookup: IDs of the entries
+        user_id: Current user ID
+        history_service: History service
+    
+    Returns:
+        Entries in the order of the IDs, and the IDs that do not exist in missing_ids
+    """
+    try:
+        logger.info(f"Looking up {len(lookup.ids)} history entries for user {user_id}")
+        
+        entries, missing_ids = await history_service.get_history_entries(user_id, lookup.ids)
+        
+        return HistoryResponse(history=entries, missing_ids=missing_ids)
+    
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
+    except Exception as e:
+        logger.error(f"Error looking up history entries: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error looking up history entries: {str(e)}",
+        )
+
 @router.get("/recent", response_model=HistoryResponse)
 async def get_recent_history(
+    request: Request,
+    response: Response,
     user_id: CurrentUser,
     history_service: HistoryService,
     limit: int = Query(10, ge=1, le=50),
@@ -62,6 +154,8 @@ async def get_recent_history(
     Get recent history entries for the current user
     
     Args:
+        request: Incoming request
+        response: Outgoing response
         user_id: Current user ID
         history_service: History service
         limit: Maximum number of entries to return
@@ -72,11 +166,23 @@ async def get_recent_history(
     try:
         logger.info(f"Getting recent history for user {user_id}")
         
+        version = history_service.get_collection_version(user_id)
+        not_modified = check_etag(request, response, version, limit)
+        if not_modified:
+            return not_modified
+        
         # Get recent history from service
         entries = await history_service.get_recent_history(user_id, limit)
         
         return HistoryResponse(history=entries)
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error getting recent history: {str(e)}")
         raise HTTPException(
@@ -84,8 +190,33 @@ async def get_recent_history(
             detail=f"Error getting recent history: {str(e)}",
         )
 
+@router.get("/clear", response_model=HistoryClearStatus)
+async def get_clear_status(
+    user_id: CurrentUser,
+    history_service: HistoryService,
+) -> HistoryClearStatus:
+    """
+    Get the progress of the current user's latest history clear
+    
+    Args:
+        user_id: Current user ID
+        history_service: History service
+    
+    Returns:
+        Progress of the clear
+    """
+    progress = history_service.get_clear_progress(user_id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No history clear has run",
+        )
+    return HistoryClearStatus(**progress.to_dict())
+
 @router.get("/{entry_id}", response_model=HistoryEntry)
 async def get_history_entry(
+    request: Request,
+    response: Response,
     entry_id: str = Path(..., title="History entry ID"),
     user_id: CurrentUser = None,
     history_service: HistoryService = None,
@@ -93,7 +224,11 @@ async def get_history_entry(
     """
     Get a history entry by ID
     
+    Supports If-None-Match and If-Modified-Since (based on updated_at).
+    
     Args:
+        request: Incoming request
+        response: Outgoing response
         entry_id: History entry ID
         user_id: Current user ID
         history_service: History service
@@ -104,6 +239,11 @@ async def get_history_entry(
     try:
         logger.info(f"Getting history entry {entry_id} for user {user_id}")
         
+        version = history_service.get_history_entry_version(user_id, entry_id)
+        not_modified = check_etag(request, response, version)
+        if not_modified:
+            return not_modified
+        
         # Get history entry from service
         entry = await history_service.get_history_entry(user_id, entry_id)
         
@@ -111,6 +251,10 @@ async def get_history_entry(
             logger.error(f"History entry {entry_id} not found for user {user_id}")
             raise NotFoundException(f"History entry with ID {entry_id} not found")
         
+        not_modified = check_last_modified(request, response, entry.updated_at or entry.timestamp)
+        if not_modified:
+            return not_modified
+        
         return entry
     
     except NotFoundException as e:
@@ -119,6 +263,13 @@ async def get_history_entry(
             detail=str(e),
         )
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error getting history entry {entry_id}: {str(e)}")
         raise HTTPException(
@@ -153,6 +304,13 @@ async def delete_history_entry(
             detail=str(e),
         )
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error deleting history entry {entry_id}: {str(e)}")
         raise HTTPException(
@@ -160,23 +318,48 @@ async def delete_history_entry(
             detail=f"Error deleting history entry: {str(e)}",
         )
 
-@router.delete("", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={202: {"model": HistoryClearStatus, "description": "Clearing continues in the background"}},
+)
 async def clear_history(
     user_id: CurrentUser,
     history_service: HistoryService,
-) -> None:
+) -> Response:
     """
     Clear all history entries for the current user
     
+    Large histories are deleted in batches; if the request runs out of time
+    the clear continues in the background and 202 Accepted is returned with
+    its progress, which GET /history/clear reports until it is done.
+    
     Args:
         user_id: Current user ID
         history_service: History service
+    
+    Returns:
+        204 No Content once cleared, otherwise 202 with the progress so far
     """
     try:
         logger.info(f"Clearing history for user {user_id}")
         
         # Clear history
-        await history_service.clear_history(user_id)
+        progress = await history_service.clear_history(user_id)
+        
+        if progress.done:
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(HistoryClearStatus(**progress.to_dict())),
+        )
+    
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
     
     except Exception as e:
         logger.error(f"Error clearing history: {str(e)}")
@@ -187,6 +370,8 @@ async def clear_history(
 
 @router.get("/search/{query}", response_model=HistoryResponse)
 async def search_history(
+    request: Request,
+    response: Response,
     query: str = Path(..., title="Search query"),
     user_id: CurrentUser = None,
     history_service: HistoryService = None,
@@ -195,6 +380,8 @@ async def search_history(
     Search history entries by text
     
     Args:
+        request: Incoming request
+        response: Outgoing response
         query: Search query
         user_id: Current user ID
         history_service: History service
@@ -205,11 +392,23 @@ async def search_history(
     try:
         logger.info(f"Searching history for user {user_id} with query '{query}'")
         
+        version = history_service.get_collection_version(user_id)
+        not_modified = check_etag(request, response, version)
+        if not_modified:
+            return not_modified
+        
         # Search history
         entries = await history_service.search_history(user_id, query)
         
         return HistoryResponse(history=entries)
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error searching history with query '{query}': {str(e)}")
         raise HTTPException(
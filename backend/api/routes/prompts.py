@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Query, Path, Body
+from fastapi import APIRouter, HTTPException, status, Query, Path, Body, Request, Response
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 import logging
-from ...models.prompt import Prompt
-from ...core.exceptions import NotFoundException
+from ...models.prompt import Prompt, PromptListResponse
+from ...core.exceptions import NotFoundException, DeadlineExceededException
+from ...core.conditional import check_etag, check_last_modified
+from ...config.settings import settings
 from ..deps import CurrentUser, PromptService
 
 # Logger for prompts routes
@@ -18,32 +21,103 @@ router = APIRouter(
     },
 )
 
-@router.get("", response_model=Dict[str, List[Prompt]])
+@router.get("", response_model=PromptListResponse)
 async def get_prompts(
+    request: Request,
+    response: Response,
     user_id: CurrentUser,
     prompt_service: PromptService,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
-) -> Dict[str, List[Prompt]]:
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    start: Optional[datetime] = Query(None, alias="from", description="Only prompts created at or after this time"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only prompts created before this time"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
+    ids: Optional[str] = Query(None, description="Comma-separated prompt IDs to return instead of a page"),
+) -> PromptListResponse:
     """
-    Get all prompts for the current user
+    Get the current user's prompts, newest first
+    
+    Pages are linked by next_cursor, which is null on the last page. offset
+    paging reads every skipped prompt and is kept for existing clients only;
+    such responses carry a Deprecation header.
+    
+    With ids, the listed prompts are returned in that order with one batched
+    read, and the IDs that do not exist are listed in missing_ids.
+    
+    Answers 304 Not Modified without reading prompts if If-None-Match
+    matches the ETag of the user's current prompt collection.
     
     Args:
+        request: Incoming request
+        response: Outgoing response
         user_id: Current user ID
         prompt_service: Prompt service
         limit: Maximum number of prompts to return
-        offset: Number of prompts to skip
+        cursor: Cursor of the page to return
+        start: Lower bound of created_at, inclusive
+        end: Upper bound of created_at, exclusive
+        offset: Number of prompts to skip (deprecated)
+        ids: Comma-separated prompt IDs
     
     Returns:
-        List of prompts
+        Page of prompts and the cursor of the next page, or the prompts asked for by ID
     """
+    if offset and (cursor or start or end):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="offset cannot be combined with cursor, from or to",
+        )
+    
+    prompt_ids = None
+    if ids is not None:
+        if offset or cursor or start or end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ids cannot be combined with cursor, from, to or offset",
+            )
+        prompt_ids = [prompt_id for prompt_id in (part.strip() for part in ids.split(",")) if prompt_id]
+        if not prompt_ids or len(prompt_ids) > settings.REPOSITORY_GET_MANY_MAX_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"ids must list between 1 and {settings.REPOSITORY_GET_MANY_MAX_IDS} prompt IDs",
+            )
+    
     try:
         logger.info(f"Getting prompts for user {user_id}")
         
+        # Read the version before the prompts so a concurrent write changes the next ETag
+        version = prompt_service.get_collection_version(user_id)
+        not_modified = check_etag(request, response, version, limit, offset, cursor, start, end, ids)
+        if not_modified:
+            return not_modified
+        
+        if prompt_ids:
+            prompts, missing_ids = await prompt_service.get_prompts_by_ids(user_id, prompt_ids)
+            return PromptListResponse(prompts=prompts, missing_ids=missing_ids)
+        
+        if offset:
+            logger.warning(f"Deprecated offset paging of prompts for user {user_id} (offset {offset})")
+            response.headers["Deprecation"] = "true"
+            prompts = await prompt_service.get_all_prompts(user_id, limit, offset)
+            return PromptListResponse(prompts=prompts)
+        
         # Get prompts from service
-        prompts = await prompt_service.get_all_prompts(user_id, limit, offset)
+        prompts, next_cursor = await prompt_service.get_prompts_page(user_id, limit, cursor, start, end)
         
-        return {"prompts": prompts}
+        return PromptListResponse(prompts=prompts, next_cursor=next_cursor)
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
     
     except Exception as e:
         logger.error(f"Error getting prompts: {str(e)}")
@@ -54,6 +128,8 @@ async def get_prompts(
 
 @router.get("/{prompt_id}", response_model=Prompt)
 async def get_prompt(
+    request: Request,
+    response: Response,
     prompt_id: str = Path(..., title="Prompt ID"),
     user_id: CurrentUser = None,
     prompt_service: PromptService = None,
@@ -61,7 +137,11 @@ async def get_prompt(
     """
     Get a prompt by ID
     
+    Supports If-None-Match and If-Modified-Since (based on updated_at).
+    
     Args:
+        request: Incoming request
+        response: Outgoing response
         prompt_id: Prompt ID
         user_id: Current user ID
         prompt_service: Prompt service
@@ -72,6 +152,11 @@ async def get_prompt(
     try:
         logger.info(f"Getting prompt {prompt_id} for user {user_id}")
         
+        version = prompt_service.get_prompt_version(user_id, prompt_id)
+        not_modified = check_etag(request, response, version)
+        if not_modified:
+            return not_modified
+        
         # Get prompt from service
         prompt = await prompt_service.get_prompt(user_id, prompt_id)
         
@@ -79,6 +164,10 @@ async def get_prompt(
             logger.error(f"Prompt {prompt_id} not found for user {user_id}")
             raise NotFoundException(f"Prompt with ID {prompt_id} not found")
         
+        not_modified = check_last_modified(request, response, prompt.updated_at)
+        if not_modified:
+            return not_modified
+        
         return prompt
     
     except NotFoundException as e:
@@ -87,6 +176,13 @@ async def get_prompt(
             detail=str(e),
         )
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error getting prompt {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -119,6 +215,13 @@ async def create_prompt(
         
         return prompt
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error creating prompt: {str(e)}")
         raise HTTPException(
@@ -126,7 +229,7 @@ async def create_prompt(
             detail=f"Error creating prompt: {str(e)}",
         )
 
-@router.put("/{prompt_id}", response_model=Prompt)
+@router.put("/{prompt_id}", response_model=Prompt, response_model_exclude_unset=True)
 async def update_prompt(
     prompt_data: Dict[str, Any] = Body(...),
     prompt_id: str = Path(..., title="Prompt ID"),
@@ -136,6 +239,9 @@ async def update_prompt(
     """
     Update a prompt
     
+    Fields left out of the request keep their stored values and are left
+    out of the response too, which saves reading the prompt back.
+    
     Args:
         prompt_data: Prompt data
         prompt_id: Prompt ID
@@ -160,6 +266,13 @@ async def update_prompt(
             detail=str(e),
         )
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error updating prompt {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -194,6 +307,13 @@ async def delete_prompt(
             detail=str(e),
         )
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error deleting prompt {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -203,6 +323,8 @@ async def delete_prompt(
 
 @router.get("/search/{query}", response_model=Dict[str, List[Prompt]])
 async def search_prompts(
+    request: Request,
+    response: Response,
     query: str = Path(..., title="Search query"),
     user_id: CurrentUser = None,
     prompt_service: PromptService = None,
@@ -211,6 +333,8 @@ async def search_prompts(
     Search prompts by name or description
     
     Args:
+        request: Incoming request
+        response: Outgoing response
         query: Search query
         user_id: Current user ID
         prompt_service: Prompt service
@@ -221,11 +345,23 @@ async def search_prompts(
     try:
         logger.info(f"Searching prompts for user {user_id} with query '{query}'")
         
+        version = prompt_service.get_collection_version(user_id)
+        not_modified = check_etag(request, response, version)
+        if not_modified:
+            return not_modified
+        
         # Search prompts
         prompts = await prompt_service.search_prompts(user_id, query)
         
         return {"prompts": prompts}
     
+    except DeadlineExceededException as e:
+        logger.error(f"Deadline exceeded: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=e.detail,
+        )
+    
     except Exception as e:
         logger.error(f"Error searching prompts with query '{query}': {str(e)}")
         raise HTTPException(
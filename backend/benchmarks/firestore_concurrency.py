@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark: repository throughput with 100 concurrent clients.
+
+Each client reads its own user's prompts through PromptRepository in a
+loop (a listing, then a single document), the way concurrent requests do in
+one worker. Firestore is replaced by an in-memory client whose calls block
+for a simulated RPC latency, like the real synchronous SDK. Calls run either
+inline on the event loop (FIRESTORE_EXECUTOR_WORKERS=0, the old behaviour)
+or in the Firestore executor. A ticker measures how long the event loop is
+stalled.
+
+Usage: python -m backend.benchmarks.firestore_concurrency [--clients 100] [--latency-ms 20] [--duration 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.config.settings import settings
+from backend.repositories import base as repository_base
+from backend.utils.executor import BlockingExecutor
+
+class SimulatedSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+class SimulatedDocument:
+    def __init__(self, client, path: str):
+        self.client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "SimulatedCollection":
+        return SimulatedCollection(self.client, f"{self.path}/{name}")
+
+    def get(self, timeout=None) -> SimulatedSnapshot:
+        self.client.rpc()
+        return SimulatedSnapshot(self, self.client.documents.get(self.path))
+
+class SimulatedCollection:
+    """
+    Collection reference that is also its own query; filters are ignored
+    """
+    def __init__(self, client, path: str, offset: int = 0, limit: int = None):
+        self.client = client
+        self.path = path
+        self._offset = offset
+        self._limit = limit
+
+    def document(self, doc_id: str) -> SimulatedDocument:
+        return SimulatedDocument(self.client, f"{self.path}/{doc_id}")
+
+    def order_by(self, *args, **kwargs) -> "SimulatedCollection":
+        return self
+
+    def offset(self, offset: int) -> "SimulatedCollection":
+        return SimulatedCollection(self.client, self.path, offset, self._limit)
+
+    def limit(self, limit: int) -> "SimulatedCollection":
+        return SimulatedCollection(self.client, self.path, self._offset, limit)
+
+    def stream(self, timeout=None):
+        self.client.rpc()
+        prefix = self.path + "/"
+        paths = [path for path in self.client.documents if path.startswith(prefix) and "/" not in path[len(prefix):]]
+        end = None if self._limit is None else self._offset + self._limit
+        for path in paths[self._offset:end]:
+            yield SimulatedSnapshot(SimulatedDocument(self.client, path), self.client.documents[path])
+
+class SimulatedFirestore:
+    """
+    In-memory Firestore client whose calls block for latency +- jitter seconds
+    """
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.documents = {}
+        self.rpcs = 0
+
+    def rpc(self) -> None:
+        self.rpcs += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def collection(self, name: str) -> SimulatedCollection:
+        return SimulatedCollection(self, name)
+
+def populate(client: SimulatedFirestore, users: int, prompts: int) -> None:
+    for user in range(users):
+        for index in range(prompts):
+            client.documents[f"users/user-{user}/prompts/p{index}"] = {
+                "prompt_name": f"Prompt {index}",
+                "prompt_description": "Benchmark prompt",
+                "prompt_text": "Summarize the following text in three sentences. " * 4,
+                "color": "#3b82f6",
+            }
+
+async def run(args, repository) -> dict:
+    deadline = time.perf_counter() + args.duration
+    latencies = []
+    stalls = []
+
+    async def client(index: int) -> None:
+        user_id = f"user-{index}"
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await repository.get_all(user_id, limit=args.page_size)
+            await repository.get_by_id(user_id, f"p{rng.randrange(args.prompts)}")
+            latencies.append(time.perf_counter() - started)
+
+    async def ticker() -> None:
+        interval = 0.01
+        while time.perf_counter() < deadline:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            stalls.append(max(0.0, time.perf_counter() - expected))
+
+    started = time.perf_counter()
+    await asyncio.gather(ticker(), *(client(index) for index in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    return {"latencies": latencies, "stalls": stalls, "elapsed": elapsed}
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def report(label: str, result: dict) -> None:
+    latencies = result["latencies"]
+    stalls = result["stalls"]
+    print(
+        f"{label:9s} {len(latencies) / result['elapsed']:8.1f} requests/s  "
+        f"p50 {percentile(latencies, 0.50) * 1000:8.1f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.1f} ms  "
+        f"loop stall p99 {percentile(stalls, 0.99) * 1000:7.1f} ms  max {max(stalls) * 1000:7.1f} ms"
+    )
+
+async def main_async(args) -> None:
+    client = SimulatedFirestore(args.latency_ms / 1000, args.jitter_ms / 1000)
+    populate(client, args.clients, args.prompts)
+    repository_base.get_firestore_client = lambda: client
+
+    # Imported after the client is replaced; the read-through cache stays off
+    settings.REPOSITORY_CACHE_ENABLED = False
+    from backend.repositories.prompt_repository import PromptRepository
+    repository = PromptRepository()
+
+    print(
+        f"{args.clients} clients, 2 reads per request, {args.latency_ms} ms +- {args.jitter_ms} ms "
+        f"per Firestore call, {args.duration}s per mode"
+    )
+    repository.executor = BlockingExecutor(0, name="bench.inline")
+    report("inline", await run(args, repository))
+
+    executor = BlockingExecutor(args.workers, name="bench.executor")
+    repository.executor = executor
+    try:
+        report("executor", await run(args, repository))
+        stats = executor.stats()
+        print(
+            f"executor: {stats['workers']} threads, peak {stats['peak_in_flight']} calls in flight, "
+            f"avg wait {stats['avg_wait_ms']:.1f} ms, avg run {stats['avg_run_ms']:.1f} ms"
+        )
+    finally:
+        await executor.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100, help="concurrent clients")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated Firestore call latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="random variation of the latency")
+    parser.add_argument("--prompts", type=int, default=50, help="prompts per user")
+    parser.add_argument("--page-size", type=int, default=20, help="prompts per listing")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per mode")
+    parser.add_argument("--workers", type=int, default=settings.FIRESTORE_EXECUTOR_WORKERS, help="executor threads")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
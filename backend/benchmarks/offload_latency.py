@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latency of small enhance requests while large prompts are enhanced.
+
+Runs a steady stream of small prompts on one event loop, the way a worker
+serves /enhance, while a few clients keep sending large prompts. Large
+prompts are enhanced either inline on the event loop or in the process pool
+(EnhancePool), using the same size-based dispatch as EnhanceService.
+
+Usage: python -m backend.benchmarks.offload_latency [--large-kb 512] [--duration 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.services.enhance_pool import EnhancePool
+from backend.services.rule_engine import rule_engine
+
+def random_prompt(rng: random.Random, size: int) -> str:
+    """
+    Generate a prompt of roughly the given size in characters
+    """
+    words = ["".join(rng.choices(string.ascii_letters, k=rng.randint(2, 9))) for _ in range(size // 6 + 1)]
+    return " ".join(words)[:size]
+
+async def enhance(text: str, pool, threshold: int) -> str:
+    """
+    Size-based dispatch of RuleEnhancerProvider.suffix, without the cache
+    """
+    if pool is not None and len(text) >= threshold:
+        return text + await pool.suffix(text)
+    return text + rule_engine.apply("", rule_engine.analyze(text))
+
+async def run(args, pool) -> list:
+    rng = random.Random(1)
+    small = [random_prompt(rng, args.small_size) for _ in range(200)]
+    large = [random_prompt(rng, args.large_kb * 1024) for _ in range(4)]
+    deadline = time.perf_counter() + args.duration
+
+    async def large_client(index: int) -> None:
+        while time.perf_counter() < deadline:
+            await enhance(large[index % len(large)], pool, args.threshold)
+            await asyncio.sleep(0)
+
+    latencies: list = []
+    clients = [asyncio.ensure_future(large_client(index)) for index in range(args.large_clients)]
+    requests = []
+    interval = 1.0 / args.rate
+    next_at = time.perf_counter()
+    while next_at < deadline:
+        # Latency counts from when the request was due, so a blocked loop shows up as queueing delay
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        due = next_at
+        text = small[len(requests) % len(small)]
+
+        async def timed(text=text, due=due):
+            await enhance(text, pool, args.threshold)
+            latencies.append(time.perf_counter() - due)
+
+        requests.append(asyncio.ensure_future(timed()))
+        next_at += interval
+
+    await asyncio.gather(*requests, *clients)
+    return latencies
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def report(label: str, latencies: list) -> None:
+    print(
+        f"{label:8s} {len(latencies):6d} small requests  "
+        f"p50 {percentile(latencies, 0.50) * 1000:8.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms  "
+        f"max {max(latencies) * 1000:8.2f} ms"
+    )
+
+async def main_async(args) -> None:
+    print(
+        f"{args.rate} small ({args.small_size} chars) requests/s with {args.large_clients} clients "
+        f"sending {args.large_kb} KB prompts, {args.duration}s per mode"
+    )
+    report("inline", await run(args, None))
+
+    pool = EnhancePool(workers=args.workers, timeout=60)
+    await pool.warm()
+    try:
+        report("offload", await run(args, pool))
+        stats = pool.stats()
+        print(f"pool: {stats['workers']} workers, {stats['completed']} large prompts, avg {stats['avg_task_ms']:.1f} ms")
+    finally:
+        await pool.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--large-kb", type=int, default=512, help="size of the large prompts")
+    parser.add_argument("--large-clients", type=int, default=2, help="concurrent large prompt clients")
+    parser.add_argument("--small-size", type=int, default=200, help="characters per small prompt")
+    parser.add_argument("--rate", type=int, default=500, help="small requests per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per mode")
+    parser.add_argument("--threshold", type=int, default=64 * 1024, help="offload prompts at least this long")
+    parser.add_argument("--workers", type=int, default=None, help="pool processes")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cache hit rate with per-worker caches versus a shared L2 tier.
+
+Simulates N worker processes serving a Zipf-distributed stream of prompts,
+the way uvicorn spreads requests over workers. Each request checks the
+worker's cache and computes and stores the value on a miss.
+
+Usage: python -m backend.benchmarks.shared_cache_hit_rate [--workers 8] [--requests 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.utils.caching import Cache
+from backend.utils.shared_cache import SharedMemoryCache
+
+def zipf_keys(count: int, distinct: int, seed: int, exponent: float = 1.1):
+    """
+    Generate a Zipf-distributed sequence of prompt keys
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** exponent) for rank in range(1, distinct + 1)]
+    return [f"prompt-{index}" for index in rng.choices(range(distinct), weights=weights, k=count)]
+
+def run_worker(worker_id: int, args, shared_path, results) -> None:
+    l2 = None
+    if shared_path:
+        l2 = SharedMemoryCache(shared_path, slots=args.l2_slots, slot_size=1024)
+    cache = Cache[str](ttl=3600, max_entries=args.l1_entries, name="bench", l2=l2)
+
+    hits = 0
+    started = time.perf_counter()
+    for key in zipf_keys(args.requests, args.distinct, seed=worker_id):
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, key + " Please provide specific examples.")
+    elapsed = time.perf_counter() - started
+    results.put((hits, elapsed))
+
+def measure(args, shared_path=None):
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(worker_id, args, shared_path, results))
+        for worker_id in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    total = args.workers * args.requests
+    hits = sum(hits for hits, _ in outcomes)
+    slowest = max(elapsed for _, elapsed in outcomes)
+    return hits / total, total / slowest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--requests", type=int, default=20000, help="requests per worker")
+    parser.add_argument("--distinct", type=int, default=50000, help="distinct prompts")
+    parser.add_argument("--l1-entries", type=int, default=2000)
+    parser.add_argument("--l2-slots", type=int, default=65536)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.requests} requests, {args.distinct} distinct prompts")
+
+    hit_rate, throughput = measure(args)
+    print(f"L1 only:  hit rate {hit_rate:6.1%}  {throughput:10.0f} req/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        hit_rate, throughput = measure(args, os.path.join(directory, "bench-cache"))
+    print(f"L1 + L2:  hit rate {hit_rate:6.1%}  {throughput:10.0f} req/s")
+
+if __name__ == "__main__":
+    main()
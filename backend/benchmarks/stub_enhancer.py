@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Stub completion endpoint for exercising HttpEnhancerProvider locally.
+
+Answers POST /v1/enhance with {"text": ...} after an injected delay, and can
+fail a share of the requests with 503 or stall them past any timeout.
+
+Usage: python -m backend.benchmarks.stub_enhancer [--port 8100] [--latency 0.2] [--jitter 0.1]
+                                                  [--error-rate 0.1] [--stall-rate 0.01]
+
+Then run the API with ENHANCER_PROVIDER=http ENHANCER_HTTP_URL=http://127.0.0.1:8100/v1/enhance
+"""
+import argparse
+import asyncio
+import random
+
+from fastapi import FastAPI, Response, status
+from pydantic import BaseModel
+from typing import Optional
+import uvicorn
+
+class CompletionRequest(BaseModel):
+    prompt: str
+    model: Optional[str] = None
+
+def create_stub(latency: float, jitter: float, error_rate: float, stall_rate: float, seed: Optional[int] = None) -> FastAPI:
+    """
+    Create the stub application
+
+    Args:
+        latency: Base delay per request in seconds
+        jitter: Extra uniformly random delay up to this many seconds
+        error_rate: Share of requests answered with 503
+        stall_rate: Share of requests that take 60 seconds
+        seed: Random seed for reproducible runs
+    """
+    app = FastAPI(title="Stub enhancer")
+    rng = random.Random(seed)
+    counters = {"requests": 0, "errors": 0, "stalls": 0}
+
+    @app.post("/v1/enhance")
+    async def enhance(request: CompletionRequest, response: Response):
+        counters["requests"] += 1
+        roll = rng.random()
+        if roll < stall_rate:
+            counters["stalls"] += 1
+            await asyncio.sleep(60)
+        await asyncio.sleep(latency + rng.uniform(0, jitter))
+        if roll >= 1 - error_rate:
+            counters["errors"] += 1
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            return {"error": "injected failure"}
+        return {"text": f"{request.prompt} Think step by step and answer precisely.", "model": request.model}
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.2, help="base delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="random extra delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests stalling for 60s")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_stub(args.latency, args.jitter, args.error_rate, args.stall_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -15,12 +15,120 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = True
+    WEB_CONCURRENCY: int = 1  # server processes on the host, the variable uvicorn --workers defaults to
     
     # Firebase settings
     FIREBASE_CREDENTIALS_PATH: Optional[str] = None
+    FIRESTORE_BATCH_SIZE: int = 500  # writes per WriteBatch commit, Firestore allows at most 500
+    FIRESTORE_TIMEOUT: float = 5.0  # seconds per Firestore call, capped by the request deadline
+    FIRESTORE_EXECUTOR_WORKERS: int = 32  # threads for blocking Firestore calls, 0 makes them on the event loop
+    BULK_DELETE_PAGE_SIZE: int = 2000  # document keys read per page when deleting a whole collection
+    BULK_DELETE_PARALLELISM: int = 4  # delete batches committed at once, shared by all bulk deletes
+    BULK_DELETE_INLINE_SECONDS: float = 3.0  # DELETE /history deletes this long, then finishes in the background
+    
+    # Request deadlines. A client may send X-Request-Timeout (seconds); otherwise the
+    # longest DEADLINE_ROUTES prefix of the path sets the budget, or DEADLINE_DEFAULT.
+    DEADLINE_ENABLED: bool = True
+    DEADLINE_DEFAULT: float = 10.0  # seconds
+    DEADLINE_ROUTES: Dict[str, float] = {"/enhance": 8.0, "/enhance/batch": 30.0, "/enhance/stream": 60.0}
+    DEADLINE_MIN: float = 0.1  # seconds, X-Request-Timeout is clamped to [DEADLINE_MIN, DEADLINE_MAX]
+    DEADLINE_MAX: float = 120.0
+    DEADLINE_RESERVE: float = 0.5  # seconds left when fallbacks (stale data, rule engine only) take over
+    AUTH_TIMEOUT: float = 3.0  # seconds to verify an ID token, capped by the request deadline
+    
+    # Batch enhancement settings
+    ENHANCE_BATCH_MAX_ITEMS: int = 1000
+    ENHANCE_BATCH_CONCURRENCY: int = 8
+    
+    # Large prompt settings
+    ENHANCE_MAX_PROMPT_CHARS: int = 256 * 1024  # longest /enhance prompt, larger ones go to /enhance/stream
+    ENHANCE_STREAM_CHUNK_SIZE: int = 64 * 1024  # characters per streamed chunk
+    ENHANCE_STREAM_MAX_BYTES: int = 16 * 1024 * 1024  # largest accepted /enhance/stream body
+    HISTORY_MAX_PROMPT_CHARS: int = 32 * 1024  # longer prompts are stored truncated in history
+    
+    # Process pool for CPU-heavy enhancement of large prompts
+    ENHANCE_POOL_ENABLED: bool = True
+    ENHANCE_POOL_WORKERS: Optional[int] = None  # per host, shared by the WEB_CONCURRENCY processes; defaults to min(4, CPU count)
+    ENHANCE_POOL_TIMEOUT: float = 10.0  # seconds per prompt
+    ENHANCE_OFFLOAD_THRESHOLD: int = 64 * 1024  # characters, longer prompts are enhanced in the pool
+    
+    # Enhancer provider: "rules" (built-in rule engine) or "http" (completion endpoint)
+    ENHANCER_PROVIDER: str = "rules"
+    ENHANCER_HTTP_URL: Optional[str] = None
+    ENHANCER_HTTP_MODEL: Optional[str] = None
+    ENHANCER_HTTP_API_KEY: Optional[str] = None
+    ENHANCER_HTTP_MAX_CONCURRENCY: int = 16  # requests in flight to the endpoint
+    ENHANCER_HTTP_TIMEOUT: float = 5.0  # seconds per attempt
+    ENHANCER_HTTP_RETRIES: int = 2  # retries after the first attempt
+    ENHANCER_HTTP_BACKOFF: float = 0.2  # seconds, base of the jittered exponential backoff
+    ENHANCER_LATENCY_BUDGET: float = 3.0  # seconds before falling back to the rule engine
+    
+    # Near-duplicate reuse: the analysis of a similar earlier prompt (MinHash/LSH) is reused
+    NEAR_DUP_ENABLED: bool = False
+    NEAR_DUP_THRESHOLD: float = 0.75  # estimated Jaccard similarity of word shingles
+    NEAR_DUP_NUM_PERM: int = 64  # MinHash signature length
+    NEAR_DUP_SHINGLE_WORDS: int = 2
+    NEAR_DUP_MIN_WORDS: int = 8  # shorter prompts are always enhanced themselves
+    NEAR_DUP_MAX_CHARS: int = 2048  # longer prompts too, their signature would stall the event loop
+    NEAR_DUP_MAX_ENTRIES: int = 10000
+    NEAR_DUP_VERIFY_RATE: float = 0.05  # share of near matches re-checked to measure false matches
+    
+    # Shared outgoing HTTP client
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    HTTP_TIMEOUT: float = 10.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 2.0  # seconds
+    
+    # Write-behind history: enhanced prompts are queued and written in batches
+    HISTORY_WRITE_BEHIND_ENABLED: bool = True
+    HISTORY_QUEUE_MAX_ENTRIES: int = 10000
+    HISTORY_QUEUE_OVERFLOW: str = "drop_oldest"  # drop_oldest, drop_newest or block
+    HISTORY_QUEUE_BLOCK_TIMEOUT: float = 1.0  # seconds "block" waits for room before dropping the entry
+    HISTORY_FLUSH_INTERVAL_MS: int = 250
+    HISTORY_FLUSH_MAX_ENTRIES: int = 200  # a full batch is flushed at once, capped by FIRESTORE_BATCH_SIZE
+    HISTORY_FLUSH_MAX_RETRIES: int = 3  # failed flushes before the entries are dropped
+    HISTORY_SHUTDOWN_TIMEOUT: float = 10.0  # seconds to drain the queue on shutdown
+    HISTORY_JOURNAL_PATH: Optional[str] = None  # append-only log of queued entries, replayed on startup
     
     # Cache settings
     CACHE_TTL: int = 3600  # 1 hour in seconds
+    CACHE_MAX_ENTRIES: int = 10000  # per cache instance
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64 MB per cache instance
+    CACHE_SHARDS: int = 16
+    CACHE_SWEEP_INTERVAL: int = 60  # seconds between expired entry sweeps
+    CACHE_REFRESH_AHEAD: float = 0.2  # refresh hot entries in the last 20% of their TTL
+    CACHE_REFRESH_AHEAD_MIN_HITS: int = 3  # hits since load that make an entry hot
+    CACHE_SNAPSHOT_DIR: Optional[str] = None  # persistent caches are snapshotted here when set
+    CACHE_SNAPSHOT_INTERVAL: int = 300  # seconds between snapshots
+    
+    # Shared (L2) cache settings, one memory-mapped table per host
+    CACHE_L2_ENABLED: bool = False
+    CACHE_L2_PATH: Optional[str] = None  # defaults to /dev/shm/prompt-enhancer-cache
+    CACHE_L2_SLOTS: int = 16384
+    CACHE_L2_SLOT_SIZE: int = 4096  # bytes, values that do not fit stay in L1 only
+    CACHE_L2_WAYS: int = 8
+    CACHE_L2_TAG_LOCAL_TTL: float = 1.0  # seconds a worker reuses a shared tag version; other workers' invalidations can take this long to show
+    
+    # Repository read-through cache. Enable CACHE_L2 as well when running several
+    # workers, otherwise a write in one worker is not seen by the others until TTL.
+    REPOSITORY_CACHE_ENABLED: bool = False
+    REPOSITORY_CACHE_TTL: int = 60  # seconds
+    REPOSITORY_CACHE_STALE_TTL: int = 600  # serve stale data this much longer while refreshing
+    REPOSITORY_CACHE_MAX_ENTRIES: int = 5000
+    REPOSITORY_NEGATIVE_CACHE_TTL: int = 300  # seconds a document ID is remembered as missing
+    REPOSITORY_GET_MANY_MAX_IDS: int = 300  # document IDs per multi-get, read in one batched Firestore call
+    
+    # Per-user Bloom filters of existing document IDs, used to reject unknown IDs
+    # without a Firestore read. Requires REPOSITORY_CACHE_ENABLED.
+    REPOSITORY_ID_FILTER_ENABLED: bool = False
+    REPOSITORY_ID_FILTER_FALSE_POSITIVE_RATE: float = 0.01
+    REPOSITORY_ID_FILTER_MAX_USERS: int = 10000  # per collection
+    
+    # ETag / If-None-Match on prompt and history reads. The ETags come from
+    # repository version tokens, so enable CACHE_L2 as well when running several
+    # workers, otherwise a worker may not see another one's write.
+    CONDITIONAL_REQUESTS_ENABLED: bool = False
     
     # CORS settings
     CORS_ORIGINS: List[str] = ["*"]
@@ -1,8 +1,12 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth
+import asyncio
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
+from ..config.settings import settings
+from . import deadline
+from .exceptions import DeadlineExceededException
 
 # Logger for authentication
 logger = logging.getLogger("auth")
@@ -10,6 +14,29 @@ logger = logging.getLogger("auth")
 # Security scheme for Bearer token
 security = HTTPBearer()
 
+async def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a Firebase ID token off the event loop
+    
+    Verification may fetch Google's public keys, so it runs in a thread and
+    is given AUTH_TIMEOUT seconds, capped by the request deadline.
+    
+    Args:
+        token: Firebase ID token
+    
+    Returns:
+        Decoded token
+    
+    Raises:
+        DeadlineExceededException: Verification did not finish in time
+    """
+    timeout = deadline.timeout_for(settings.AUTH_TIMEOUT)
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(None, auth.verify_id_token, token), timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceededException(f"Token verification took longer than {timeout:.2f}s")
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """
     Verify Firebase ID token and return user ID
@@ -27,7 +54,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     try:
         # Verify token
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await verify_token(token)
         
         # Get user ID
         user_id = decoded_token.get("uid")
@@ -43,6 +70,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         logger.debug(f"Authenticated user: {user_id}")
         return user_id
     
+    except DeadlineExceededException as e:
+        # The token may well be valid, so do not answer 401
+        logger.error(f"Authentication timed out: {e.detail}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Authentication timed out",
+        )
+    
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         raise HTTPException(
@@ -68,7 +103,7 @@ async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials]
     
     try:
         # Verify token
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await verify_token(token)
         
         # Get user ID
         user_id = decoded_token.get("uid")
@@ -0,0 +1,130 @@
+from fastapi import Request, Response, status
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+import hashlib
+
+# Clients must revalidate every time, but may keep the response and send its validators
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(version: str, *parts: Any) -> str:
+    """
+    Build a strong ETag from a collection or document version and the request parameters
+
+    Args:
+        version: Version token that changes on every write
+        parts: Values that select the representation (route, limit, offset, ...)
+
+    Returns:
+        Quoted ETag
+    """
+    hasher = hashlib.blake2b(digest_size=12)
+    hasher.update(version.encode())
+    for part in parts:
+        hasher.update(b"\0" + str(part).encode())
+    return f'"{hasher.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def http_date(value: datetime) -> str:
+    """
+    Format a datetime as an HTTP date
+    """
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+def not_modified(etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> Response:
+    """
+    Build an empty 304 response carrying the validators
+    """
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
+
+def set_validators(response: Response, etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> None:
+    """
+    Add ETag, Last-Modified and Cache-Control headers to a response
+    """
+    if etag is None and last_modified is None:
+        return
+    if etag is not None:
+        response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+def check_etag(request: Request, response: Response, version: Optional[str], *parts: Any) -> Optional[Response]:
+    """
+    Answer a conditional GET from a version token before doing any work
+
+    Args:
+        request: Incoming request
+        response: Response whose headers receive the ETag
+        version: Version token, or None if conditional requests are disabled
+        parts: Values that select the representation
+
+    Returns:
+        304 response if the client's copy is current, otherwise None
+    """
+    if version is None:
+        return None
+
+    etag = make_etag(version, request.url.path, *parts)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag=etag)
+
+    set_validators(response, etag=etag)
+    return None
+
+def check_last_modified(request: Request, response: Response, last_modified: Optional[datetime]) -> Optional[Response]:
+    """
+    Answer If-Modified-Since for a single resource
+
+    Args:
+        request: Incoming request
+        response: Response whose headers receive Last-Modified
+        last_modified: Modification time of the resource
+
+    Returns:
+        304 response if the resource has not changed since the given date, otherwise None
+    """
+    if last_modified is None:
+        return None
+
+    etag = response.headers.get("etag")
+    # If-None-Match takes precedence when both are sent
+    if "if-none-match" not in request.headers:
+        since = _parse_http_date(request.headers.get("if-modified-since"))
+        if since is not None:
+            modified = last_modified if last_modified.tzinfo else last_modified.astimezone()
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            # HTTP dates have one-second resolution
+            if modified.replace(microsecond=0) <= since:
+                return not_modified(etag=etag, last_modified=last_modified)
+
+    set_validators(response, etag=etag, last_modified=last_modified)
+    return None
@@ -0,0 +1,82 @@
+from contextvars import ContextVar, Token
+from typing import List, Optional, Tuple
+import time
+from ..config.settings import settings
+from .exceptions import DeadlineExceededException
+
+# Absolute deadline of the current request on the time.monotonic() clock
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+# Reasons the current response was served degraded. The list is created per
+# request and appended to in place, so marks made in tasks the request spawns
+# (which run in a copy of its context) are seen by the middleware.
+_degraded: ContextVar[Optional[List[str]]] = ContextVar("degraded", default=None)
+
+def start(budget: float) -> Tuple[Token, Token]:
+    """
+    Give the current context a deadline budget seconds from now
+
+    Args:
+        budget: Time allowed for the request in seconds
+
+    Returns:
+        Tokens to pass to reset()
+    """
+    return _deadline.set(time.monotonic() + budget), _degraded.set([])
+
+def reset(tokens: Tuple[Token, Token]) -> None:
+    deadline_token, degraded_token = tokens
+    _deadline.reset(deadline_token)
+    _degraded.reset(degraded_token)
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the current request's deadline
+
+    Returns:
+        Seconds left (negative once passed), or None outside a request with a deadline
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def nearly_expired(reserve: float = settings.DEADLINE_RESERVE) -> bool:
+    """
+    Whether at most reserve seconds are left, the point where fallbacks should take over
+    """
+    left = remaining()
+    return left is not None and left <= reserve
+
+def timeout_for(default: float, reserve: float = 0.0) -> float:
+    """
+    Timeout for one call made on behalf of the current request
+
+    Args:
+        default: Timeout of the call when the request has time to spare
+        reserve: Seconds to keep for work after the call
+
+    Returns:
+        The default, capped by the time left before the deadline minus the reserve
+
+    Raises:
+        DeadlineExceededException: No time is left for the call
+    """
+    left = remaining()
+    if left is None:
+        return default
+    left -= reserve
+    if left <= 0:
+        raise DeadlineExceededException()
+    return min(default, left)
+
+def mark_degraded(reason: str) -> None:
+    """
+    Record that the current response is served from a fallback
+    """
+    reasons = _degraded.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+def degraded_reasons() -> List[str]:
+    return list(_degraded.get() or ())
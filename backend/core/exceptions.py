@@ -49,6 +49,13 @@ class BadRequestException(AppException):
     def __init__(self, detail: str = "Bad request"):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
 
+class DeadlineExceededException(AppException):
+    """
+    Exception for a request that ran out of its deadline
+    """
+    def __init__(self, detail: str = "Request deadline exceeded"):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=detail)
+
 async def app_exception_handler(request: Request, exc: AppException) -> JSONResponse:
     """
     Handler for application-specific exceptions
@@ -4,6 +4,8 @@ import time
 import logging
 from typing import Callable
 import uuid
+from ..config.settings import settings
+from . import deadline
 
 # Logger for middleware
 logger = logging.getLogger("middleware")
@@ -62,6 +64,54 @@ class TimingMiddleware(BaseHTTPMiddleware):
             # Re-raise exception
             raise
 
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware giving every request a deadline
+    
+    The budget comes from the X-Request-Timeout header (seconds, clamped to
+    DEADLINE_MIN..DEADLINE_MAX) if the client sends one, otherwise from the
+    longest DEADLINE_ROUTES prefix of the path, or DEADLINE_DEFAULT. Calls
+    made for the request size their timeouts from it (see core.deadline), and
+    responses served from a fallback are marked with X-Degraded.
+    """
+    def __init__(self, app, routes=None, default=None):
+        super().__init__(app)
+        routes = settings.DEADLINE_ROUTES if routes is None else routes
+        # Longest prefix first
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.default = settings.DEADLINE_DEFAULT if default is None else default
+    
+    def _budget(self, request: Request) -> float:
+        header = request.headers.get("x-request-timeout")
+        if header:
+            try:
+                return min(max(float(header), settings.DEADLINE_MIN), settings.DEADLINE_MAX)
+            except ValueError:
+                logger.debug(f"Ignoring invalid X-Request-Timeout {header!r}")
+        
+        path = request.url.path
+        for prefix, budget in self.routes:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return budget
+        return self.default
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        tokens = deadline.start(self._budget(request))
+        try:
+            response = await call_next(request)
+            
+            reasons = deadline.degraded_reasons()
+            if reasons:
+                response.headers["X-Degraded"] = ",".join(reasons)
+                logger.warning(
+                    f"Degraded response: {request.method} {request.url.path} ({', '.join(reasons)})"
+                )
+            
+            return response
+        
+        finally:
+            deadline.reset(tokens)
+
 class CORSMiddleware(BaseHTTPMiddleware):
     """
     Middleware for handling CORS
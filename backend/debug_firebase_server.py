@@ -25,7 +25,8 @@ if __name__ == "__main__":
             print(f"Service account file does not exist!")
         
         print("Importing firebase_config...")
-        from firebase_config import firebase_manager
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        from backend.firebase_config import firebase_manager
         print("firebase_config imported successfully!")
         
         print(f"Firebase app initialized: {firebase_manager.app is not None}")
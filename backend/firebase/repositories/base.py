@@ -3,6 +3,7 @@ import logging
 from firebase_admin import firestore
 
 from ..core import firebase_core
+from ...utils.write_results import stored_document
 
 # Logging setup
 logger = logging.getLogger(__name__)
@@ -97,12 +98,13 @@ class BaseRepository:
             logger.error(f"Error getting document '{doc_id}' from '{self.collection_name}': {str(e)}")
             return None
     
-    def create(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def create(self, data: Dict[str, Any], fresh_read: bool = False) -> Optional[Dict[str, Any]]:
         """
         Create a new document.
         
         Args:
             data: The document data.
+            fresh_read: Read the document back instead of building it from the write result.
             
         Returns:
             The created document with ID, or None if creation failed.
@@ -120,11 +122,14 @@ class BaseRepository:
             
             # Add to Firestore
             doc_ref = self.get_collection().document()
-            doc_ref.set(data)
+            write_result = doc_ref.set(data)
             
-            # Get the created document
-            created_doc = doc_ref.get().to_dict()
-            created_doc["id"] = doc_ref.id
+            if fresh_read:
+                created_doc = doc_ref.get().to_dict()
+                created_doc["id"] = doc_ref.id
+            else:
+                # Server timestamps are the write's update time, no read needed
+                created_doc = stored_document(data, write_result, doc_ref.id)
             
             logger.info(f"Document created successfully with ID: {doc_ref.id}")
             return created_doc
@@ -132,7 +137,7 @@ class BaseRepository:
             logger.error(f"Error creating document in '{self.collection_name}': {str(e)}")
             return None
     
-    def update(self, doc_id: str, data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
+    def update(self, doc_id: str, data: Dict[str, Any], user_id: str, fresh_read: bool = False) -> Optional[Dict[str, Any]]:
         """
         Update an existing document.
         
@@ -140,6 +145,7 @@ class BaseRepository:
             doc_id: The document ID.
             data: The document data to update.
             user_id: The user ID.
+            fresh_read: Read the document back instead of merging the update into the ownership read.
             
         Returns:
             The updated document, or None if update failed.
@@ -163,11 +169,14 @@ class BaseRepository:
             data["updatedAt"] = firestore.SERVER_TIMESTAMP
             
             # Update in Firestore
-            doc_ref.update(data)
-            
-            # Get the updated document
-            updated_doc = doc_ref.get().to_dict()
-            updated_doc["id"] = doc_id
+            write_result = doc_ref.update(data)
+            
+            if fresh_read:
+                updated_doc = doc_ref.get().to_dict()
+                updated_doc["id"] = doc_id
+            else:
+                # The stored document is the one read above with the update applied
+                updated_doc = {**doc, **stored_document(data, write_result, doc_id)}
             
             logger.info(f"Document '{doc_id}' updated successfully")
             return updated_doc
@@ -2,6 +2,7 @@ from typing import List, Dict, Any, Optional
 import logging
 
 from .base import BaseRepository
+from ...utils.bulk_delete import bulk_deleter
 
 # Logging setup
 logger = logging.getLogger(__name__)
@@ -73,13 +74,11 @@ class HistoryRepository(BaseRepository):
             # Get all history entries for the user
             history_ref = self.get_collection().where("userId", "==", user_id)
             
-            # Delete each entry
-            for doc in history_ref.stream():
-                doc.reference.delete()
-                logger.info(f"Deleted history entry: {doc.id}")
+            # Delete them in parallel batches
+            progress = bulk_deleter.delete(self.db, history_ref, f"legacy.history:{user_id}")
             
-            logger.info(f"All history entries cleared for user ID: {user_id}")
-            return True
+            logger.info(f"All history entries cleared for user ID: {user_id} ({progress.deleted} deleted)")
+            return progress.done
         except Exception as e:
             logger.error(f"Error clearing history for user ID '{user_id}': {str(e)}")
             return False
@@ -1,9 +1,13 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import logging
+from .core.exceptions import BadRequestException
+from .utils.cursors import encode_cursor, decode_cursor
+from .utils.bulk_delete import bulk_deleter
+from .utils.write_results import stored_document
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -189,12 +193,13 @@ class FirebaseManager:
             print(f"Error getting prompt templates: {str(e)}")
             return []
     
-    def create_prompt_template(self, template_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def create_prompt_template(self, template_data: Dict[str, Any], fresh_read: bool = False) -> Optional[Dict[str, Any]]:
         """
         Create a new prompt template.
         
         Args:
             template_data: The template data.
+            fresh_read: Read the template back instead of building it from the write result.
             
         Returns:
             The created template with ID, or None if creation failed.
@@ -211,13 +216,15 @@ class FirebaseManager:
             
             # Add to Firestore
             template_ref = self.db.collection("promptTemplates").document()
-            template_ref.set(template_data)
+            write_result = template_ref.set(template_data)
             
-            # Get the created template
-            created_template = template_ref.get().to_dict()
-            created_template["id"] = template_ref.id
+            if fresh_read:
+                created_template = template_ref.get().to_dict()
+                created_template["id"] = template_ref.id
+                return created_template
             
-            return created_template
+            # Server timestamps are the write's update time, no read needed
+            return stored_document(template_data, write_result, template_ref.id)
         except Exception as e:
             print(f"Error creating prompt template: {str(e)}")
             return None
@@ -328,12 +335,13 @@ class FirebaseManager:
             print(f"Error getting prompt: {str(e)}")
             return None
     
-    def create_prompt(self, prompt_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def create_prompt(self, prompt_data: Dict[str, Any], fresh_read: bool = False) -> Optional[Dict[str, Any]]:
         """
         Create a new prompt.
         
         Args:
             prompt_data: The prompt data.
+            fresh_read: Read the prompt back instead of building it from the write result.
             
         Returns:
             The created prompt with ID, or None if creation failed.
@@ -352,18 +360,20 @@ class FirebaseManager:
             
             # Add to Firestore
             prompt_ref = self.db.collection("prompts").document()
-            prompt_ref.set(prompt_data)
+            write_result = prompt_ref.set(prompt_data)
             
-            # Get the created prompt
-            created_prompt = prompt_ref.get().to_dict()
-            created_prompt["id"] = prompt_ref.id
+            if fresh_read:
+                created_prompt = prompt_ref.get().to_dict()
+                created_prompt["id"] = prompt_ref.id
+                return created_prompt
             
-            return created_prompt
+            # Server timestamps are the write's update time, no read needed
+            return stored_document(prompt_data, write_result, prompt_ref.id)
         except Exception as e:
             print(f"Error creating prompt: {str(e)}")
             return None
     
-    def update_prompt(self, prompt_id: str, prompt_data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
+    def update_prompt(self, prompt_id: str, prompt_data: Dict[str, Any], user_id: str, fresh_read: bool = False) -> Optional[Dict[str, Any]]:
         """
         Update an existing prompt.
         
@@ -371,6 +381,7 @@ class FirebaseManager:
             prompt_id: The prompt ID.
             prompt_data: The prompt data to update.
             user_id: The user ID.
+            fresh_read: Read the prompt back instead of merging the update into the ownership read.
             
         Returns:
             The updated prompt, or None if update failed.
@@ -394,13 +405,15 @@ class FirebaseManager:
             prompt_data["updatedAt"] = firestore.SERVER_TIMESTAMP
             
             # Update in Firestore
-            prompt_ref.update(prompt_data)
+            write_result = prompt_ref.update(prompt_data)
             
-            # Get the updated prompt
-            updated_prompt = prompt_ref.get().to_dict()
-            updated_prompt["id"] = prompt_id
+            if fresh_read:
+                updated_prompt = prompt_ref.get().to_dict()
+                updated_prompt["id"] = prompt_id
+                return updated_prompt
             
-            return updated_prompt
+            # The stored prompt is the one read above with the update applied
+            return {**prompt, **stored_document(prompt_data, write_result, prompt_id)}
         except Exception as e:
             print(f"Error updating prompt: {str(e)}")
             return None
@@ -437,20 +450,39 @@ class FirebaseManager:
     
     
     # New methods for history
-    def get_user_history(self, user_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    def get_user_history(self, user_id: str, limit: int = 20, offset: int = 0, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get history entries for a user.
         
         Args:
             user_id: The user ID.
             limit: Maximum number of entries to return.
-            offset: Number of entries to skip.
+            offset: Number of entries to skip (deprecated, streams every skipped entry; use cursor).
+            cursor: Cursor of the page to return, see get_user_history_page.
             
         Returns:
             A list of history entries.
         """
+        return self.get_user_history_page(user_id, limit, offset, cursor)[0]
+    
+    def get_user_history_page(self, user_id: str, limit: int = 20, offset: int = 0, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of history entries for a user, newest first.
+        
+        Args:
+            user_id: The user ID.
+            limit: Maximum number of entries to return.
+            offset: Number of entries to skip (deprecated, streams every skipped entry; use cursor).
+            cursor: next_cursor of the previous page.
+            
+        Returns:
+            The history entries and the cursor of the next page, None on the last page.
+            
+        Raises:
+            BadRequestException: The cursor is invalid.
+        """
         # Проверяем кэш
-        cache_key = f"history_{user_id}_{limit}_{offset}"
+        cache_key = f"history_{user_id}_{limit}_{offset}_{cursor}"
         if cache_key in cache:
             if datetime.now().timestamp() - cache[cache_key]["timestamp"] < CACHE_TTL:
                 return cache[cache_key]["data"]
@@ -475,46 +507,70 @@ class FirebaseManager:
             ]
             # Кэшируем результат
             cache[cache_key] = {
-                "data": dummy_data,
+                "data": (dummy_data, None),
                 "timestamp": datetime.now().timestamp()
             }
-            return dummy_data
+            return dummy_data, None
         
         try:
-            # Оптимизированный запрос с сортировкой, ограничением и смещением
-            history_ref = self.db.collection("history").where("userId", "==", user_id).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit)
-            
-            # Если указан offset, используем его
-            if offset > 0:
-                # Получаем последний документ из предыдущей страницы
-                last_docs = list(self.db.collection("history").where("userId", "==", user_id).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(offset).stream())
-                if last_docs:
-                    last_doc = last_docs[-1]
-                    history_ref = history_ref.start_after(last_doc)
+            if cursor:
+                try:
+                    after_timestamp, after_id = decode_cursor(cursor)
+                except ValueError as e:
+                    # Невалидный курсор - ошибка клиента (400), а не пустая страница
+                    raise BadRequestException(str(e)) from e
+            
+            # Сортировка по timestamp и ID документа, чтобы курсор однозначно задавал позицию
+            history_ref = (
+                self.db.collection("history")
+                .where("userId", "==", user_id)
+                .order_by("timestamp", direction=firestore.Query.DESCENDING)
+                .order_by("__name__", direction=firestore.Query.DESCENDING)
+            )
+            
+            if cursor:
+                history_ref = history_ref.start_after({"timestamp": after_timestamp, "__name__": after_id})
+            elif offset > 0:
+                # Устаревший путь: Firestore читает и тарифицирует все пропущенные документы
+                logger.warning(f"Deprecated offset paging of history for user {user_id} (offset {offset})")
+                last_docs = list(history_ref.limit(offset).stream())
+                if not last_docs:
+                    return [], None
+                history_ref = history_ref.start_after(last_docs[-1])
+            
+            # Лишний документ показывает, есть ли следующая страница
+            docs = list(history_ref.limit(limit + 1).stream())
             
             history = []
-            for doc in history_ref.stream():
+            for doc in docs[:limit]:
                 entry_data = doc.to_dict()
                 entry_data["id"] = doc.id
                 history.append(entry_data)
             
+            next_cursor = None
+            if len(docs) > limit and history:
+                next_cursor = encode_cursor(history[-1]["timestamp"], history[-1]["id"])
+            
             # Кэшируем результат
             cache[cache_key] = {
-                "data": history,
+                "data": (history, next_cursor),
                 "timestamp": datetime.now().timestamp()
             }
             
-            return history
+            return history, next_cursor
+        except BadRequestException:
+            raise
         except Exception as e:
             logger.error(f"Error getting history", exc_info=True)
-            return []
+            return [], None
     
-    def add_history_entry(self, entry_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def add_history_entry(self, entry_data: Dict[str, Any], fresh_read: bool = False) -> Optional[Dict[str, Any]]:
         """
         Add a new history entry.
         
         Args:
             entry_data: The history entry data.
+            fresh_read: Read the entry back instead of building it from the write result.
             
         Returns:
             The created history entry with ID, or None if creation failed.
@@ -531,13 +587,15 @@ class FirebaseManager:
             
             # Add to Firestore
             entry_ref = self.db.collection("history").document()
-            entry_ref.set(entry_data)
+            write_result = entry_ref.set(entry_data)
             
-            # Get the created entry
-            created_entry = entry_ref.get().to_dict()
-            created_entry["id"] = entry_ref.id
+            if fresh_read:
+                created_entry = entry_ref.get().to_dict()
+                created_entry["id"] = entry_ref.id
+                return created_entry
             
-            return created_entry
+            # Server timestamps are the write's update time, no read needed
+            return stored_document(entry_data, write_result, entry_ref.id)
         except Exception as e:
             print(f"Error adding history entry: {str(e)}")
             return None
@@ -590,11 +648,8 @@ class FirebaseManager:
             # Get all history entries for the user
             history_ref = self.db.collection("history").where("userId", "==", user_id)
             
-            # Delete each entry
-            for doc in history_ref.stream():
-                doc.reference.delete()
-            
-            return True
+            # Delete them in parallel batches
+            return bulk_deleter.delete(self.db, history_ref, f"legacy.history:{user_id}").done
         except Exception as e:
             print(f"Error clearing history: {str(e)}")
             return False
@@ -14,13 +14,27 @@ from backend.config.firebase_config import initialize_firebase
 
 # Import utilities
 from backend.utils.logging import initialize_logging
+from backend.utils.caching import (
+    start_cache_sweeper,
+    stop_cache_sweeper,
+    start_cache_snapshots,
+    stop_cache_snapshots,
+)
+from backend.utils.http_client import close_http_client
+from backend.utils.executor import firestore_executor
 
 # Import core components
-from backend.core.middleware import TimingMiddleware
+from backend.core.middleware import TimingMiddleware, DeadlineMiddleware
 from backend.core.exceptions import setup_exception_handlers
 
+# Import services with a background lifecycle
+from backend.services.enhance_pool import enhance_pool
+from backend.services.enhancer_provider import enhancer_provider
+from backend.services.history_writer import history_writer
+from backend.services.history_service import history_service
+
 # Import API routes
-from backend.api.routes import root, enhance, prompts, history
+from backend.api.routes import root, enhance, prompts, history, debug
 
 # Initialize logging
 logger = initialize_logging()
@@ -49,8 +63,13 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Degraded"],
     )
     
+    # Give every request a deadline
+    if settings.DEADLINE_ENABLED:
+        app.add_middleware(DeadlineMiddleware)
+    
     # Add timing middleware
     app.add_middleware(TimingMiddleware)
     
@@ -62,6 +81,7 @@ def create_app() -> FastAPI:
     app.include_router(enhance.router)
     app.include_router(prompts.router)
     app.include_router(history.router)
+    app.include_router(debug.router)
     
     # Startup event
     @app.on_event("startup")
@@ -70,11 +90,42 @@ def create_app() -> FastAPI:
         
         # Initialize Firebase
         initialize_firebase()
+        
+        # Start evicting expired cache entries in the background
+        start_cache_sweeper()
+        
+        # Restore persistent caches and snapshot them periodically
+        start_cache_snapshots()
+        
+        # Start writing queued history entries in the background
+        history_writer.start()
     
     # Shutdown event
     @app.on_event("shutdown")
     async def shutdown_event():
         logger.info("Application shutdown")
+        
+        # Write the history entries still queued
+        await history_writer.stop()
+        
+        # Pause history clears still running; clearing again resumes them
+        await history_service.stop()
+        
+        # Stop the Firestore call threads once nothing writes any more
+        await firestore_executor.stop()
+        
+        # Stop the enhancement worker processes
+        await enhance_pool.stop()
+        
+        # Release the enhancer provider and close pooled HTTP connections
+        await enhancer_provider.close()
+        await close_http_client()
+        
+        # Stop cache sweeper
+        await stop_cache_sweeper()
+        
+        # Write final cache snapshots
+        await stop_cache_snapshots()
     
     return app
 
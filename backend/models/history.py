@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Optional
 from pydantic import Field
 from .base import BaseDBModel
+from ..config.settings import settings
 
 class HistoryEntry(BaseDBModel):
     """
@@ -24,3 +25,21 @@ class HistoryResponse(BaseDBModel):
     Response model for history operations
     """
     history: list[HistoryEntry]
+    next_cursor: Optional[str] = None
+    missing_ids: Optional[list[str]] = None
+
+class HistoryLookupRequest(BaseDBModel):
+    """
+    Request model for reading history entries by ID
+    """
+    ids: list[str] = Field(..., min_length=1, max_length=settings.REPOSITORY_GET_MANY_MAX_IDS)
+
+class HistoryClearStatus(BaseDBModel):
+    """
+    Progress of clearing a user's history
+    """
+    deleted: int = 0
+    done: bool = False
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
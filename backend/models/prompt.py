@@ -2,6 +2,7 @@ from typing import List, Optional
 from datetime import datetime
 from pydantic import Field
 from .base import BaseDBModel
+from ..config.settings import settings
 
 class PromptVariable(BaseDBModel):
     """
@@ -20,14 +21,41 @@ class Prompt(BaseDBModel):
     color: str
     variables: Optional[List[PromptVariable]] = []
 
+class PromptListResponse(BaseDBModel):
+    """
+    Response model for a page of prompts
+    """
+    prompts: List[Prompt]
+    next_cursor: Optional[str] = None
+    missing_ids: Optional[List[str]] = None
+
 class PromptRequest(BaseDBModel):
     """
     Request model for prompt enhancement
     """
-    text: str
+    text: str = Field(..., max_length=settings.ENHANCE_MAX_PROMPT_CHARS)
 
 class PromptResponse(BaseDBModel):
     """
     Response model for prompt enhancement
     """
     enhancedText: str
+
+class BatchEnhanceRequest(BaseDBModel):
+    """
+    Request model for batch prompt enhancement
+    """
+    texts: List[str] = Field(..., min_length=1, max_length=settings.ENHANCE_BATCH_MAX_ITEMS)
+
+class BatchEnhanceItem(BaseDBModel):
+    """
+    Result of one prompt in a batch: the enhanced text or an error
+    """
+    enhancedText: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchEnhanceResponse(BaseDBModel):
+    """
+    Response model for batch prompt enhancement, in request order
+    """
+    results: List[BatchEnhanceItem]
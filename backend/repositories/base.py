@@ -1,8 +1,20 @@
-from typing import List, Dict, Any, Generic, TypeVar, Optional, Type
+from typing import List, Dict, Any, Generic, TypeVar, Optional, Type, Callable, Awaitable, Iterable, Sequence, Tuple
 from datetime import datetime
 from firebase_admin import firestore
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1.field_path import FieldPath
 from ..models.base import BaseDBModel
 from ..config.firebase_config import get_firestore_client
+from ..config.settings import settings
+from ..core import deadline
+from ..core.exceptions import DeadlineExceededException
+from ..utils.caching import Cache, TagVersions, single_flight
+from ..utils.executor import BlockingExecutor, firestore_executor
+from ..utils.bulk_delete import BulkDeleter, BulkDeleteError, BulkDeleteProgress, bulk_deleter
+from ..utils.shared_cache import get_shared_cache
+from ..utils.bloom_filter import KeyedBloomFilters
+from ..utils.cursors import encode_cursor, decode_cursor
+import time
 import logging
 
 # Logger for repository operations
@@ -10,14 +22,396 @@ logger = logging.getLogger("repository")
 
 T = TypeVar('T', bound=BaseDBModel)
 
+# Errors of a Firestore call that ran out of its timeout
+FIRESTORE_TIMEOUT_ERRORS = (google_exceptions.DeadlineExceeded, google_exceptions.RetryError)
+
+# Errors of a write whose exists precondition failed
+FIRESTORE_MISSING_ERRORS = (google_exceptions.NotFound, google_exceptions.FailedPrecondition)
+
+# Read-through caches, one per collection, shared by all repository instances of it
+_repository_caches: Dict[str, Cache] = {}
+
+def get_repository_cache(collection_name: str) -> Optional[Cache]:
+    """
+    Get the read-through cache for a collection if repository caching is enabled
+    
+    Args:
+        collection_name: Firestore collection name
+    
+    Returns:
+        Cache instance or None
+    """
+    if not settings.REPOSITORY_CACHE_ENABLED:
+        return None
+    
+    cache = _repository_caches.get(collection_name)
+    if cache is None:
+        cache = Cache(
+            ttl=settings.REPOSITORY_CACHE_TTL,
+            stale_ttl=settings.REPOSITORY_CACHE_STALE_TTL,
+            max_entries=settings.REPOSITORY_CACHE_MAX_ENTRIES,
+            name=f"repository.{collection_name}",
+            l2=get_shared_cache(),
+        )
+        _repository_caches[collection_name] = cache
+    return cache
+
+# Version tokens of collections whose repository cache is disabled
+_collection_versions: Dict[str, TagVersions] = {}
+
+def get_collection_versions(collection_name: str, cache: Optional[Cache]) -> TagVersions:
+    """
+    Get the version tokens that repository writes bump for a collection
+    
+    Args:
+        collection_name: Firestore collection name
+        cache: Repository cache, whose tag versions are used if present
+    
+    Returns:
+        Tag versions of the collection
+    """
+    if cache is not None:
+        return cache.tag_versions
+    
+    versions = _collection_versions.get(collection_name)
+    if versions is None:
+        shared = get_shared_cache()
+        versions = TagVersions(
+            f"repository.{collection_name}",
+            max_tags=settings.REPOSITORY_CACHE_MAX_ENTRIES * 4,
+            l2=shared,
+        )
+        _collection_versions[collection_name] = versions
+    return versions
+
+# Bloom filters of existing document IDs per user, one set per collection
+_id_filters: Dict[str, KeyedBloomFilters] = {}
+
+def get_id_filters(collection_name: str, cache: Optional[Cache]) -> Optional[KeyedBloomFilters]:
+    """
+    Get the document ID filters for a collection if they are enabled in settings
+    
+    Args:
+        collection_name: Firestore collection name
+        cache: Repository cache whose tag versions validate the filters
+    
+    Returns:
+        Filter set or None
+    """
+    if not settings.REPOSITORY_ID_FILTER_ENABLED or cache is None:
+        return None
+    
+    filters = _id_filters.get(collection_name)
+    if filters is None or filters.tag_versions is not cache.tag_versions:
+        filters = KeyedBloomFilters(
+            cache.tag_versions,
+            false_positive_rate=settings.REPOSITORY_ID_FILTER_FALSE_POSITIVE_RATE,
+            max_keys=settings.REPOSITORY_ID_FILTER_MAX_USERS,
+            name=f"id_filter.{collection_name}",
+        )
+        _id_filters[collection_name] = filters
+    return filters
+
+def coalescing_key(repository: "BaseRepository", *args, **kwargs) -> Optional[Tuple]:
+    """
+    Key that coalesces identical concurrent reads of a repository
+    
+    Returns:
+        The repository and arguments, or None when the read-through cache
+        already coalesces the Firestore read
+    """
+    if repository.cache is not None:
+        return None
+    return (repository, args, tuple(sorted(kwargs.items())))
+
 class BaseRepository(Generic[T]):
     """
     Base repository for Firestore operations
+    
+    Reads go through an optional per-collection cache. List entries are tagged
+    with (collection, user_id), document entries with (collection, user_id,
+    doc_id), and writes invalidate exactly the affected tags.
+    
+    Document IDs found missing are remembered for a while, and an optional
+    per-user Bloom filter of existing IDs, built from complete listings,
+    rejects unknown IDs without a Firestore read.
+    
+    The same tags serve as collection and document versions for conditional
+    requests, whether or not the cache is enabled.
+    
+    Listings are paged with opaque keyset cursors (get_page): the query
+    starts after the (created_at, document ID) of the previous page's last
+    document, so deep pages cost the same reads as the first. get_all pages
+    with offset(), which reads and bills every skipped document, and is kept
+    for existing clients only.
+    
+    Identical concurrent reads share one Firestore read: through the cache
+    when it is enabled, otherwise by single_flight on the read methods. The
+    shared read is bound to no caller's deadline; each caller waits for it
+    until its own.
+    
+    The Firestore SDK blocks, so every call runs in the Firestore executor
+    rather than on the event loop, and gets a timeout sized from the request
+    deadline when it starts. A read that cannot finish in time is answered
+    from the last cached value, however old, if there is one; otherwise
+    DeadlineExceededException is raised.
+    
+    delete_all removes a user's collection with the shared bulk deleter: keys
+    are read a page at a time and deleted in parallel WriteBatch commits.
     """
-    def __init__(self, collection_name: str, model_class: Type[T]):
+    # Field that listings are ordered and paged by, newest first
+    order_field = "created_at"
+    
+    def __init__(
+        self,
+        collection_name: str,
+        model_class: Type[T],
+        cache: Optional[Cache] = None,
+        executor: BlockingExecutor = firestore_executor,
+        bulk_deleter: BulkDeleter = bulk_deleter,
+    ):
         self.db = get_firestore_client()
+        self.executor = executor
+        self.bulk_deleter = bulk_deleter
         self.collection_name = collection_name
         self.model_class = model_class
+        self.cache = cache if cache is not None else get_repository_cache(collection_name)
+        self.versions = get_collection_versions(collection_name, self.cache)
+        self.id_filters = get_id_filters(collection_name, self.cache)
+    
+    def _list_tag(self, user_id: str) -> str:
+        return f"{self.collection_name}:{user_id}"
+    
+    def _docs_tag(self, user_id: str) -> str:
+        return f"{self.collection_name}:{user_id}/docs"
+    
+    def _doc_tag(self, user_id: str, doc_id: str) -> str:
+        return f"{self.collection_name}:{user_id}/doc/{doc_id}"
+    
+    async def _read_through(
+        self,
+        user_id: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        doc_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Return a cached read result or load and cache it
+        
+        Args:
+            user_id: User ID
+            key: Cache key of the read within the user's collection
+            loader: Coroutine function performing the Firestore read
+            doc_id: Document ID for single-document reads, None for list reads
+        
+        Returns:
+            Read result
+        
+        Raises:
+            DeadlineExceededException: The read did not finish in time and nothing is cached
+        """
+        if self.cache is None:
+            try:
+                return await loader()
+            except FIRESTORE_TIMEOUT_ERRORS as e:
+                raise DeadlineExceededException(f"Timed out reading {self.collection_name}") from e
+        
+        if doc_id is None:
+            tags = [self._list_tag(user_id)]
+        else:
+            tags = [self._docs_tag(user_id), self._doc_tag(user_id, doc_id)]
+        cache_key = f"{self.collection_name}:{user_id}:{key}"
+        
+        # Looking the key up expires old entries, so keep the last value in hand first
+        stale = self.cache.get_stale(cache_key) if deadline.remaining() is not None else None
+        
+        # Too little time left to read Firestore: take a fresh value, else the old one
+        if deadline.nearly_expired():
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            if stale is not None:
+                return self._stale_fallback(cache_key, stale)
+        
+        try:
+            return await self.cache.get_or_load(cache_key, loader, tags=tags)
+        
+        except (DeadlineExceededException, *FIRESTORE_TIMEOUT_ERRORS) as e:
+            if stale is not None:
+                return self._stale_fallback(cache_key, stale)
+            if isinstance(e, DeadlineExceededException):
+                raise
+            raise DeadlineExceededException(f"Timed out reading {self.collection_name}") from e
+    
+    def _stale_fallback(self, cache_key: str, stale: Any) -> Any:
+        logger.warning(f"Serving stale {cache_key} to meet the request deadline")
+        deadline.mark_degraded("stale-data")
+        return stale
+    
+    async def _run_query(self, query: firestore.Query) -> List[T]:
+        """
+        Run a query in the Firestore executor and convert the documents to models
+        """
+        return await self.executor.run(
+            lambda: [self._document_to_model(doc) for doc in query.stream(timeout=self._timeout())]
+        )
+    
+    def _timeout(self) -> float:
+        """
+        Timeout for one Firestore call: FIRESTORE_TIMEOUT capped by the request deadline
+        
+        Raises:
+            DeadlineExceededException: The request deadline has passed
+        """
+        return deadline.timeout_for(settings.FIRESTORE_TIMEOUT)
+    
+    def _invalidate(
+        self,
+        user_id: str,
+        doc_id: Optional[str] = None,
+        all_docs: bool = False,
+        created_ids: Iterable[str] = (),
+    ) -> None:
+        """
+        Invalidate cached reads and version tokens affected by a write
+        
+        Args:
+            user_id: User ID
+            doc_id: ID of the written document
+            all_docs: Whether every document of the user was written
+            created_ids: IDs of the documents the write created
+        """
+        # The ID filter is validated by the list tag, so check it before bumping
+        keep_filter = (
+            self.id_filters is not None and not all_docs and self.id_filters.is_current(user_id)
+        )
+        
+        tags = [self._list_tag(user_id)]
+        if doc_id is not None:
+            tags.append(self._doc_tag(user_id, doc_id))
+        if all_docs:
+            tags.append(self._docs_tag(user_id))
+        for tag in tags:
+            self.versions.bump(tag)
+        
+        if self.id_filters is None:
+            return
+        if not keep_filter:
+            self.id_filters.discard(user_id)
+            return
+        
+        tokens = self.versions.snapshot([self._list_tag(user_id)])
+        for created_id in created_ids:
+            self.id_filters.add(user_id, created_id, tokens)
+        self.id_filters.retag(user_id, tokens)
+    
+    def collection_version(self, user_id: str) -> str:
+        """
+        Version token of the user's collection, replaced by every write to it
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Opaque version token
+        """
+        return self.versions.current(self._list_tag(user_id))
+    
+    def document_version(self, user_id: str, doc_id: str) -> str:
+        """
+        Version token of a document, replaced by every write to it
+        
+        Args:
+            user_id: User ID
+            doc_id: Document ID
+        
+        Returns:
+            Opaque version token
+        """
+        tokens = self.versions.snapshot([self._docs_tag(user_id), self._doc_tag(user_id, doc_id)])
+        return ".".join(tokens.values())
+    
+    def _missing_key(self, user_id: str, doc_id: str) -> str:
+        return f"{self.collection_name}:{user_id}:missing:{doc_id}"
+    
+    def _is_known_missing(self, user_id: str, doc_id: str) -> bool:
+        """
+        Check whether a document is known not to exist without reading Firestore
+        
+        Args:
+            user_id: User ID
+            doc_id: Document ID
+        
+        Returns:
+            True if the document was recently found missing or is not in the user's ID filter
+        """
+        if self.cache is None:
+            return False
+        
+        if self.cache.get(self._missing_key(user_id, doc_id)):
+            return True
+        
+        return self.id_filters is not None and self.id_filters.might_contain(user_id, doc_id) is False
+    
+    def _remember_missing(self, user_id: str, doc_id: str, tokens: Optional[Dict[str, str]] = None) -> None:
+        """
+        Remember that a document does not exist
+        
+        Args:
+            user_id: User ID
+            doc_id: Document ID
+            tokens: Tag tokens snapshotted before the document was read
+        """
+        if self.cache is None:
+            return
+        
+        if tokens is None:
+            tokens = self._missing_tokens(user_id, doc_id)
+        self.cache.set(
+            self._missing_key(user_id, doc_id),
+            True,
+            ttl=settings.REPOSITORY_NEGATIVE_CACHE_TTL,
+            tags=tokens,
+        )
+    
+    def _record_not_found(self, user_id: str, doc_id: str, tokens: Optional[Dict[str, str]]) -> None:
+        """
+        Remember a document Firestore reported missing and count it as an
+        ID filter false positive if the filter let it through
+        """
+        self._remember_missing(user_id, doc_id, tokens)
+        if self.id_filters is not None:
+            self.id_filters.note_missing(user_id, doc_id)
+    
+    def _missing_tokens(self, user_id: str, doc_id: str) -> Optional[Dict[str, str]]:
+        """
+        Snapshot the tags a negative lookup result depends on
+        """
+        if self.cache is None:
+            return None
+        return self.cache.tag_versions.snapshot([self._docs_tag(user_id), self._doc_tag(user_id, doc_id)])
+    
+    def _listing_tokens(self, user_id: str) -> Optional[Dict[str, str]]:
+        """
+        Snapshot the tag an ID filter built from a listing depends on, if filters are enabled
+        """
+        if self.id_filters is None:
+            return None
+        return self.cache.tag_versions.snapshot([self._list_tag(user_id)])
+    
+    def _observe_listing(self, user_id: str, docs: List[T], tokens: Optional[Dict[str, str]], complete: bool) -> None:
+        """
+        Rebuild the user's ID filter from a listing that returned every document
+        
+        Args:
+            user_id: User ID
+            docs: Listed documents
+            tokens: Result of _listing_tokens() taken before the listing was read
+            complete: Whether the listing is known to contain all of the user's documents
+        """
+        if self.id_filters is None or tokens is None or not complete:
+            return
+        self.id_filters.build(user_id, [doc.id for doc in docs if doc is not None], tokens)
     
     def _get_collection_ref(self, user_id: str) -> firestore.CollectionReference:
         """
@@ -59,10 +453,13 @@ class BaseRepository(Generic[T]):
         
         return data
     
+    @single_flight(coalescing_key)
     async def get_all(self, user_id: str, limit: int = 100, offset: int = 0) -> List[T]:
         """
         Get all documents for the user
         
+        Deprecated: offset() reads every skipped document; use get_page.
+        
         Args:
             user_id: User ID
             limit: Maximum number of documents to return
@@ -71,22 +468,31 @@ class BaseRepository(Generic[T]):
         Returns:
             List of model instances
         """
+        return await self._read_through(
+            user_id,
+            f"all:{limit}:{offset}",
+            lambda: self._query_all(user_id, limit, offset),
+        )
+    
+    async def _query_all(self, user_id: str, limit: int, offset: int) -> List[T]:
+        """
+        Query documents for the user from Firestore
+        """
         try:
+            tokens = self._listing_tokens(user_id)
             collection_ref = self._get_collection_ref(user_id)
             
             # Get documents with pagination
-            query = collection_ref.order_by('created_at', direction=firestore.Query.DESCENDING)
+            query = collection_ref.order_by(self.order_field, direction=firestore.Query.DESCENDING)
             
             # Apply offset and limit
             if offset > 0:
                 query = query.offset(offset)
             query = query.limit(limit)
             
-            # Execute query
-            docs = query.stream()
-            
-            # Convert documents to models
-            result = [self._document_to_model(doc) for doc in docs]
+            # Execute query and convert documents to models
+            result = await self._run_query(query)
+            self._observe_listing(user_id, result, tokens, complete=offset == 0 and len(result) < limit)
             
             logger.debug(f"Retrieved {len(result)} documents from {self.collection_name} for user {user_id}")
             return result
@@ -95,6 +501,85 @@ class BaseRepository(Generic[T]):
             logger.error(f"Error getting documents from {self.collection_name}: {str(e)}")
             raise
     
+    @single_flight(coalescing_key)
+    async def get_page(
+        self,
+        user_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[List[T], Optional[str]]:
+        """
+        Get a page of documents for the user, newest first
+        
+        Args:
+            user_id: User ID
+            limit: Maximum number of documents to return
+            cursor: next_cursor of the previous page, None for the first page
+            start: Only documents created at or after this time
+            end: Only documents created before this time
+        
+        Returns:
+            Documents, and the cursor of the next page or None if this is the last one
+        
+        Raises:
+            ValueError: The cursor is invalid
+        """
+        after = decode_cursor(cursor) if cursor else None
+        return await self._read_through(
+            user_id,
+            f"page:{limit}:{cursor}:{start.isoformat() if start else ''}:{end.isoformat() if end else ''}",
+            lambda: self._query_page(user_id, limit, after, start, end),
+        )
+    
+    async def _query_page(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime, str]],
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Tuple[List[T], Optional[str]]:
+        """
+        Query a page of documents for the user from Firestore
+        """
+        try:
+            tokens = self._listing_tokens(user_id)
+            collection_ref = self._get_collection_ref(user_id)
+            
+            # Range filters and ordering on one field use its single-field index;
+            # the document ID breaks ties between equal timestamps
+            query = collection_ref
+            if start is not None:
+                query = query.where(self.order_field, ">=", start)
+            if end is not None:
+                query = query.where(self.order_field, "<", end)
+            query = query.order_by(self.order_field, direction=firestore.Query.DESCENDING)
+            query = query.order_by(FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+            if after is not None:
+                value, doc_id = after
+                query = query.start_after({self.order_field: value, FieldPath.document_id(): doc_id})
+            
+            # One extra document tells whether there is a next page
+            result = await self._run_query(query.limit(limit + 1))
+            has_more = len(result) > limit
+            result = result[:limit]
+            self._observe_listing(user_id, result, tokens, complete=after is None and start is None and end is None and not has_more)
+            
+            next_cursor = None
+            if has_more:
+                last = result[-1]
+                next_cursor = encode_cursor(getattr(last, self.order_field), last.id)
+            
+            logger.debug(f"Retrieved page of {len(result)} documents from {self.collection_name} for user {user_id}")
+            return result, next_cursor
+        
+        except Exception as e:
+            logger.error(f"Error getting page of documents from {self.collection_name}: {str(e)}")
+            raise
+    
+    @single_flight(coalescing_key)
     async def get_by_id(self, user_id: str, doc_id: str) -> Optional[T]:
         """
         Get document by ID
@@ -106,21 +591,100 @@ class BaseRepository(Generic[T]):
         Returns:
             Model instance or None if not found
         """
+        if self._is_known_missing(user_id, doc_id):
+            logger.debug(f"Document {doc_id} known missing in {self.collection_name} for user {user_id}")
+            return None
+        
+        return await self._read_through(
+            user_id,
+            f"doc:{doc_id}",
+            lambda: self._fetch_by_id(user_id, doc_id),
+            doc_id=doc_id,
+        )
+    
+    async def _fetch_by_id(self, user_id: str, doc_id: str) -> Optional[T]:
+        """
+        Fetch a document from Firestore
+        """
         try:
+            tokens = self._missing_tokens(user_id, doc_id)
             doc_ref = self._get_collection_ref(user_id).document(doc_id)
-            doc = doc_ref.get()
+            doc = await self.executor.run(lambda: doc_ref.get(timeout=self._timeout()))
             
             if doc.exists:
                 logger.debug(f"Retrieved document {doc_id} from {self.collection_name} for user {user_id}")
                 return self._document_to_model(doc)
             else:
                 logger.debug(f"Document {doc_id} not found in {self.collection_name} for user {user_id}")
+                self._record_not_found(user_id, doc_id, tokens)
                 return None
         
         except Exception as e:
             logger.error(f"Error getting document {doc_id} from {self.collection_name}: {str(e)}")
             raise
     
+    async def get_many(self, user_id: str, doc_ids: Sequence[str]) -> Tuple[List[T], List[str]]:
+        """
+        Get several documents by ID with one batched Firestore read
+        
+        Documents found in the cache, and IDs known to be missing, are not
+        read again; the rest are fetched together with get_all() and cached
+        like get_by_id results.
+        
+        Args:
+            user_id: User ID
+            doc_ids: Document IDs; duplicates are read once
+        
+        Returns:
+            Found documents in the order of doc_ids, and the IDs not found
+        
+        Raises:
+            DeadlineExceededException: The read did not finish in time
+        """
+        doc_ids = list(dict.fromkeys(doc_ids))
+        found: Dict[str, T] = {}
+        missing = set()
+        to_read: List[str] = []
+        for doc_id in doc_ids:
+            if self._is_known_missing(user_id, doc_id):
+                missing.add(doc_id)
+                continue
+            cached = self.cache.get(f"{self.collection_name}:{user_id}:doc:{doc_id}") if self.cache is not None else None
+            if cached is not None:
+                found[doc_id] = cached
+            else:
+                to_read.append(doc_id)
+        
+        if to_read:
+            try:
+                # Snapshot tag tokens before reading so an invalidation during the read wins
+                tokens = {doc_id: self._missing_tokens(user_id, doc_id) for doc_id in to_read}
+                collection_ref = self._get_collection_ref(user_id)
+                refs = [collection_ref.document(doc_id) for doc_id in to_read]
+                try:
+                    snapshots = await self.executor.run(lambda: list(self.db.get_all(refs, timeout=self._timeout())))
+                except FIRESTORE_TIMEOUT_ERRORS as e:
+                    raise DeadlineExceededException(f"Timed out reading {self.collection_name}") from e
+                
+                # get_all returns documents in no particular order
+                for doc in snapshots:
+                    if doc.exists:
+                        found[doc.id] = self._document_to_model(doc)
+                        if self.cache is not None:
+                            self.cache.set(f"{self.collection_name}:{user_id}:doc:{doc.id}", found[doc.id], tags=tokens[doc.id])
+                for doc_id in to_read:
+                    if doc_id not in found:
+                        missing.add(doc_id)
+                        self._record_not_found(user_id, doc_id, tokens[doc_id])
+                
+                logger.debug(f"Read {len(to_read)} documents from {self.collection_name} for user {user_id} in one call")
+            
+            except Exception as e:
+                logger.error(f"Error getting documents from {self.collection_name}: {str(e)}")
+                raise
+        
+        return [found[doc_id] for doc_id in doc_ids if doc_id in found], [doc_id for doc_id in doc_ids if doc_id in missing]
+    
     async def create(self, user_id: str, model: T) -> T:
         """
         Create a new document
@@ -144,10 +708,19 @@ class BaseRepository(Generic[T]):
             # Add document to collection
             collection_ref = self._get_collection_ref(user_id)
             doc_ref = collection_ref.document()
-            doc_ref.set(data)
+            try:
+                write_result = await self.executor.run(lambda: doc_ref.set(data, timeout=self._timeout()))
+            except FIRESTORE_TIMEOUT_ERRORS as e:
+                # The write may still have been applied
+                self._invalidate(user_id, doc_ref.id, created_ids=[doc_ref.id])
+                raise DeadlineExceededException(f"Timed out writing to {self.collection_name}") from e
+            
+            # Server timestamps were set to the commit time; no need to read them back
+            model.created_at = model.updated_at = write_result.update_time
             
             # Set ID in model
             model.id = doc_ref.id
+            self._invalidate(user_id, doc_ref.id, created_ids=[doc_ref.id])
             
             logger.debug(f"Created document {doc_ref.id} in {self.collection_name} for user {user_id}")
             return model
@@ -156,38 +729,130 @@ class BaseRepository(Generic[T]):
             logger.error(f"Error creating document in {self.collection_name}: {str(e)}")
             raise
     
-    async def update(self, user_id: str, doc_id: str, model: T) -> T:
+    async def create_many(self, user_id: str, models: Sequence[T]) -> List[T]:
         """
-        Update an existing document
+        Create documents with batched writes, FIRESTORE_BATCH_SIZE per commit
+        
+        Args:
+            user_id: User ID
+            models: Model instances
+        
+        Returns:
+            Created model instances with IDs. If a commit fails, the documents
+            of the earlier commits stay created and the error is raised.
+        """
+        created: List[T] = []
+        batch_size = settings.FIRESTORE_BATCH_SIZE
+        for start in range(0, len(models), batch_size):
+            chunk = models[start:start + batch_size]
+            created.extend(model for _, model in await self.create_batch([(user_id, model) for model in chunk]))
+        return created
+    
+    async def create_batch(self, items: Sequence[Tuple[str, T]]) -> List[Tuple[str, T]]:
+        """
+        Create documents of one or more users in a single atomic WriteBatch commit
+        
+        Args:
+            items: Pairs of user ID and model instance, at most FIRESTORE_BATCH_SIZE
+        
+        Returns:
+            The pairs with the models' IDs set. If the commit fails nothing is
+            created and the error is raised.
+        """
+        if len(items) > settings.FIRESTORE_BATCH_SIZE:
+            raise ValueError(f"At most {settings.FIRESTORE_BATCH_SIZE} documents fit in one batch")
+        if not items:
+            return []
+        
+        try:
+            now = datetime.now()
+            batch = self.db.batch()
+            refs = []
+            for user_id, model in items:
+                model.created_at = now
+                model.updated_at = now
+                doc_ref = self._get_collection_ref(user_id).document()
+                batch.set(doc_ref, self._model_to_document(model))
+                refs.append(doc_ref)
+            
+            created_ids: Dict[str, List[str]] = {}
+            for (user_id, model), doc_ref in zip(items, refs):
+                created_ids.setdefault(user_id, []).append(doc_ref.id)
+            try:
+                write_results = await self.executor.run(lambda: batch.commit(timeout=self._timeout()))
+            except FIRESTORE_TIMEOUT_ERRORS as e:
+                # The commit may still have been applied
+                for user_id, ids in created_ids.items():
+                    self._invalidate(user_id, created_ids=ids)
+                raise DeadlineExceededException(f"Timed out writing to {self.collection_name}") from e
+            
+            for (user_id, model), doc_ref in zip(items, refs):
+                model.id = doc_ref.id
+            for (user_id, model), write_result in zip(items, write_results):
+                model.created_at = model.updated_at = write_result.update_time
+            for user_id, ids in created_ids.items():
+                self._invalidate(user_id, created_ids=ids)
+            
+            logger.debug(f"Created {len(items)} documents in {self.collection_name} for {len(created_ids)} users")
+            return list(items)
+        
+        except Exception as e:
+            logger.error(f"Error creating documents in {self.collection_name}: {str(e)}")
+            raise
+    
+    async def update(self, user_id: str, doc_id: str, model: T, fields: Optional[Iterable[str]] = None) -> T:
+        """
+        Update an existing document in a single write
+        
+        Firestore updates carry an exists precondition, so a missing document
+        is detected by the write itself instead of by a read first.
         
         Args:
             user_id: User ID
             doc_id: Document ID
             model: Model instance
+            fields: Names of the fields to write, None for all of them
         
         Returns:
             Updated model instance
+        
+        Raises:
+            ValueError: The document does not exist
         """
         try:
-            # Check if document exists
-            doc_ref = self._get_collection_ref(user_id).document(doc_id)
-            doc = doc_ref.get()
-            
-            if not doc.exists:
+            if self._is_known_missing(user_id, doc_id):
                 logger.error(f"Document {doc_id} not found in {self.collection_name} for user {user_id}")
                 raise ValueError(f"Document {doc_id} not found")
             
+            tokens = self._missing_tokens(user_id, doc_id)
+            doc_ref = self._get_collection_ref(user_id).document(doc_id)
+            
             # Set updated timestamp
             model.updated_at = datetime.now()
             
-            # Convert model to document
+            # Convert model to document, keeping the stored creation time
             data = self._model_to_document(model)
+            if model.created_at is None:
+                data.pop('created_at', None)
+            if fields is not None:
+                written = set(fields) | {'updated_at'}
+                data = {name: value for name, value in data.items() if name in written}
             
-            # Update document
-            doc_ref.update(data)
+            # Update document; on timeout it may still have been applied
+            try:
+                write_result = await self.executor.run(lambda: doc_ref.update(data, timeout=self._timeout()))
+            except FIRESTORE_MISSING_ERRORS as e:
+                logger.error(f"Document {doc_id} not found in {self.collection_name} for user {user_id}")
+                self._record_not_found(user_id, doc_id, tokens)
+                raise ValueError(f"Document {doc_id} not found") from e
+            except FIRESTORE_TIMEOUT_ERRORS as e:
+                self._invalidate(user_id, doc_id)
+                raise DeadlineExceededException(f"Timed out writing to {self.collection_name}") from e
             
-            # Set ID in model
+            # Set ID and the commit time in model
             model.id = doc_id
+            model.updated_at = write_result.update_time
+            self._invalidate(user_id, doc_id)
             
             logger.debug(f"Updated document {doc_id} in {self.collection_name} for user {user_id}")
             return model
@@ -198,23 +863,36 @@ class BaseRepository(Generic[T]):
     
     async def delete(self, user_id: str, doc_id: str) -> None:
         """
-        Delete a document
+        Delete a document in a single write with an exists precondition
         
         Args:
             user_id: User ID
             doc_id: Document ID
+        
+        Raises:
+            ValueError: The document does not exist
         """
         try:
-            # Check if document exists
-            doc_ref = self._get_collection_ref(user_id).document(doc_id)
-            doc = doc_ref.get()
-            
-            if not doc.exists:
+            if self._is_known_missing(user_id, doc_id):
                 logger.error(f"Document {doc_id} not found in {self.collection_name} for user {user_id}")
                 raise ValueError(f"Document {doc_id} not found")
             
-            # Delete document
-            doc_ref.delete()
+            tokens = self._missing_tokens(user_id, doc_id)
+            doc_ref = self._get_collection_ref(user_id).document(doc_id)
+            option = self.db.write_option(exists=True)
+            
+            # Delete document; on timeout it may still have been applied
+            try:
+                await self.executor.run(lambda: doc_ref.delete(option=option, timeout=self._timeout()))
+            except FIRESTORE_MISSING_ERRORS as e:
+                logger.error(f"Document {doc_id} not found in {self.collection_name} for user {user_id}")
+                self._record_not_found(user_id, doc_id, tokens)
+                raise ValueError(f"Document {doc_id} not found") from e
+            except FIRESTORE_TIMEOUT_ERRORS as e:
+                self._invalidate(user_id, doc_id)
+                raise DeadlineExceededException(f"Timed out writing to {self.collection_name}") from e
+            self._invalidate(user_id, doc_id)
+            self._remember_missing(user_id, doc_id)
             
             logger.debug(f"Deleted document {doc_id} from {self.collection_name} for user {user_id}")
         
@@ -222,23 +900,46 @@ class BaseRepository(Generic[T]):
             logger.error(f"Error deleting document {doc_id} from {self.collection_name}: {str(e)}")
             raise
     
-    async def delete_all(self, user_id: str) -> None:
+    async def delete_all(self, user_id: str, resume_after: Optional[str] = None, budget: Optional[float] = None) -> BulkDeleteProgress:
         """
-        Delete all documents for the user
+        Delete all documents for the user with batched bulk deletes
         
         Args:
             user_id: User ID
+            resume_after: last_id of a delete that was paused
+            budget: Seconds after which the delete pauses, None to run to the end
+        
+        Returns:
+            Progress; done is False if the delete was paused by the budget, the
+            request deadline or shutdown, and last_id tells where to resume
         """
         try:
-            # Get all documents
             collection_ref = self._get_collection_ref(user_id)
-            docs = collection_ref.stream()
+            stop_at = time.monotonic() + budget if budget is not None else None
+            
+            def should_stop() -> bool:
+                return (stop_at is not None and time.monotonic() >= stop_at) or deadline.nearly_expired()
             
-            # Delete each document
-            for doc in docs:
-                doc.reference.delete()
+            # Invalidate cached reads even if a delete fails midway
+            try:
+                progress = await self.executor.run(
+                    self.bulk_deleter.delete,
+                    self.db,
+                    collection_ref,
+                    f"{self.collection_name}:{user_id}",
+                    resume_after=resume_after,
+                    should_stop=should_stop,
+                    timeout=self._timeout(),
+                )
+            except BulkDeleteError as e:
+                if isinstance(e.__cause__, FIRESTORE_TIMEOUT_ERRORS):
+                    raise DeadlineExceededException(f"Timed out deleting from {self.collection_name}") from e
+                raise
+            finally:
+                self._invalidate(user_id, all_docs=True)
             
-            logger.debug(f"Deleted all documents from {self.collection_name} for user {user_id}")
+            logger.debug(f"Deleted {progress.deleted} documents from {self.collection_name} for user {user_id}")
+            return progress
         
         except Exception as e:
             logger.error(f"Error deleting all documents from {self.collection_name}: {str(e)}")
@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
 from firebase_admin import firestore
 from ..models.history import HistoryEntry
-from .base import BaseRepository
+from .base import BaseRepository, coalescing_key
+from ..utils.caching import single_flight
 import logging
 
 # Logger for history repository operations
@@ -15,6 +16,7 @@ class HistoryRepository(BaseRepository[HistoryEntry]):
     def __init__(self):
         super().__init__("history", HistoryEntry)
     
+    @single_flight(coalescing_key)
     async def get_recent(self, user_id: str, limit: int = 10) -> List[HistoryEntry]:
         """
         Get recent history entries
@@ -26,15 +28,26 @@ class HistoryRepository(BaseRepository[HistoryEntry]):
         Returns:
             List of recent history entries
         """
+        return await self._read_through(
+            user_id,
+            f"recent:{limit}",
+            lambda: self._query_recent(user_id, limit),
+        )
+    
+    async def _query_recent(self, user_id: str, limit: int) -> List[HistoryEntry]:
+        """
+        Query recent history entries from Firestore
+        """
         try:
+            tokens = self._listing_tokens(user_id)
             collection_ref = self._get_collection_ref(user_id)
             
             # Query by timestamp in descending order
             query = collection_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit)
-            docs = query.stream()
             
-            # Convert documents to models
-            result = [self._document_to_model(doc) for doc in docs]
+            # Execute query and convert documents to models
+            result = await self._run_query(query)
+            self._observe_listing(user_id, result, tokens, complete=len(result) < limit)
             
             logger.debug(f"Retrieved {len(result)} recent history entries for user {user_id}")
             return result
@@ -74,6 +87,39 @@ class HistoryRepository(BaseRepository[HistoryEntry]):
             logger.error(f"Error adding history entry: {str(e)}")
             raise
     
+    async def add_entries(self, user_id: str, prompts: Sequence[Tuple[str, str]]) -> List[HistoryEntry]:
+        """
+        Add several history entries with batched writes
+        
+        Args:
+            user_id: User ID
+            prompts: Pairs of original and enhanced prompt text
+        
+        Returns:
+            Created history entries
+        """
+        try:
+            now = datetime.now()
+            entries = [
+                HistoryEntry(
+                    original_prompt=original_prompt,
+                    enhanced_prompt=enhanced_prompt,
+                    timestamp=now,
+                    user_id=user_id
+                )
+                for original_prompt, enhanced_prompt in prompts
+            ]
+            
+            # Save to database
+            result = await self.create_many(user_id, entries)
+            
+            logger.debug(f"Added {len(result)} history entries for user {user_id}")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error adding history entries: {str(e)}")
+            raise
+    
     async def search_by_text(self, user_id: str, query: str, limit: int = 10) -> List[HistoryEntry]:
         """
         Search history entries by text
@@ -86,29 +132,44 @@ class HistoryRepository(BaseRepository[HistoryEntry]):
         Returns:
             List of matching history entries
         """
+        return await self._read_through(
+            user_id,
+            f"search:{limit}:{query}",
+            lambda: self._scan_for_text(user_id, query, limit),
+        )
+    
+    async def _scan_for_text(self, user_id: str, query: str, limit: int) -> List[HistoryEntry]:
+        """
+        Scan the user's history in Firestore for entries containing the query
+        """
         try:
             # Note: Firestore doesn't support full-text search
             # This is a simple implementation that checks if the query is contained in the original or enhanced prompt
             
             collection_ref = self._get_collection_ref(user_id)
-            docs = collection_ref.stream()
-            
-            results = []
             query = query.lower()
             
-            for doc in docs:
-                data = doc.to_dict()
+            def scan() -> List[HistoryEntry]:
+                results = []
                 
-                # Check if query is in original or enhanced prompt
-                if (
-                    query in data.get("original_prompt", "").lower() or 
-                    query in data.get("enhanced_prompt", "").lower()
-                ):
-                    results.append(self._document_to_model(doc))
+                for doc in collection_ref.stream(timeout=self._timeout()):
+                    data = doc.to_dict()
                     
-                    # Stop if we have enough results
-                    if len(results) >= limit:
-                        break
+                    # Check if query is in original or enhanced prompt
+                    if (
+                        query in data.get("original_prompt", "").lower() or 
+                        query in data.get("enhanced_prompt", "").lower()
+                    ):
+                        results.append(self._document_to_model(doc))
+                        
+                        # Stop if we have enough results
+                        if len(results) >= limit:
+                            break
+                
+                return results
+            
+            # The scan reads the whole collection, so it runs in the Firestore executor
+            results = await self.executor.run(scan)
             
             logger.debug(f"Found {len(results)} history entries matching '{query}' for user {user_id}")
             return results
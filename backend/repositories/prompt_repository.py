@@ -24,17 +24,27 @@ class PromptRepository(BaseRepository[Prompt]):
         Returns:
             Prompt instance or None if not found
         """
+        return await self._read_through(
+            user_id,
+            f"name:{name}",
+            lambda: self._query_by_name(user_id, name),
+        )
+    
+    async def _query_by_name(self, user_id: str, name: str) -> Optional[Prompt]:
+        """
+        Query a prompt by name from Firestore
+        """
         try:
             collection_ref = self._get_collection_ref(user_id)
             
             # Query by name
             query = collection_ref.where("prompt_name", "==", name).limit(1)
-            docs = query.stream()
+            prompts = await self._run_query(query)
             
             # Get first document
-            for doc in docs:
+            for prompt in prompts:
                 logger.debug(f"Retrieved prompt with name '{name}' for user {user_id}")
-                return self._document_to_model(doc)
+                return prompt
             
             logger.debug(f"Prompt with name '{name}' not found for user {user_id}")
             return None
@@ -55,30 +65,45 @@ class PromptRepository(BaseRepository[Prompt]):
         Returns:
             List of matching prompts
         """
+        return await self._read_through(
+            user_id,
+            f"search:{limit}:{query}",
+            lambda: self._scan_for_text(user_id, query, limit),
+        )
+    
+    async def _scan_for_text(self, user_id: str, query: str, limit: int) -> List[Prompt]:
+        """
+        Scan the user's prompts in Firestore for names or descriptions containing the query
+        """
         try:
             # Note: Firestore doesn't support full-text search
             # This is a simple implementation that checks if the query is contained in the name or description
             # For a real application, consider using a dedicated search service like Algolia or Elasticsearch
             
             collection_ref = self._get_collection_ref(user_id)
-            docs = collection_ref.stream()
-            
-            results = []
             query = query.lower()
             
-            for doc in docs:
-                data = doc.to_dict()
+            def scan() -> List[Prompt]:
+                results = []
                 
-                # Check if query is in name or description
-                if (
-                    query in data.get("prompt_name", "").lower() or 
-                    query in data.get("prompt_description", "").lower()
-                ):
-                    results.append(self._document_to_model(doc))
+                for doc in collection_ref.stream(timeout=self._timeout()):
+                    data = doc.to_dict()
                     
-                    # Stop if we have enough results
-                    if len(results) >= limit:
-                        break
+                    # Check if query is in name or description
+                    if (
+                        query in data.get("prompt_name", "").lower() or 
+                        query in data.get("prompt_description", "").lower()
+                    ):
+                        results.append(self._document_to_model(doc))
+                        
+                        # Stop if we have enough results
+                        if len(results) >= limit:
+                            break
+                
+                return results
+            
+            # The scan reads the whole collection, so it runs in the Firestore executor
+            results = await self.executor.run(scan)
             
             logger.debug(f"Found {len(results)} prompts matching '{query}' for user {user_id}")
             return results
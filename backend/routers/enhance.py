@@ -2,16 +2,16 @@ from fastapi import APIRouter, Depends, Response
 from backend.models import PromptRequest, PromptResponse
 from backend.auth import get_current_user
 import logging
-from typing import Dict, Any
-import time
 import hashlib
+from backend.utils.caching import Cache
+from backend.services.rule_engine import rule_engine
 
 # Настройка логирования
 logger = logging.getLogger('enhance_router')
 
 # Кэш для ответов
-response_cache: Dict[str, Dict[str, Any]] = {}
 CACHE_TTL = 3600  # 1 час в секундах (кэшируем дольше, т.к. результат не меняется)
+response_cache = Cache[PromptResponse](ttl=CACHE_TTL, name="legacy.enhance")
 
 router = APIRouter(
     tags=["enhance"]
@@ -28,42 +28,21 @@ async def enhance_prompt(
     """
     # Создаем хэш от текста промпта для использования в качестве ключа кэша
     text_hash = hashlib.md5(prompt.text.encode()).hexdigest()
-    cache_key = f"enhance_{text_hash}"
-    current_time = time.time()
+    cache_key = f"enhance_v{rule_engine.version}_{text_hash}"
     
     # Проверка кэша
-    if cache_key in response_cache:
-        cache_data = response_cache[cache_key]
-        if current_time - cache_data["timestamp"] < CACHE_TTL:
-            response.headers["X-Cache"] = "HIT"
-            return cache_data["data"]
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached_result
     
     try:
-        # For MVP, we'll just add some enhancements to the prompt
-        # In a real implementation, this would use more sophisticated techniques
-        
-        original_text = prompt.text
-        enhanced_text = original_text
-        
-        # Simple enhancements
-        if not enhanced_text.endswith((".", "!", "?")):
-            enhanced_text += "."
-        
-        # Add specificity
-        if "example" not in enhanced_text.lower():
-            enhanced_text += " Please provide specific examples."
-        
-        # Add clarity request
-        if "clear" not in enhanced_text.lower() and "concise" not in enhanced_text.lower():
-            enhanced_text += " Make your response clear and concise."
+        enhanced_text = rule_engine.apply(prompt.text)
         
         result = PromptResponse(enhancedText=enhanced_text)
         
         # Сохранение в кэше
-        response_cache[cache_key] = {
-            "data": result,
-            "timestamp": current_time
-        }
+        response_cache.set(cache_key, result)
         
         response.headers["Cache-Control"] = "private, max-age=3600"
         response.headers["X-Cache"] = "MISS"
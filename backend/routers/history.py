@@ -3,15 +3,15 @@ from backend.models import HistoryEntry, HistoryList
 from backend.auth import get_current_user
 from backend.firebase import firebase_manager
 import logging
-from typing import Dict, Any
-import time
+from backend.utils.caching import Cache
+from backend.utils.executor import firestore_executor
 
 # Настройка логирования
 logger = logging.getLogger('history_router')
 
 # Кэш для ответов
-response_cache: Dict[str, Dict[str, Any]] = {}
 CACHE_TTL = 300  # 5 минут в секундах
+response_cache = Cache[HistoryList](ttl=CACHE_TTL, name="legacy.history")
 
 router = APIRouter(
     tags=["history"]
@@ -29,24 +29,19 @@ async def get_history(
     """
     # Проверка кэша
     cache_key = f"history_list_{user_id}_{limit}_{offset}"
-    current_time = time.time()
     
-    if cache_key in response_cache:
-        cache_data = response_cache[cache_key]
-        if current_time - cache_data["timestamp"] < CACHE_TTL:
-            # Устанавливаем заголовок для кэширования на стороне клиента
-            response.headers["X-Cache"] = "HIT"
-            return cache_data["data"]
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        # Устанавливаем заголовок для кэширования на стороне клиента
+        response.headers["X-Cache"] = "HIT"
+        return cached_result
     
     # Получение данных из Firebase
     history_data = firebase_manager.get_user_history(user_id, limit, offset)
     result = HistoryList(history=history_data)
     
     # Сохранение в кэше
-    response_cache[cache_key] = {
-        "data": result,
-        "timestamp": current_time
-    }
+    response_cache.set(cache_key, result)
     
     # Устанавливаем заголовок для кэширования на стороне клиента
     response.headers["Cache-Control"] = "private, max-age=300"
@@ -75,9 +70,7 @@ async def add_history_entry(entry: HistoryEntry, user_id: str = Depends(get_curr
         
         # Очистка кэша для списка истории
         # Очищаем все кэши, связанные с историей пользователя
-        for key in list(response_cache.keys()):
-            if key.startswith(f"history_list_{user_id}"):
-                del response_cache[key]
+        response_cache.delete_prefix(f"history_list_{user_id}_")
         
         return HistoryEntry(**created_entry)
     except Exception as e:
@@ -102,9 +95,7 @@ async def delete_history_entry(entry_id: str, user_id: str = Depends(get_current
         
         # Очистка кэша
         # Очищаем все кэши, связанные с историей пользователя
-        for key in list(response_cache.keys()):
-            if key.startswith(f"history_list_{user_id}"):
-                del response_cache[key]
+        response_cache.delete_prefix(f"history_list_{user_id}_")
         
         return {"message": "History entry deleted successfully"}
     except Exception as e:
@@ -120,7 +111,8 @@ async def clear_history(user_id: str = Depends(get_current_user)):
     Clear all history entries for the current user.
     """
     try:
-        success = firebase_manager.clear_user_history(user_id)
+        # The bulk delete blocks on Firestore, so it runs off the event loop
+        success = await firestore_executor.run(firebase_manager.clear_user_history, user_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -129,9 +121,7 @@ async def clear_history(user_id: str = Depends(get_current_user)):
         
         # Очистка кэша
         # Очищаем все кэши, связанные с историей пользователя
-        for key in list(response_cache.keys()):
-            if key.startswith(f"history_list_{user_id}"):
-                del response_cache[key]
+        response_cache.delete_prefix(f"history_list_{user_id}_")
         
         return {"message": "History cleared successfully"}
     except Exception as e:
@@ -3,15 +3,14 @@ from backend.models import Prompt, PromptList
 from backend.auth import get_current_user
 from backend.firebase import firebase_manager
 import logging
-from typing import Dict, Any
-import time
+from backend.utils.caching import Cache
 
 # Настройка логирования
 logger = logging.getLogger('prompts_router')
 
 # Кэш для ответов
-response_cache: Dict[str, Dict[str, Any]] = {}
 CACHE_TTL = 300  # 5 минут в секундах
+response_cache = Cache(ttl=CACHE_TTL, name="legacy.prompts")
 
 router = APIRouter(
     tags=["prompts"]
@@ -24,24 +23,19 @@ async def get_prompts(response: Response, user_id: str = Depends(get_current_use
     """
     # Проверка кэша
     cache_key = f"prompts_list_{user_id}"
-    current_time = time.time()
     
-    if cache_key in response_cache:
-        cache_data = response_cache[cache_key]
-        if current_time - cache_data["timestamp"] < CACHE_TTL:
-            # Устанавливаем заголовок для кэширования на стороне клиента
-            response.headers["X-Cache"] = "HIT"
-            return cache_data["data"]
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        # Устанавливаем заголовок для кэширования на стороне клиента
+        response.headers["X-Cache"] = "HIT"
+        return cached_result
     
     # Получение данных из Firebase
     prompts_data = firebase_manager.get_user_prompts(user_id)
     result = PromptList(prompts=prompts_data)
     
     # Сохранение в кэше
-    response_cache[cache_key] = {
-        "data": result,
-        "timestamp": current_time
-    }
+    response_cache.set(cache_key, result)
     
     # Устанавливаем заголовок для кэширования на стороне клиента
     response.headers["Cache-Control"] = "private, max-age=300"
@@ -56,13 +50,11 @@ async def get_prompt(prompt_id: str, response: Response, user_id: str = Depends(
     """
     # Проверка кэша
     cache_key = f"prompt_{prompt_id}_{user_id}"
-    current_time = time.time()
     
-    if cache_key in response_cache:
-        cache_data = response_cache[cache_key]
-        if current_time - cache_data["timestamp"] < CACHE_TTL:
-            response.headers["X-Cache"] = "HIT"
-            return cache_data["data"]
+    cached_result = response_cache.get(cache_key)
+    if cached_result is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached_result
     
     # Получение данных из Firebase
     prompt_data = firebase_manager.get_prompt(prompt_id, user_id)
@@ -75,10 +67,7 @@ async def get_prompt(prompt_id: str, response: Response, user_id: str = Depends(
     result = Prompt(**prompt_data)
     
     # Сохранение в кэше
-    response_cache[cache_key] = {
-        "data": result,
-        "timestamp": current_time
-    }
+    response_cache.set(cache_key, result)
     
     response.headers["Cache-Control"] = "private, max-age=300"
     response.headers["X-Cache"] = "MISS"
@@ -105,9 +94,7 @@ async def create_prompt(prompt: Prompt, user_id: str = Depends(get_current_user)
             )
         
         # Очистка кэша для списка промптов
-        cache_key = f"prompts_list_{user_id}"
-        if cache_key in response_cache:
-            del response_cache[cache_key]
+        response_cache.delete(f"prompts_list_{user_id}")
         
         return Prompt(**created_prompt)
     except Exception as e:
@@ -139,11 +126,8 @@ async def update_prompt(prompt_id: str, prompt: Prompt, user_id: str = Depends(g
         cache_key_list = f"prompts_list_{user_id}"
         cache_key_detail = f"prompt_{prompt_id}_{user_id}"
         
-        if cache_key_list in response_cache:
-            del response_cache[cache_key_list]
-        
-        if cache_key_detail in response_cache:
-            del response_cache[cache_key_detail]
+        response_cache.delete(cache_key_list)
+        response_cache.delete(cache_key_detail)
         
         return Prompt(**updated_prompt)
     except Exception as e:
@@ -170,11 +154,8 @@ async def delete_prompt(prompt_id: str, user_id: str = Depends(get_current_user)
         cache_key_list = f"prompts_list_{user_id}"
         cache_key_detail = f"prompt_{prompt_id}_{user_id}"
         
-        if cache_key_list in response_cache:
-            del response_cache[cache_key_list]
-        
-        if cache_key_detail in response_cache:
-            del response_cache[cache_key_detail]
+        response_cache.delete(cache_key_list)
+        response_cache.delete(cache_key_detail)
         
         return {"message": "Prompt deleted successfully"}
     except Exception as e:
@@ -27,6 +27,9 @@ def main():
         host = os.environ.get("HOST", settings.HOST)
         port = int(os.environ.get("PORT", settings.PORT))
         
+        # The server processes read WEB_CONCURRENCY to share out per-host resources
+        workers = int(os.environ.setdefault("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+        
         # Run application
         uvicorn.run(
             "backend.main:app",
@@ -34,7 +37,7 @@ def main():
             port=port,
             reload=settings.DEBUG,
             log_level=settings.LOG_LEVEL.lower(),
-            workers=os.cpu_count()
+            workers=workers
         )
     
     except Exception as e:
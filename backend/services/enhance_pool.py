@@ -0,0 +1,191 @@
+from typing import Any, Dict, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import os
+import time
+import logging
+from ..config.settings import settings
+from ..core import deadline
+from ..utils.caching import cache_registry
+from .rule_engine import Rule, RuleEngine, rule_engine
+
+# Logger for the enhancement process pool
+logger = logging.getLogger("enhance_pool")
+
+# Rule engine compiled once in each worker process by _init_worker
+_worker_engine: Optional[RuleEngine] = None
+
+def _init_worker(rules: Sequence[Rule], version: int) -> None:
+    global _worker_engine
+    _worker_engine = RuleEngine(rules, version)
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+def _worker_suffix(text: str) -> str:
+    """
+    RuleEnhancerProvider.suffix() computed in a worker process
+    """
+    return _worker_engine.apply("", _worker_engine.analyze(text))
+
+def default_workers() -> int:
+    """
+    Worker processes for one server process: the host's ENHANCE_POOL_WORKERS
+    (min(4, CPU count) if unset) shared out between the WEB_CONCURRENCY
+    server processes, at least one
+    """
+    host_workers = settings.ENHANCE_POOL_WORKERS or min(4, os.cpu_count() or 1)
+    return max(1, host_workers // max(1, settings.WEB_CONCURRENCY))
+
+class EnhancePool:
+    """
+    Process pool that enhances large prompts off the event loop.
+
+    Workers are started with the "spawn" method (forking a process that runs
+    gRPC threads for Firestore is unsafe) and compile the rules once when they
+    start. The pool starts with the first task, and processes are spawned as
+    tasks need them, so server processes that never see a large prompt never
+    start any. A task that does not finish within the timeout (capped by the
+    request deadline) raises asyncio.TimeoutError; the worker still finishes
+    it, so a burst of timeouts shows up as saturation.
+    """
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: float = settings.ENHANCE_POOL_TIMEOUT,
+        engine: RuleEngine = rule_engine,
+        name: str = "enhance.pool",
+    ):
+        self.workers = workers or default_workers()
+        self.timeout = timeout
+        self.engine = engine
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.restarts = 0
+        self._run_ns = 0
+        self.name = cache_registry.register(name, self)
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """
+        Start the worker processes
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.engine.rules, self.engine.version),
+            )
+
+    async def warm(self) -> None:
+        """
+        Start the pool and wait until every worker process is up with compiled rules
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        # Processes are spawned on demand, one per task the pool cannot hand to an idle worker
+        pids = await asyncio.gather(*(loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.workers)))
+        logger.info(f"Enhance pool warmed: {len(set(pids))} worker processes in {time.perf_counter() - started:.2f}s")
+
+    async def stop(self) -> None:
+        """
+        Shut the worker processes down
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+            logger.info("Enhance pool stopped")
+
+    async def suffix(self, text: str) -> str:
+        """
+        Compute the enhancement suffix of a prompt in a worker process, starting
+        the pool if it is not running
+
+        Args:
+            text: Original prompt text
+
+        Returns:
+            Appended text, empty if no rule fires
+
+        Raises:
+            asyncio.TimeoutError: The worker did not answer within the timeout
+            DeadlineExceededException: The request deadline has passed
+        """
+        self.start()
+        timeout = deadline.timeout_for(self.timeout)
+
+        if self.in_flight >= self.workers:
+            self.queued += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.submitted += 1
+        started = time.perf_counter_ns()
+        executor = self._executor
+        try:
+            future = executor.submit(_worker_suffix, text)
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            self.completed += 1
+            return result
+
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Enhancing a {len(text)} character prompt timed out after {timeout:.2f}s")
+            raise
+
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer); replace the pool once,
+            # the other tasks that were running on it fail here as well
+            self.errors += 1
+            if self._executor is executor:
+                self.restarts += 1
+                logger.error("Enhance pool broken, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.start()
+            raise
+
+        except Exception:
+            self.errors += 1
+            raise
+
+        finally:
+            self.in_flight -= 1
+            self._run_ns += time.perf_counter_ns() - started
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the pool load and task counters
+        """
+        finished = self.completed + self.timeouts + self.errors
+        return {
+            "type": "process_pool",
+            "running": self.running,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "saturation": self.in_flight / self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "queued": self.queued,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "avg_task_ms": self._run_ns / finished / 1e6 if finished else 0.0,
+        }
+
+# Create singleton instance used by the rule enhancer provider
+enhance_pool = EnhancePool()
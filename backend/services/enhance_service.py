@@ -1,27 +1,55 @@
+import asyncio
 import hashlib
 import time
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterable, AsyncIterator
 import logging
-from ..utils.caching import Cache, cached
+from ..config.settings import settings
+from ..core import deadline
 from ..repositories.history_repository import HistoryRepository
+from .enhancer_provider import EnhancerProvider, RuleEnhancerProvider, enhancer_provider
+from .history_writer import history_writer
+from .rule_engine import rule_engine
 
 # Logger for enhance service
 logger = logging.getLogger("enhance_service")
 
-# Cache for enhance results
-enhance_cache = Cache[str]()
+def history_text(text: str, total_length: Optional[int] = None, suffix: str = "") -> str:
+    """
+    Shorten a prompt for storage in history
+
+    Args:
+        text: Prompt text, or at least its first HISTORY_MAX_PROMPT_CHARS characters
+        total_length: Length of the whole prompt if only its beginning is given
+        suffix: Text appended to the prompt by the enhancement
+
+    Returns:
+        The text itself, or its beginning with a truncation marker, followed by the suffix
+    """
+    limit = settings.HISTORY_MAX_PROMPT_CHARS
+    total_length = len(text) if total_length is None else total_length
+    if total_length <= limit:
+        return text + suffix
+    return f"{text[:limit]}... [truncated, {total_length} characters]{suffix}"
 
 class EnhanceService:
     """
     Service for enhancing prompts
+
+    Once the request deadline is nearly reached, prompts are enhanced by the
+    rule engine alone (fallback_provider) and the response is marked degraded.
     """
-    def __init__(self):
+    def __init__(self, provider: Optional[EnhancerProvider] = None, fallback_provider: Optional[EnhancerProvider] = None):
+        self.provider = provider or enhancer_provider
+        self.fallback_provider = fallback_provider or RuleEnhancerProvider()
         self.history_repository = HistoryRepository()
+        self.history_writer = history_writer
 
-    @cached(enhance_cache)
     async def enhance_prompt(self, text: str, user_id: str) -> str:
         """
-        Enhance a prompt using AI techniques
+        Enhance a prompt using AI techniques and record it in history
+
+        The enhancement comes from the cache shared by all users; history is
+        recorded on every call, whether the enhancement was cached or not.
 
         Args:
             text: Original prompt text
@@ -32,39 +60,136 @@ class EnhanceService:
         """
         try:
             logger.info(f"Enhancing prompt for user {user_id}")
+            enhanced_text = await self.enhance_text(text)
 
-            # For MVP we'll just add some enhancements to the prompt
-            # In a real implementation this would use more sophisticated techniques
+        except Exception as e:
+            logger.error(f"Error enhancing prompt: {str(e)}")
+            # In case of error, return the original text
+            deadline.mark_degraded("unenhanced")
+            return text
 
-            original_text = text
-            enhanced_text = original_text
+        try:
+            # Queue for history; the write happens in the background
+            await self.history_writer.submit(
+                user_id=user_id,
+                original_prompt=history_text(text),
+                enhanced_prompt=history_text(enhanced_text)
+            )
+        except Exception as e:
+            logger.error(f"Error saving prompt to history for user {user_id}: {str(e)}")
 
-            # Simple enhancements
-            if not enhanced_text.endswith((".", "!", "?")):
-                enhanced_text += "."
+        logger.info(f"Prompt enhanced successfully for user {user_id}")
+        return enhanced_text
 
-            # Add specificity
-            if "example" not in enhanced_text.lower():
-                enhanced_text += " Please provide specific examples."
+    async def enhance_text(self, text: str) -> str:
+        """
+        Enhance a prompt without recording it in history
 
-            # Add clarity request
-            if "clear" not in enhanced_text.lower() and "concise" not in enhanced_text.lower():
-                enhanced_text += " Make your response clear and concise."
+        Args:
+            text: Original prompt text
 
-            # Save to history
-            await self.history_repository.add_entry(
-                user_id=user_id,
-                original_prompt=original_text,
-                enhanced_prompt=enhanced_text
-            )
+        Returns:
+            Enhanced prompt text
+        """
+        provider = self.provider
+        if deadline.nearly_expired() and provider.name != self.fallback_provider.name:
+            deadline.mark_degraded(f"{self.fallback_provider.name}-only")
+            provider = self.fallback_provider
+        return await provider.enhance(text)
+
+    async def enhance_batch(self, texts: List[str], user_id: str) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Enhance several prompts concurrently and queue them for history, which the
+        history writer commits in batches. Identical texts are enhanced and recorded once.
+
+        Args:
+            texts: Original prompt texts
+            user_id: User ID
 
-            logger.info(f"Prompt enhanced successfully for user {user_id}")
-            return enhanced_text
+        Returns:
+            Pairs of enhanced text and error message, in input order
+        """
+        logger.info(f"Enhancing batch of {len(texts)} prompts for user {user_id}")
+
+        unique_texts = list(dict.fromkeys(texts))
+        semaphore = asyncio.Semaphore(settings.ENHANCE_BATCH_CONCURRENCY)
+
+        async def enhance_one(text: str) -> Tuple[Optional[str], Optional[str]]:
+            async with semaphore:
+                try:
+                    return await self.enhance_text(text), None
+                except Exception as e:
+                    logger.error(f"Error enhancing prompt in batch: {str(e)}")
+                    return None, str(e)
 
+        outcomes = dict(zip(unique_texts, await asyncio.gather(*(enhance_one(text) for text in unique_texts))))
+
+        # Queue for history; a failed write does not discard the enhancements
+        entries = [
+            (history_text(text), history_text(enhanced))
+            for text, (enhanced, error) in outcomes.items()
+            if error is None
+        ]
+        try:
+            for original_prompt, enhanced_prompt in entries:
+                await self.history_writer.submit(
+                    user_id=user_id,
+                    original_prompt=original_prompt,
+                    enhanced_prompt=enhanced_prompt
+                )
         except Exception as e:
-            logger.error(f"Error enhancing prompt: {str(e)}")
-            # In case of error, return the original text
-            return text
+            logger.error(f"Error saving batch history for user {user_id}: {str(e)}")
+
+        logger.info(f"Enhanced {len(entries)} of {len(unique_texts)} distinct prompts for user {user_id}")
+        return [outcomes[text] for text in texts]
+
+    async def enhance_stream(self, chunks: AsyncIterable[str], user_id: str) -> AsyncIterator[str]:
+        """
+        Enhance a prompt that arrives in chunks, with memory bounded by the chunk size.
+
+        Every input chunk is passed through as soon as it has been scanned and the
+        text added by the rules follows the last one. History receives the prompt
+        truncated to HISTORY_MAX_PROMPT_CHARS.
+
+        Args:
+            chunks: Prompt text in chunks
+            user_id: User ID
+
+        Yields:
+            Enhanced prompt text in chunks
+        """
+        logger.info(f"Streaming prompt enhancement for user {user_id}")
+
+        scanner = rule_engine.scanner()
+        limit = settings.HISTORY_MAX_PROMPT_CHARS
+        head: List[str] = []
+        head_length = 0
+
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            scanner.feed(chunk)
+            if head_length < limit:
+                head.append(chunk[:limit - head_length])
+                head_length += len(head[-1])
+            yield chunk
+
+        appended = rule_engine.apply("", scanner.finish())
+        if appended:
+            yield appended
+
+        # Save to history
+        try:
+            original_head = "".join(head)
+            await self.history_writer.submit(
+                user_id=user_id,
+                original_prompt=history_text(original_head, scanner.length),
+                enhanced_prompt=history_text(original_head, scanner.length, suffix=appended)
+            )
+        except Exception as e:
+            logger.error(f"Error saving streamed prompt to history for user {user_id}: {str(e)}")
+
+        logger.info(f"Streamed enhancement of {scanner.length} characters for user {user_id}")
 
 # Create singleton instance
 enhance_service = EnhanceService()
@@ -0,0 +1,493 @@
+from typing import Any, Dict, Optional, Set, Tuple
+import asyncio
+import random
+import time
+import logging
+import httpx
+from ..config.settings import settings
+from ..core import deadline
+from ..core.exceptions import DeadlineExceededException
+from ..utils.caching import Cache, cache_registry, cached
+from ..utils.cache_keys import KeyBuilder, normalize_text
+from ..utils.http_client import get_http_client
+from ..utils.minhash import MinHasher, MinHashLSH, shingles
+from ..utils.shared_cache import get_shared_cache
+from .enhance_pool import enhance_pool
+from .rule_engine import rule_engine
+
+# Logger for enhancer providers
+logger = logging.getLogger("enhancer_provider")
+
+# Cache for enhance results, kept across restarts when snapshots are enabled
+enhance_cache = Cache[str](name="enhance", l2=get_shared_cache(), persist=True)
+
+# Response statuses worth another attempt
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+class EnhancerProviderError(Exception):
+    """
+    Enhancer provider returned no usable enhancement
+    """
+
+class _RetryableStatus(Exception):
+    """
+    Endpoint answered with a status worth retrying
+    """
+
+class EnhancerProvider:
+    """
+    Interface of the component that turns a prompt into its enhanced text.
+
+    Providers are pure: the same prompt gives the same enhancement for every
+    user, and recording history is left to the caller.
+
+    Enhancing is split in two steps: analyze() does the expensive work and
+    returns a string that render() turns into the enhanced text. The analysis
+    is what can be cached and reused for similar prompts, if the provider
+    says it is transferable.
+    """
+    name = "provider"
+    # Whether the analysis of a prompt can be rendered for a similar one
+    transferable = False
+
+    async def enhance(self, text: str) -> str:
+        """
+        Enhance a prompt
+
+        Args:
+            text: Original prompt text
+
+        Returns:
+            Enhanced prompt text
+        """
+        return self.render(text, await self.analyze(text))
+
+    async def analyze(self, text: str) -> str:
+        """
+        Do the work of enhancing a prompt
+
+        Args:
+            text: Original prompt text
+
+        Returns:
+            Analysis to pass to render()
+        """
+        raise NotImplementedError
+
+    async def analyze_with_fallback(self, text: str) -> Tuple[str, bool]:
+        """
+        Like analyze(), and tell whether a fallback provider answered instead
+
+        Fallback analyses are stand-ins for one response and must not be
+        cached or reused for other prompts.
+
+        Args:
+            text: Original prompt text
+
+        Returns:
+            Analysis to pass to render(), and True if it came from a fallback
+        """
+        return await self.analyze(text), False
+
+    def render(self, text: str, analysis: str) -> str:
+        """
+        Build the enhanced text from a prompt and an analysis
+
+        Args:
+            text: Original prompt text
+            analysis: Result of analyze() for this or a similar prompt
+
+        Returns:
+            Enhanced prompt text
+        """
+        return analysis
+
+    async def close(self) -> None:
+        """
+        Release the provider's resources
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        return {"type": "enhancer_provider", "provider": self.name}
+
+class RuleEnhancerProvider(EnhancerProvider):
+    """
+    Default provider: the built-in rule engine. The analysis is the suffix
+    the rules append, which depends on the exact prompt (a trailing period
+    decides whether one is added), so it is not transferable.
+    """
+    name = "rules"
+
+    async def analyze(self, text: str) -> str:
+        return await self.suffix(text)
+
+    def render(self, text: str, analysis: str) -> str:
+        return text + analysis
+
+    async def suffix(self, text: str) -> str:
+        """
+        Text the rules append to a prompt
+
+        The rules only ever append, so the enhancement is the prompt followed by
+        this suffix. It is computed from the prompt exactly as sent, since
+        whitespace and Unicode form can change which rules fire, and cached
+        under it for all users. Prompts of ENHANCE_OFFLOAD_THRESHOLD characters
+        or more are left to the process pool whole: hashing one for the cache
+        key costs about as much as running the rules, and either would stall
+        the event loop.
+
+        Args:
+            text: Original prompt text
+
+        Returns:
+            Appended text, empty if no rule fires
+        """
+        if len(text) >= settings.ENHANCE_OFFLOAD_THRESHOLD and settings.ENHANCE_POOL_ENABLED:
+            return await enhance_pool.suffix(text)
+        return await self._cached_suffix(text)
+
+    @cached(enhance_cache, key_func=KeyBuilder("enhance_suffix", version=rule_engine.version))
+    async def _cached_suffix(self, text: str) -> str:
+        return rule_engine.apply("", rule_engine.analyze(text))
+
+class HttpEnhancerProvider(EnhancerProvider):
+    """
+    Provider backed by a model completion endpoint.
+
+    The endpoint receives {"prompt": ..., "model": ...} as JSON and answers
+    with {"text": ...} or a completion-style {"choices": [{"text": ...}]}.
+    Requests go through the shared HTTP client, at most max_concurrency at a
+    time, and failed attempts (transport errors, 408/429/5xx) are retried
+    after a jittered exponential backoff. If no enhancement arrives within
+    the latency budget, or the time left before the request deadline less
+    DEADLINE_RESERVE if that is shorter, the fallback provider answers
+    instead and the response is marked degraded; a request that completes
+    after that still fills the cache for the next caller.
+
+    The normalized prompt is sent, so the enhancement can be cached under it.
+    The analysis is the enhanced text itself, and a similar prompt may be
+    given it.
+    """
+    transferable = True
+
+    def __init__(
+        self,
+        url: str,
+        model: Optional[str] = settings.ENHANCER_HTTP_MODEL,
+        api_key: Optional[str] = settings.ENHANCER_HTTP_API_KEY,
+        max_concurrency: int = settings.ENHANCER_HTTP_MAX_CONCURRENCY,
+        timeout: float = settings.ENHANCER_HTTP_TIMEOUT,
+        retries: int = settings.ENHANCER_HTTP_RETRIES,
+        backoff: float = settings.ENHANCER_HTTP_BACKOFF,
+        latency_budget: float = settings.ENHANCER_LATENCY_BUDGET,
+        fallback: Optional[EnhancerProvider] = None,
+        cache: Cache[str] = enhance_cache,
+        client: Optional[httpx.AsyncClient] = None,
+        name: str = "http",
+    ):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.latency_budget = latency_budget
+        self.fallback = fallback or RuleEnhancerProvider()
+        self.cache = cache
+        self._client = client
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._key = KeyBuilder(f"enhance_{name}").for_function(lambda model, text: None)
+
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.requests = 0
+        self.attempts = 0
+        self.retried = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.budget_exceeded = 0
+        self._request_ns = 0
+        self.registered_name = cache_registry.register(f"enhancer.{name}", self)
+
+    async def analyze(self, text: str) -> str:
+        analysis, _ = await self.analyze_with_fallback(text)
+        return analysis
+
+    async def analyze_with_fallback(self, text: str) -> Tuple[str, bool]:
+        normalized = normalize_text(text)
+        key = self._key(self.model, normalized)
+        try:
+            budget = deadline.timeout_for(self.latency_budget, reserve=settings.DEADLINE_RESERVE)
+            analysis = await asyncio.wait_for(
+                self.cache.get_or_load(key, lambda: self._complete(normalized)),
+                budget,
+            )
+            return analysis, False
+
+        except asyncio.TimeoutError:
+            self.budget_exceeded += 1
+            self.fallbacks += 1
+            logger.warning(f"Enhancer {self.name} exceeded its {budget:.2f}s budget, using {self.fallback.name}")
+
+        except DeadlineExceededException:
+            self.budget_exceeded += 1
+            self.fallbacks += 1
+            logger.warning(f"No time left for enhancer {self.name}, using {self.fallback.name}")
+
+        except (httpx.HTTPError, EnhancerProviderError) as e:
+            self.fallbacks += 1
+            logger.warning(f"Enhancer {self.name} failed, using {self.fallback.name}: {str(e)}")
+
+        deadline.mark_degraded(f"{self.fallback.name}-only")
+        return await self.fallback.enhance(text), True
+
+    async def _complete(self, text: str) -> str:
+        """
+        Ask the endpoint for an enhancement, retrying failed attempts
+        """
+        async with self._semaphore:
+            self.in_flight += 1
+            self.requests += 1
+            started = time.perf_counter_ns()
+            try:
+                for attempt in range(self.retries + 1):
+                    if attempt:
+                        self.retried += 1
+                        # Full jitter keeps clients that failed together from retrying together
+                        await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+                    try:
+                        return await self._attempt(text)
+                    except (httpx.TransportError, _RetryableStatus) as e:
+                        if attempt == self.retries:
+                            raise EnhancerProviderError(f"{self.retries + 1} attempts failed, last: {str(e)}") from e
+                        logger.debug(f"Enhancer {self.name} attempt {attempt + 1} failed: {str(e)}")
+
+            except Exception:
+                self.failures += 1
+                raise
+
+            finally:
+                self.in_flight -= 1
+                self._request_ns += time.perf_counter_ns() - started
+
+    async def _attempt(self, text: str) -> str:
+        self.attempts += 1
+        client = self._client or get_http_client()
+        payload = {"prompt": text}
+        if self.model:
+            payload["model"] = self.model
+
+        response = await client.post(self.url, json=payload, headers=self._headers, timeout=self.timeout)
+        if response.status_code in RETRY_STATUSES:
+            raise _RetryableStatus(f"HTTP {response.status_code}")
+        if response.is_error:
+            raise EnhancerProviderError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+        try:
+            body = response.json()
+            enhanced = body["text"] if "text" in body else body["choices"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise EnhancerProviderError(f"Unexpected response: {response.text[:200]}") from e
+        if not isinstance(enhanced, str) or not enhanced.strip():
+            raise EnhancerProviderError("Empty enhancement")
+        return enhanced
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the request, retry and fallback counters
+        """
+        requests = self.requests
+        return {
+            "type": "enhancer_provider",
+            "provider": self.name,
+            "url": self.url,
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests": requests,
+            "attempts": self.attempts,
+            "retried": self.retried,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "budget_exceeded": self.budget_exceeded,
+            "avg_request_ms": self._request_ns / requests / 1e6 if requests else 0.0,
+        }
+
+class NearDuplicateProvider(EnhancerProvider):
+    """
+    Reuses the analysis of a previous prompt that is nearly the same.
+
+    Word shingles of the normalized prompt are MinHashed and looked up in an
+    LSH index; if an earlier prompt's estimated Jaccard similarity reaches the
+    threshold, its analysis is rendered for this prompt instead of asking the
+    wrapped provider. Analyses are kept in their own Cache, so they expire and
+    are evicted exactly like other cache entries; index entries whose analysis
+    is gone are dropped when they are next matched.
+
+    A share of the near matches (verify_rate) is checked in the background
+    against the wrapped provider to measure the false-match rate. Prompts
+    shorter than min_words words bypass the layer, as one changed word there
+    is a large change, and so do prompts of max_chars characters or more,
+    whose signature would take too long to compute on the event loop.
+    Analyses the wrapped provider answered from its fallback are neither
+    kept nor indexed, and a wrapped provider whose analyses are not
+    transferable is always asked itself.
+    """
+    def __init__(
+        self,
+        inner: EnhancerProvider,
+        threshold: float = settings.NEAR_DUP_THRESHOLD,
+        num_perm: int = settings.NEAR_DUP_NUM_PERM,
+        shingle_size: int = settings.NEAR_DUP_SHINGLE_WORDS,
+        min_words: int = settings.NEAR_DUP_MIN_WORDS,
+        max_chars: int = settings.NEAR_DUP_MAX_CHARS,
+        max_entries: int = settings.NEAR_DUP_MAX_ENTRIES,
+        verify_rate: float = settings.NEAR_DUP_VERIFY_RATE,
+        name: str = "near_dup",
+    ):
+        self.inner = inner
+        self.name = f"{inner.name}+{name}"
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.max_chars = max_chars
+        self.verify_rate = verify_rate
+        self.hasher = MinHasher(num_perm)
+        self.index = MinHashLSH(num_perm, threshold, max_entries)
+        self.analyses = Cache[str](max_entries=max_entries, name=f"enhance.{name}")
+        self._key = KeyBuilder(name, version=rule_engine.version).for_function(lambda provider, text: None)
+        self._verifications: Set[asyncio.Task] = set()
+        self._rng = random.Random()
+
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.not_kept = 0
+        self.verified = 0
+        self.false_matches = 0
+        self._similarity_total = 0.0
+        self._signature_ns = 0
+        self.registered_name = cache_registry.register(f"enhancer.{name}", self)
+
+    async def analyze(self, text: str) -> str:
+        analysis, _ = await self.analyze_with_fallback(text)
+        return analysis
+
+    async def analyze_with_fallback(self, text: str) -> Tuple[str, bool]:
+        if not self.inner.transferable or len(text) >= self.max_chars:
+            self.skipped += 1
+            return await self.inner.analyze_with_fallback(text)
+        normalized = normalize_text(text)
+        if normalized.count(" ") + 1 < self.min_words:
+            self.skipped += 1
+            return await self.inner.analyze_with_fallback(text)
+
+        self.lookups += 1
+        started = time.perf_counter_ns()
+        signature = self.hasher.signature(shingles(normalized, self.shingle_size))
+        key = self._key(self.inner.name, normalized)
+        match = self.index.query(signature)
+        self._signature_ns += time.perf_counter_ns() - started
+
+        if match is not None:
+            match_key, score = match
+            analysis = self.analyses.get(match_key)
+            if analysis is None:
+                self.index.remove(match_key)
+            elif match_key == key:
+                self.exact_hits += 1
+                return analysis, False
+            else:
+                self.near_hits += 1
+                self._similarity_total += score
+                if self.verify_rate and self._rng.random() < self.verify_rate:
+                    self._verify_in_background(text, analysis)
+                return analysis, False
+
+        self.misses += 1
+        analysis, fallback = await self.inner.analyze_with_fallback(text)
+        if fallback:
+            self.not_kept += 1
+        else:
+            self.analyses.set(key, analysis)
+            self.index.add(key, signature)
+        return analysis, fallback
+
+    def render(self, text: str, analysis: str) -> str:
+        return self.inner.render(text, analysis)
+
+    def _verify_in_background(self, text: str, reused: str) -> None:
+        async def verify():
+            try:
+                actual, fallback = await self.inner.analyze_with_fallback(text)
+            except Exception as e:
+                logger.debug(f"Near-duplicate verification failed: {str(e)}")
+                return
+            if fallback:
+                return
+            self.verified += 1
+            if actual != reused:
+                self.false_matches += 1
+
+        task = asyncio.ensure_future(verify())
+        self._verifications.add(task)
+        task.add_done_callback(self._verifications.discard)
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the hit and false-match counters
+        """
+        lookups = self.lookups
+        return {
+            "type": "near_duplicate",
+            "provider": self.name,
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "not_kept": self.not_kept,
+            "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+            "near_hit_rate": self.near_hits / lookups if lookups else 0.0,
+            "avg_near_similarity": self._similarity_total / self.near_hits if self.near_hits else 0.0,
+            "verified": self.verified,
+            "false_matches": self.false_matches,
+            "false_match_rate": self.false_matches / self.verified if self.verified else 0.0,
+            "index_entries": len(self.index),
+            "index_evictions": self.index.evictions,
+            "bands": self.index.bands,
+            "rows": self.index.rows,
+            "avg_signature_us": self._signature_ns / lookups / 1000 if lookups else 0.0,
+        }
+
+def create_provider() -> EnhancerProvider:
+    """
+    Create the enhancer provider selected in settings
+
+    Returns:
+        Configured provider, the rule engine if the HTTP provider is not configured,
+        behind the near-duplicate layer if it is enabled
+    """
+    provider: EnhancerProvider = RuleEnhancerProvider()
+    if settings.ENHANCER_PROVIDER == "http":
+        if settings.ENHANCER_HTTP_URL:
+            provider = HttpEnhancerProvider(settings.ENHANCER_HTTP_URL, fallback=provider)
+        else:
+            logger.error("ENHANCER_PROVIDER is http but ENHANCER_HTTP_URL is not set, using the rule engine")
+    elif settings.ENHANCER_PROVIDER != "rules":
+        logger.error(f"Unknown ENHANCER_PROVIDER {settings.ENHANCER_PROVIDER!r}, using the rule engine")
+
+    if settings.NEAR_DUP_ENABLED:
+        if provider.transferable:
+            provider = NearDuplicateProvider(provider)
+        else:
+            logger.warning(f"Enhancer {provider.name} analyses are prompt-specific, near-duplicate reuse disabled")
+    return provider
+
+# Create singleton instance used by the enhance service
+enhancer_provider = create_provider()
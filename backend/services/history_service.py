@@ -1,7 +1,12 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime
+import asyncio
+import contextvars
 import logging
 from ..models.history import HistoryEntry
 from ..repositories.history_repository import HistoryRepository
+from ..config.settings import settings
+from ..utils.bulk_delete import BulkDeleteProgress
 
 # Logger for history service
 logger = logging.getLogger("history_service")
@@ -12,11 +17,15 @@ class HistoryService:
     """
     def __init__(self):
         self.repository = HistoryRepository()
+        # Clears that ran out of request time and finish in the background, by user
+        self._clear_tasks: Dict[str, asyncio.Task] = {}
     
     async def get_history(self, user_id: str, limit: int = 20, offset: int = 0) -> List[HistoryEntry]:
         """
         Get history entries for a user
         
+        Deprecated: offset paging reads every skipped entry; use get_history_page.
+        
         Args:
             user_id: User ID
             limit: Maximum number of entries to return
@@ -35,6 +44,40 @@ class HistoryService:
             logger.error(f"Error getting history: {str(e)}")
             raise
     
+    async def get_history_page(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[List[HistoryEntry], Optional[str]]:
+        """
+        Get a page of history entries for a user, newest first
+        
+        Args:
+            user_id: User ID
+            limit: Maximum number of entries to return
+            cursor: next_cursor of the previous page, None for the first page
+            start: Only entries created at or after this time
+            end: Only entries created before this time
+        
+        Returns:
+            History entries, and the cursor of the next page or None
+        
+        Raises:
+            ValueError: The cursor is invalid
+        """
+        try:
+            logger.info(f"Getting history page for user {user_id}")
+            entries, next_cursor = await self.repository.get_page(user_id, limit, cursor, start, end)
+            logger.info(f"Retrieved {len(entries)} history entries for user {user_id}")
+            return entries, next_cursor
+        
+        except Exception as e:
+            logger.error(f"Error getting history page: {str(e)}")
+            raise
+    
     async def get_recent_history(self, user_id: str, limit: int = 10) -> List[HistoryEntry]:
         """
         Get recent history entries for a user
@@ -82,6 +125,56 @@ class HistoryService:
             logger.error(f"Error getting history entry {entry_id}: {str(e)}")
             raise
     
+    async def get_history_entries(self, user_id: str, entry_ids: List[str]) -> Tuple[List[HistoryEntry], List[str]]:
+        """
+        Get several history entries by ID in one batched read
+        
+        Args:
+            user_id: User ID
+            entry_ids: History entry IDs
+        
+        Returns:
+            Found entries in the order of entry_ids, and the IDs not found
+        """
+        try:
+            logger.info(f"Getting {len(entry_ids)} history entries by ID for user {user_id}")
+            entries, missing = await self.repository.get_many(user_id, entry_ids)
+            logger.info(f"Retrieved {len(entries)} history entries for user {user_id}, {len(missing)} not found")
+            return entries, missing
+        
+        except Exception as e:
+            logger.error(f"Error getting history entries by ID: {str(e)}")
+            raise
+    
+    def get_collection_version(self, user_id: str) -> Optional[str]:
+        """
+        Get the version of the user's history entries for conditional requests
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Version token, or None if conditional requests are disabled
+        """
+        if not settings.CONDITIONAL_REQUESTS_ENABLED:
+            return None
+        return self.repository.collection_version(user_id)
+    
+    def get_history_entry_version(self, user_id: str, entry_id: str) -> Optional[str]:
+        """
+        Get the version of a history entry for conditional requests
+        
+        Args:
+            user_id: User ID
+            entry_id: History entry ID
+        
+        Returns:
+            Version token, or None if conditional requests are disabled
+        """
+        if not settings.CONDITIONAL_REQUESTS_ENABLED:
+            return None
+        return self.repository.document_version(user_id, entry_id)
+    
     async def add_history_entry(self, user_id: str, original_prompt: str, enhanced_prompt: str) -> HistoryEntry:
         """
         Add a new history entry
@@ -114,17 +207,14 @@ class HistoryService:
         Args:
             user_id: User ID
             entry_id: History entry ID
+        
+        Raises:
+            ValueError: The entry does not exist
         """
         try:
             logger.info(f"Deleting history entry {entry_id} for user {user_id}")
             
-            # Check if entry exists
-            existing_entry = await self.repository.get_by_id(user_id, entry_id)
-            if not existing_entry:
-                logger.error(f"History entry {entry_id} not found for user {user_id}")
-                raise ValueError(f"History entry {entry_id} not found")
-            
-            # Delete from repository
+            # Delete from repository; the write fails if the entry does not exist
             await self.repository.delete(user_id, entry_id)
             
             logger.info(f"Deleted history entry {entry_id} for user {user_id}")
@@ -133,25 +223,79 @@ class HistoryService:
             logger.error(f"Error deleting history entry {entry_id}: {str(e)}")
             raise
     
-    async def clear_history(self, user_id: str) -> None:
+    async def clear_history(self, user_id: str) -> BulkDeleteProgress:
         """
         Clear all history entries for a user
         
+        Deletes for up to BULK_DELETE_INLINE_SECONDS (or until the request
+        deadline is near), then finishes the rest in the background.
+        
         Args:
             user_id: User ID
+        
+        Returns:
+            Progress of the clear; done is False if it continues in the background
         """
         try:
             logger.info(f"Clearing history for user {user_id}")
             
-            # Delete all entries from repository
-            await self.repository.delete_all(user_id)
+            # Delete entries from repository
+            progress = await self.repository.delete_all(user_id, budget=settings.BULK_DELETE_INLINE_SECONDS)
             
-            logger.info(f"Cleared history for user {user_id}")
+            if progress.done:
+                logger.info(f"Cleared history for user {user_id}")
+            else:
+                logger.info(f"Cleared {progress.deleted} history entries for user {user_id}, finishing in the background")
+                self._finish_clear_in_background(user_id, progress.last_id)
+            return progress
         
         except Exception as e:
             logger.error(f"Error clearing history: {str(e)}")
             raise
     
+    def _finish_clear_in_background(self, user_id: str, resume_after: Optional[str]) -> None:
+        task = self._clear_tasks.get(user_id)
+        if task is not None and not task.done():
+            return
+        # A fresh context, so the task does not inherit the request's deadline
+        self._clear_tasks[user_id] = asyncio.get_running_loop().create_task(
+            self._finish_clear(user_id, resume_after), context=contextvars.Context()
+        )
+    
+    async def _finish_clear(self, user_id: str, resume_after: Optional[str]) -> None:
+        try:
+            progress = await self.repository.delete_all(user_id, resume_after=resume_after)
+            if progress.done:
+                logger.info(f"Cleared history for user {user_id} in the background")
+            else:
+                logger.warning(f"Clearing history for user {user_id} paused after {progress.deleted} entries")
+        
+        except Exception as e:
+            logger.error(f"Error clearing history for user {user_id} in the background: {str(e)}")
+        
+        finally:
+            self._clear_tasks.pop(user_id, None)
+    
+    def get_clear_progress(self, user_id: str) -> Optional[BulkDeleteProgress]:
+        """
+        Get the progress of the user's latest history clear
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Progress, or None if no clear ran since startup
+        """
+        return self.repository.bulk_deleter.progress(f"{self.repository.collection_name}:{user_id}")
+    
+    async def stop(self) -> None:
+        """
+        Pause the background clears; clearing again resumes them
+        """
+        await self.repository.bulk_deleter.stop()
+        if self._clear_tasks:
+            await asyncio.gather(*self._clear_tasks.values(), return_exceptions=True)
+    
     async def search_history(self, user_id: str, query: str) -> List[HistoryEntry]:
         """
         Search history entries by text
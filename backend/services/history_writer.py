@@ -0,0 +1,403 @@
+from typing import Any, Deque, Dict, Iterable, List, Optional
+from collections import deque
+from datetime import datetime
+import asyncio
+import itertools
+import json
+import os
+import time
+import logging
+from ..config.settings import settings
+from ..models.history import HistoryEntry
+from ..repositories.history_repository import HistoryRepository
+from ..utils.caching import cache_registry
+
+# Logger for the history writer
+logger = logging.getLogger("history_writer")
+
+# What submit() does when the queue is full
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+class _PendingEntry:
+    """
+    Queued history entry with its journal sequence number
+    """
+    __slots__ = ("seq", "user_id", "entry", "attempts")
+
+    def __init__(self, seq: int, user_id: str, entry: HistoryEntry):
+        self.seq = seq
+        self.user_id = user_id
+        self.entry = entry
+        self.attempts = 0
+
+class HistoryJournal:
+    """
+    Append-only log of queued history entries.
+
+    Every queued entry is appended as a JSON line, and entries that were
+    written or dropped are acknowledged by a line listing their sequence
+    numbers, so the entries still pending after a crash can be replayed.
+    Lines are flushed to the OS as they are written, which survives a process
+    crash; sync() also forces them to disk before each batch is committed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._dirty = False
+
+    def replay(self) -> List[_PendingEntry]:
+        """
+        Read the entries that were never acknowledged and compact the log to them
+
+        Returns:
+            Pending entries in the order they were queued
+        """
+        pending: Dict[int, _PendingEntry] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        if "ack" in record:
+                            for seq in record["ack"]:
+                                pending.pop(seq, None)
+                        else:
+                            entry = HistoryEntry(
+                                original_prompt=record["original_prompt"],
+                                enhanced_prompt=record["enhanced_prompt"],
+                                timestamp=datetime.fromisoformat(record["timestamp"]),
+                                user_id=record["user_id"],
+                            )
+                            pending[record["seq"]] = _PendingEntry(record["seq"], record["user_id"], entry)
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by a crash
+                        logger.warning(f"Skipping unreadable line in history journal {self.path}")
+
+        entries = sorted(pending.values(), key=lambda pending_entry: pending_entry.seq)
+        self._rewrite(entries)
+        return entries
+
+    def append(self, pending: _PendingEntry) -> None:
+        entry = pending.entry
+        self._write({
+            "seq": pending.seq,
+            "user_id": pending.user_id,
+            "original_prompt": entry.original_prompt,
+            "enhanced_prompt": entry.enhanced_prompt,
+            "timestamp": entry.timestamp.isoformat(),
+        })
+
+    def ack(self, entries: Iterable[_PendingEntry]) -> None:
+        seqs = [pending.seq for pending in entries]
+        if seqs:
+            self._write({"ack": seqs})
+
+    def sync(self) -> None:
+        """
+        Force the lines written so far to disk
+        """
+        if self._dirty and self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    def reset(self) -> None:
+        """
+        Empty the log once every entry in it has been acknowledged
+        """
+        self._rewrite([])
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._dirty = True
+
+    def _rewrite(self, entries: List[_PendingEntry]) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            self._file = f
+            for pending in entries:
+                self.append(pending)
+            os.fsync(f.fileno())
+        self._file = None
+        self._dirty = False
+        os.replace(temp_path, self.path)
+
+class HistoryWriter:
+    """
+    Write-behind queue for history entries.
+
+    submit() only queues the entry; a background task commits the queue in
+    WriteBatch batches every flush_interval seconds, or as soon as flush_size
+    entries are waiting. When the queue is full the overflow policy either
+    drops the oldest queued entry, drops the new one, or makes the caller wait
+    for room (backpressure) up to block_timeout before dropping it. A failed
+    batch is retried up to max_retries times before its entries are dropped.
+
+    Until start() is called, or when write-behind is disabled, submit() writes
+    the entry directly.
+    """
+    def __init__(
+        self,
+        repository: Optional[HistoryRepository] = None,
+        max_entries: int = settings.HISTORY_QUEUE_MAX_ENTRIES,
+        flush_interval: float = settings.HISTORY_FLUSH_INTERVAL_MS / 1000,
+        flush_size: int = settings.HISTORY_FLUSH_MAX_ENTRIES,
+        overflow: str = settings.HISTORY_QUEUE_OVERFLOW,
+        block_timeout: float = settings.HISTORY_QUEUE_BLOCK_TIMEOUT,
+        max_retries: int = settings.HISTORY_FLUSH_MAX_RETRIES,
+        journal_path: Optional[str] = settings.HISTORY_JOURNAL_PATH,
+        enabled: bool = settings.HISTORY_WRITE_BEHIND_ENABLED,
+        name: str = "history.writer",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown history queue overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+
+        self.repository = repository or HistoryRepository()
+        self.max_entries = max(1, max_entries)
+        self.flush_interval = flush_interval
+        # One flush is one atomic commit, so a failed flush writes nothing and can be retried
+        self.flush_size = max(1, min(flush_size, settings.FIRESTORE_BATCH_SIZE))
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.max_retries = max(1, max_retries)
+        self.enabled = enabled
+        self._journal = HistoryJournal(journal_path) if journal_path else None
+        self._replayed = False
+
+        self._queue: Deque[_PendingEntry] = deque()
+        self._seq = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.submitted = 0
+        self.written = 0
+        self.written_direct = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._flush_ns = 0
+        self.name = cache_registry.register(name, self)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    def start(self) -> Optional[asyncio.Task]:
+        """
+        Replay the journal and start the background flusher
+
+        Returns:
+            Flusher task, or None if write-behind is disabled
+        """
+        if not self.enabled:
+            return None
+
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Event()
+
+            if self._journal is not None and not self._replayed:
+                replayed = self._journal.replay()
+                self._replayed = True
+                if replayed:
+                    self._queue.extendleft(reversed(replayed))
+                    self._seq = itertools.count(replayed[-1].seq + 1)
+                    logger.info(f"Replayed {len(replayed)} unwritten history entries from {self._journal.path}")
+
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                f"History writer started: flush every {self.flush_interval * 1000:.0f}ms "
+                f"or {self.flush_size} entries, queue of {self.max_entries} ({self.overflow})"
+            )
+        return self._task
+
+    async def stop(self, timeout: float = settings.HISTORY_SHUTDOWN_TIMEOUT) -> None:
+        """
+        Write the queued entries and stop the background flusher
+
+        Args:
+            timeout: Seconds to wait for the queue to drain
+        """
+        if self._task is None:
+            return
+
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            kept = f", kept in {self._journal.path}" if self._journal is not None else ""
+            logger.error(f"History writer stopped with {len(self._queue)} entries not written{kept}")
+        self._task = None
+
+        if self._journal is not None:
+            self._journal.close()
+        logger.info("History writer stopped")
+
+    async def submit(self, user_id: str, original_prompt: str, enhanced_prompt: str) -> bool:
+        """
+        Queue a history entry for writing
+
+        Args:
+            user_id: User ID
+            original_prompt: Original prompt text
+            enhanced_prompt: Enhanced prompt text
+
+        Returns:
+            True if the entry was queued or written, False if it was dropped
+        """
+        entry = HistoryEntry(
+            original_prompt=original_prompt,
+            enhanced_prompt=enhanced_prompt,
+            timestamp=datetime.now(),
+            user_id=user_id
+        )
+        self.submitted += 1
+
+        if not self.running:
+            await self.repository.create(user_id, entry)
+            self.written_direct += 1
+            return True
+
+        if len(self._queue) >= self.max_entries:
+            if self.overflow == "drop_oldest":
+                self._drop([self._queue.popleft()], "queue full")
+            elif self.overflow == "drop_newest" or not await self._wait_for_space():
+                self.dropped += 1
+                logger.warning(f"History queue full, dropped new entry for user {user_id}")
+                return False
+
+        pending = _PendingEntry(next(self._seq), user_id, entry)
+        if self._journal is not None:
+            self._journal.append(pending)
+        self._queue.append(pending)
+
+        if len(self._queue) >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    async def _wait_for_space(self) -> bool:
+        """
+        Wait up to block_timeout for the flusher to make room in the queue
+        """
+        deadline = time.monotonic() + self.block_timeout
+        while len(self._queue) >= self.max_entries:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.running:
+                return False
+            self._space.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _run(self) -> None:
+        """
+        Flush the queue every flush_interval, or whenever a full batch is waiting
+        """
+        while True:
+            if self._stopping and not self._queue:
+                return
+
+            if len(self._queue) < self.flush_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            if self._queue and not await self._flush_batch():
+                # Back off before retrying a failed batch
+                await asyncio.sleep(self.flush_interval)
+
+    async def _flush_batch(self) -> bool:
+        """
+        Commit the oldest flush_size queued entries in one batch
+
+        Returns:
+            True if the batch was written
+        """
+        batch = [self._queue.popleft() for _ in range(min(self.flush_size, len(self._queue)))]
+        self._space.set()
+        if self._journal is not None:
+            self._journal.sync()
+
+        started = time.perf_counter_ns()
+        try:
+            await self.repository.create_batch([(pending.user_id, pending.entry) for pending in batch])
+        except Exception as e:
+            self.failed_flushes += 1
+            for pending in batch:
+                pending.attempts += 1
+            retry = [pending for pending in batch if pending.attempts < self.max_retries]
+            self._drop([pending for pending in batch if pending.attempts >= self.max_retries], "write failed")
+            # Back to the front of the queue, so entries are still written in order
+            self._queue.extendleft(reversed(retry))
+            logger.warning(f"Error writing {len(batch)} history entries, {len(retry)} will be retried: {str(e)}")
+            return False
+        finally:
+            self._flush_ns += time.perf_counter_ns() - started
+
+        self.flushes += 1
+        self.written += len(batch)
+        if self._journal is not None:
+            if self._queue:
+                self._journal.ack(batch)
+            else:
+                self._journal.reset()
+        logger.debug(f"Wrote {len(batch)} history entries")
+        return True
+
+    def _drop(self, entries: List[_PendingEntry], reason: str) -> None:
+        if not entries:
+            return
+        self.dropped += len(entries)
+        if self._journal is not None:
+            self._journal.ack(entries)
+        logger.warning(f"Dropped {len(entries)} history entries: {reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the queue and flush counters
+        """
+        oldest = self._queue[0].entry.timestamp if self._queue else None
+        return {
+            "type": "history_writer",
+            "running": self.running,
+            "queued": len(self._queue),
+            "max_entries": self.max_entries,
+            "overflow": self.overflow,
+            "oldest_queued_age_s": (datetime.now() - oldest).total_seconds() if oldest else 0.0,
+            "submitted": self.submitted,
+            "written": self.written,
+            "written_direct": self.written_direct,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "avg_flush_ms": self._flush_ns / (self.flushes + self.failed_flushes) / 1e6 if self.flushes + self.failed_flushes else 0.0,
+            "journal": self._journal.path if self._journal is not None else None,
+        }
+
+# Create singleton instance shared by the enhance service and the application lifecycle
+history_writer = HistoryWriter()
@@ -1,11 +1,16 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime
 import logging
 from ..models.prompt import Prompt, PromptVariable
 from ..repositories.prompt_repository import PromptRepository
+from ..config.settings import settings
 
 # Logger for prompt service
 logger = logging.getLogger("prompt_service")
 
+# Prompt fields a client may update
+PROMPT_FIELDS = ("prompt_name", "prompt_description", "prompt_text", "color")
+
 class PromptService:
     """
     Service for prompt operations
@@ -17,6 +22,8 @@ class PromptService:
         """
         Get all prompts for a user
         
+        Deprecated: offset paging reads every skipped prompt; use get_prompts_page.
+        
         Args:
             user_id: User ID
             limit: Maximum number of prompts to return
@@ -35,6 +42,40 @@ class PromptService:
             logger.error(f"Error getting prompts: {str(e)}")
             raise
     
+    async def get_prompts_page(
+        self,
+        user_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Tuple[List[Prompt], Optional[str]]:
+        """
+        Get a page of prompts for a user, newest first
+        
+        Args:
+            user_id: User ID
+            limit: Maximum number of prompts to return
+            cursor: next_cursor of the previous page, None for the first page
+            start: Only prompts created at or after this time
+            end: Only prompts created before this time
+        
+        Returns:
+            Prompts, and the cursor of the next page or None
+        
+        Raises:
+            ValueError: The cursor is invalid
+        """
+        try:
+            logger.info(f"Getting prompts page for user {user_id}")
+            prompts, next_cursor = await self.repository.get_page(user_id, limit, cursor, start, end)
+            logger.info(f"Retrieved {len(prompts)} prompts for user {user_id}")
+            return prompts, next_cursor
+        
+        except Exception as e:
+            logger.error(f"Error getting prompts page: {str(e)}")
+            raise
+    
     async def get_prompt(self, user_id: str, prompt_id: str) -> Optional[Prompt]:
         """
         Get a prompt by ID
@@ -61,6 +102,56 @@ class PromptService:
             logger.error(f"Error getting prompt {prompt_id}: {str(e)}")
             raise
     
+    async def get_prompts_by_ids(self, user_id: str, prompt_ids: List[str]) -> Tuple[List[Prompt], List[str]]:
+        """
+        Get several prompts by ID in one batched read
+        
+        Args:
+            user_id: User ID
+            prompt_ids: Prompt IDs
+        
+        Returns:
+            Found prompts in the order of prompt_ids, and the IDs not found
+        """
+        try:
+            logger.info(f"Getting {len(prompt_ids)} prompts by ID for user {user_id}")
+            prompts, missing = await self.repository.get_many(user_id, prompt_ids)
+            logger.info(f"Retrieved {len(prompts)} prompts for user {user_id}, {len(missing)} not found")
+            return prompts, missing
+        
+        except Exception as e:
+            logger.error(f"Error getting prompts by ID: {str(e)}")
+            raise
+    
+    def get_collection_version(self, user_id: str) -> Optional[str]:
+        """
+        Get the version of the user's prompts for conditional requests
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Version token, or None if conditional requests are disabled
+        """
+        if not settings.CONDITIONAL_REQUESTS_ENABLED:
+            return None
+        return self.repository.collection_version(user_id)
+    
+    def get_prompt_version(self, user_id: str, prompt_id: str) -> Optional[str]:
+        """
+        Get the version of a prompt for conditional requests
+        
+        Args:
+            user_id: User ID
+            prompt_id: Prompt ID
+        
+        Returns:
+            Version token, or None if conditional requests are disabled
+        """
+        if not settings.CONDITIONAL_REQUESTS_ENABLED:
+            return None
+        return self.repository.document_version(user_id, prompt_id)
+    
     async def create_prompt(self, user_id: str, prompt_data: Dict[str, Any]) -> Prompt:
         """
         Create a new prompt
@@ -104,35 +195,42 @@ class PromptService:
         Args:
             user_id: User ID
             prompt_id: Prompt ID
-            prompt_data: Prompt data
+            prompt_data: Prompt data; fields left out keep their stored values
         
         Returns:
-            Updated prompt
+            Updated prompt; after a partial update it holds only the ID, the
+            update time and the fields written
+        
+        Raises:
+            ValueError: The prompt does not exist
         """
         try:
             logger.info(f"Updating prompt {prompt_id} for user {user_id}")
             
-            # Get existing prompt
-            existing_prompt = await self.repository.get_by_id(user_id, prompt_id)
-            if not existing_prompt:
-                logger.error(f"Prompt {prompt_id} not found for user {user_id}")
-                raise ValueError(f"Prompt {prompt_id} not found")
-            
-            # Extract variables from prompt text
+            # Only the fields sent are written; variables follow the prompt text
+            fields = [name for name in PROMPT_FIELDS if name in prompt_data]
+            if "prompt_text" in prompt_data:
+                fields.append("variables")
             variables = self._extract_variables(prompt_data.get("prompt_text", ""))
             
             # Create updated prompt model
             updated_prompt = Prompt(
                 id=prompt_id,
-                prompt_name=prompt_data.get("prompt_name", existing_prompt.prompt_name),
-                prompt_description=prompt_data.get("prompt_description", existing_prompt.prompt_description),
-                prompt_text=prompt_data.get("prompt_text", existing_prompt.prompt_text),
-                color=prompt_data.get("color", existing_prompt.color),
+                prompt_name=prompt_data.get("prompt_name", ""),
+                prompt_description=prompt_data.get("prompt_description", ""),
+                prompt_text=prompt_data.get("prompt_text", ""),
+                color=prompt_data.get("color", ""),
                 variables=[PromptVariable(name=var, value="") for var in variables]
             )
             
-            # Save to database
-            result = await self.repository.update(user_id, prompt_id, updated_prompt)
+            # Save to database; the write fails if the prompt does not exist
+            result = await self.repository.update(user_id, prompt_id, updated_prompt, fields)
+            
+            # A partial update answers with what it wrote instead of reading back the rest
+            if not all(name in prompt_data for name in PROMPT_FIELDS):
+                result = Prompt.model_construct(
+                    **{name: getattr(result, name) for name in ("id", "updated_at", *fields)}
+                )
             
             logger.info(f"Updated prompt {prompt_id} for user {user_id}")
             return result
@@ -148,17 +246,14 @@ class PromptService:
         Args:
             user_id: User ID
             prompt_id: Prompt ID
+        
+        Raises:
+            ValueError: The prompt does not exist
         """
         try:
             logger.info(f"Deleting prompt {prompt_id} for user {user_id}")
             
-            # Check if prompt exists
-            existing_prompt = await self.repository.get_by_id(user_id, prompt_id)
-            if not existing_prompt:
-                logger.error(f"Prompt {prompt_id} not found for user {user_id}")
-                raise ValueError(f"Prompt {prompt_id} not found")
-            
-            # Delete from database
+            # Delete from database; the write fails if the prompt does not exist
             await self.repository.delete(user_id, prompt_id)
             
             logger.info(f"Deleted prompt {prompt_id} for user {user_id}")
@@ -0,0 +1,254 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+import time
+import logging
+
+try:
+    import ahocorasick
+except ImportError:  # optional, per-keyword substring search is used when it is not installed
+    ahocorasick = None
+
+# Logger for the rule engine
+logger = logging.getLogger("rule_engine")
+
+# Bump when the rules change, so cached enhancements made by older rules are not reused
+RULES_VERSION = 2
+
+# Below this many keywords one substring search per keyword is faster than the automaton
+_AUTOMATON_MIN_KEYWORDS = 16
+
+class Rule:
+    """
+    Declarative enhancement rule: append text to the prompt when a condition holds.
+
+    A rule fires when all of its conditions hold:
+    - when_missing: none of these keywords occurs in the prompt
+    - when_present: at least one of these keywords occurs in the prompt
+    - unless_endswith: the prompt does not end with any of these suffixes
+
+    Keywords are matched case-insensitively (on the lowercased text) anywhere
+    in the text, and the text is used exactly as given, whitespace included.
+    Text appended by an earlier rule counts as part of the prompt for later rules.
+    """
+    def __init__(
+        self,
+        name: str,
+        append: str,
+        when_missing: Iterable[str] = (),
+        when_present: Iterable[str] = (),
+        unless_endswith: Iterable[str] = (),
+    ):
+        self.name = name
+        self.append = append
+        self.when_missing = tuple(when_missing)
+        self.when_present = tuple(when_present)
+        self.unless_endswith = tuple(unless_endswith)
+
+# Default enhancement rules, applied in order
+DEFAULT_RULES = [
+    Rule("terminal_punctuation", ".", unless_endswith=(".", "!", "?")),
+    Rule("specific_examples", " Please provide specific examples.", when_missing=("example",)),
+    Rule("clear_and_concise", " Make your response clear and concise.", when_missing=("clear", "concise")),
+]
+
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of lowercase keywords occur in a lowercased text.
+
+    Large keyword sets are compiled into an Aho-Corasick automaton (when the
+    optional pyahocorasick package is installed) and found in one pass;
+    small sets use one C-level substring search per keyword.
+    """
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = list(keywords)
+        self._automaton = None
+        if ahocorasick is not None and len(self.keywords) >= _AUTOMATON_MIN_KEYWORDS:
+            automaton = ahocorasick.Automaton()
+            for index, keyword in enumerate(self.keywords):
+                automaton.add_word(keyword, index)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    @property
+    def kind(self) -> str:
+        return "aho-corasick" if self._automaton is not None else "substring"
+
+    def find(self, lowered: str) -> Set[int]:
+        """
+        Indexes of the keywords occurring in the text
+        """
+        if self._automaton is not None:
+            return {index for _, index in self._automaton.iter(lowered)}
+        return {index for index, keyword in enumerate(self.keywords) if keyword in lowered}
+
+class _CompiledRule:
+    """
+    Rule with keywords resolved to matcher indexes and its counters
+    """
+    __slots__ = ("rule", "missing", "present", "adds", "hits", "eval_ns")
+
+    def __init__(self, rule: Rule, missing: Set[int], present: Set[int], adds: Set[int]):
+        self.rule = rule
+        self.missing = missing
+        self.present = present
+        self.adds = adds
+        self.hits = 0
+        self.eval_ns = 0
+
+class RuleEngine:
+    """
+    Applies an ordered set of enhancement rules.
+
+    The rules are compiled once: all their keywords go into one matcher, so a
+    prompt is lowercased and scanned once however many rules there are, and
+    the text of every rule that fires is appended in one string build.
+    """
+    def __init__(self, rules: Sequence[Rule], version: int = RULES_VERSION):
+        self.version = version
+        self.rules = list(rules)
+
+        keywords: Dict[str, int] = {}
+        def indexes(words: Iterable[str]) -> Set[int]:
+            return {keywords.setdefault(word.lower(), len(keywords)) for word in words}
+
+        compiled = [
+            (rule, indexes(rule.when_missing), indexes(rule.when_present))
+            for rule in self.rules
+        ]
+        self._matcher = KeywordMatcher(list(keywords))
+
+        # Keywords each rule's own appended text introduces for the rules after it
+        self._rules = [
+            _CompiledRule(rule, missing, present, self._matcher.find(rule.append.lower()))
+            for rule, missing, present in compiled
+        ]
+        self._suffix_length = max((len(suffix) for rule in self.rules for suffix in rule.unless_endswith), default=0)
+        self._keyword_length = max((len(keyword) for keyword in keywords), default=0)
+
+        self.calls = 0
+        self._scan_ns = 0
+        logger.info(f"Compiled {len(self._rules)} rules with {len(keywords)} keywords ({self._matcher.kind} matcher)")
+
+    def analyze(self, text: str) -> List[Rule]:
+        """
+        Find the rules that fire for a prompt
+
+        Args:
+            text: Prompt text
+
+        Returns:
+            Firing rules in application order
+        """
+        started = time.perf_counter_ns()
+        present = self._matcher.find(text.lower())
+        self._scan_ns += time.perf_counter_ns() - started
+        return self._evaluate(present, text[-self._suffix_length:] if self._suffix_length else "")
+
+    def scanner(self) -> "RuleScanner":
+        """
+        Start analyzing a prompt that arrives in chunks
+        """
+        return RuleScanner(self)
+
+    def _evaluate(self, present: Set[int], tail: str) -> List[Rule]:
+        """
+        Decide which rules fire given the keywords found and the end of the prompt
+        """
+        self.calls += 1
+        fired = []
+        for compiled in self._rules:
+            started = time.perf_counter_ns()
+            rule = compiled.rule
+            if (
+                not (compiled.missing & present)
+                and (not compiled.present or compiled.present & present)
+                and not (rule.unless_endswith and tail.endswith(rule.unless_endswith))
+            ):
+                fired.append(rule)
+                compiled.hits += 1
+                present |= compiled.adds
+                if self._suffix_length:
+                    tail = (tail + rule.append)[-self._suffix_length:]
+            compiled.eval_ns += time.perf_counter_ns() - started
+        return fired
+
+    def apply(self, text: str, fired: Optional[Sequence[Rule]] = None) -> str:
+        """
+        Enhance a prompt
+
+        Args:
+            text: Prompt text
+            fired: Result of analyze() for the text, computed if None
+
+        Returns:
+            Enhanced prompt text
+        """
+        if fired is None:
+            fired = self.analyze(text)
+        if not fired:
+            return text
+        return "".join([text, *(rule.append for rule in fired)])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the per-rule hit counts and timings
+        """
+        calls = self.calls
+        return {
+            "type": "rule_engine",
+            "version": self.version,
+            "matcher": self._matcher.kind,
+            "keywords": len(self._matcher.keywords),
+            "calls": calls,
+            "avg_scan_us": self._scan_ns / calls / 1000 if calls else 0.0,
+            "rules": {
+                compiled.rule.name: {
+                    "hits": compiled.hits,
+                    "hit_rate": compiled.hits / calls if calls else 0.0,
+                    "avg_eval_us": compiled.eval_ns / calls / 1000 if calls else 0.0,
+                }
+                for compiled in self._rules
+            },
+        }
+
+class RuleScanner:
+    """
+    Incremental RuleEngine.analyze() for prompts too large to hold in memory.
+
+    Only the end of the text seen so far is kept, long enough for keywords
+    that span two chunks and for the suffix conditions.
+    """
+    def __init__(self, engine: RuleEngine):
+        self._engine = engine
+        self._present: Set[int] = set()
+        self._carry = ""
+        self._tail = ""
+        self.length = 0
+
+    def feed(self, chunk: str) -> None:
+        """
+        Scan the next chunk of the prompt
+        """
+        engine = self._engine
+        started = time.perf_counter_ns()
+        # Lowercasing maps each character on its own (final sigma aside, which no
+        # keyword contains), so chunks can be lowercased separately
+        lowered = self._carry + chunk.lower()
+        self._present |= engine._matcher.find(lowered)
+        keep = engine._keyword_length - 1
+        self._carry = lowered[-keep:] if keep > 0 else ""
+        if engine._suffix_length:
+            self._tail = (self._tail + chunk)[-engine._suffix_length:]
+        self.length += len(chunk)
+        engine._scan_ns += time.perf_counter_ns() - started
+
+    def finish(self) -> List[Rule]:
+        """
+        Find the rules that fire for the whole prompt
+
+        Returns:
+            Firing rules in application order
+        """
+        return self._engine._evaluate(set(self._present), self._tail)
+
+# Create singleton instance shared by the enhance service and the legacy router
+rule_engine = RuleEngine(DEFAULT_RULES)
@@ -1,7 +1,12 @@
 from fastapi import FastAPI
 import uvicorn
 import os
-from firebase_config import firebase_manager
+import sys
+
+# Добавляем родительскую директорию в PYTHONPATH
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.firebase_config import firebase_manager
 
 app = FastAPI()
 
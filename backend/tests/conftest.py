@@ -0,0 +1,22 @@
+import pytest
+from backend.config import firebase_config
+from backend.config.settings import settings
+from .fake_firestore import FakeFirestore
+
+# Repositories take their client when they are created, some of them on
+# import, so every repository in the tests shares this fake one
+fake_firestore = FakeFirestore()
+firebase_config.firebase_app = object()
+firebase_config.firestore_db = fake_firestore
+
+# No log file and no worker processes in tests
+settings.LOG_FILE = ""
+settings.ENHANCE_POOL_ENABLED = False
+
+@pytest.fixture
+def firestore_db() -> FakeFirestore:
+    """
+    The fake Firestore client, emptied for the test
+    """
+    fake_firestore.reset()
+    return fake_firestore
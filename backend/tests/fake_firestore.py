@@ -0,0 +1,269 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+import functools
+import itertools
+import operator
+import threading
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
+
+# Pseudo field that orders and filters by document ID
+DOCUMENT_ID = FieldPath.document_id()
+
+_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+@functools.total_ordering
+class FakeTimestamp:
+    """
+    Stored server timestamp, read back the way the repositories convert it
+
+    Orders against datetimes like Firestore timestamps do, for order_by and cursors.
+    """
+    def __init__(self, value: datetime):
+        self.value = value
+
+    def datetime(self) -> datetime:
+        return self.value
+
+    @staticmethod
+    def _plain(other: Any) -> Any:
+        return other.value if isinstance(other, FakeTimestamp) else other
+
+    def __eq__(self, other: Any) -> bool:
+        return self.value == self._plain(other)
+
+    def __lt__(self, other: Any) -> bool:
+        return self.value < self._plain(other)
+
+    def __hash__(self) -> int:
+        return hash(self.value)
+
+class FakeWriteResult:
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return self.id if field == DOCUMENT_ID else self._data.get(field)
+
+class FakeDocumentReference:
+    def __init__(self, collection: "FakeCollectionReference", doc_id: str):
+        self.db = collection.db
+        self.parent = collection
+        self.id = doc_id
+        self.path = f"{collection.path}/{doc_id}"
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return self.db.collection(f"{self.path}/{name}")
+
+    def get(self, timeout: Optional[float] = None, **kwargs) -> FakeSnapshot:
+        self.db.record("reads")
+        return FakeSnapshot(self, self.parent.docs.get(self.id))
+
+    def set(self, data: Dict[str, Any], timeout: Optional[float] = None, **kwargs) -> FakeWriteResult:
+        self.db.record("writes")
+        return self.db.apply([("set", self, data)])[0]
+
+    def update(self, data: Dict[str, Any], timeout: Optional[float] = None, **kwargs) -> FakeWriteResult:
+        self.db.record("writes")
+        return self.db.apply([("update", self, data)])[0]
+
+    def delete(self, option: Any = None, timeout: Optional[float] = None, **kwargs) -> FakeWriteResult:
+        self.db.record("writes")
+        return self.db.apply([("delete", self, option)])[0]
+
+class FakeQuery:
+    """
+    Immutable query over one collection, like the Firestore one
+    """
+    def __init__(self, collection: "FakeCollectionReference", **options):
+        self._collection = collection
+        self._filters: Tuple = options.get("filters", ())
+        self._orders: Tuple = options.get("orders", ())
+        self._limit: Optional[int] = options.get("limit")
+        self._offset: int = options.get("offset", 0)
+        self._start_after: Optional[Dict[str, Any]] = options.get("start_after")
+
+    def _copy(self, **changes) -> "FakeQuery":
+        options = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "offset": self._offset,
+            "start_after": self._start_after,
+        }
+        options.update(changes)
+        return FakeQuery(self._collection, **options)
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        return self._copy(filters=self._filters + ((field, _OPERATORS[op], value),))
+
+    def order_by(self, field: str, direction: str = firestore.Query.ASCENDING) -> "FakeQuery":
+        return self._copy(orders=self._orders + ((field, direction == firestore.Query.DESCENDING),))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit=count)
+
+    def offset(self, count: int) -> "FakeQuery":
+        return self._copy(offset=count)
+
+    def select(self, fields: Iterable[str]) -> "FakeQuery":
+        return self._copy()
+
+    def start_after(self, values: Dict[str, Any]) -> "FakeQuery":
+        return self._copy(start_after=dict(values))
+
+    def _after_cursor(self, snapshot: FakeSnapshot) -> bool:
+        for field, descending in self._orders:
+            value, cursor = snapshot.get(field), self._start_after.get(field)
+            if value != cursor:
+                return value < cursor if descending else value > cursor
+        return False
+
+    def stream(self, timeout: Optional[float] = None, **kwargs) -> List[FakeSnapshot]:
+        self._collection.db.record("reads")
+        with self._collection.db.lock:
+            snapshots = [
+                FakeSnapshot(FakeDocumentReference(self._collection, doc_id), data)
+                for doc_id, data in self._collection.docs.items()
+            ]
+        for field, compare, value in self._filters:
+            snapshots = [snapshot for snapshot in snapshots if compare(snapshot.get(field), value)]
+        snapshots.sort(key=lambda snapshot: snapshot.id)
+        for field, descending in reversed(self._orders):
+            snapshots.sort(key=lambda snapshot: snapshot.get(field), reverse=descending)
+        if self._start_after is not None:
+            snapshots = [snapshot for snapshot in snapshots if self._after_cursor(snapshot)]
+        snapshots = snapshots[self._offset:]
+        if self._limit is not None:
+            snapshots = snapshots[:self._limit]
+        return snapshots
+
+    def get(self, timeout: Optional[float] = None, **kwargs) -> List[FakeSnapshot]:
+        return self.stream(timeout=timeout)
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db: "FakeFirestore", path: str):
+        self.db = db
+        self.path = path
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        super().__init__(self)
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self, doc_id or f"doc{next(self.db.ids):06d}")
+
+class FakeWriteBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self.db = db
+        self.writes: List[Tuple[str, FakeDocumentReference, Any]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], **kwargs) -> None:
+        self.writes.append(("set", reference, data))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any], **kwargs) -> None:
+        self.writes.append(("update", reference, data))
+
+    def delete(self, reference: FakeDocumentReference, option: Any = None, **kwargs) -> None:
+        self.writes.append(("delete", reference, option))
+
+    def commit(self, timeout: Optional[float] = None, **kwargs) -> List[FakeWriteResult]:
+        if len(self.writes) > 500:
+            raise ValueError("A batch holds at most 500 writes")
+        number = self.db.record("commits")
+        self.db.record("writes")
+        self.db.batch_sizes.append(len(self.writes))
+        if self.db.fail_commit is not None and self.db.fail_commit(number):
+            raise RuntimeError(f"Commit {number} failed")
+        return self.db.apply(self.writes)
+
+class FakeFirestore:
+    """
+    In-memory stand-in for the Firestore client.
+
+    Counts RPCs: reads (document gets, multi-gets and queries), writes
+    (single-document writes and batch commits) and commits. fail_commit is
+    called with the 1-based number of each batch commit and fails it when it
+    returns True.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.collections: Dict[str, FakeCollectionReference] = {}
+            self.ids = itertools.count(1)
+            self.reads = 0
+            self.writes = 0
+            self.commits = 0
+            self.batch_sizes: List[int] = []
+            self.fail_commit: Optional[Callable[[int], bool]] = None
+
+    def record(self, counter: str) -> int:
+        with self.lock:
+            value = getattr(self, counter) + 1
+            setattr(self, counter, value)
+            return value
+
+    def collection(self, path: str) -> FakeCollectionReference:
+        with self.lock:
+            collection = self.collections.get(path)
+            if collection is None:
+                collection = self.collections[path] = FakeCollectionReference(self, path)
+            return collection
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def write_option(self, exists: Optional[bool] = None, **kwargs) -> Dict[str, Any]:
+        return {"exists": exists}
+
+    def get_all(self, references: Iterable[FakeDocumentReference], timeout: Optional[float] = None, **kwargs):
+        self.record("reads")
+        return [FakeSnapshot(reference, reference.parent.docs.get(reference.id)) for reference in references]
+
+    def apply(self, writes: List[Tuple[str, FakeDocumentReference, Any]]) -> List[FakeWriteResult]:
+        """
+        Apply writes atomically; SERVER_TIMESTAMP values become the commit time,
+        which is also the update_time of every WriteResult
+        """
+        with self.lock:
+            for kind, reference, argument in writes:
+                exists = reference.id in reference.parent.docs
+                if kind == "update" and not exists:
+                    raise NotFound(f"No document to update: {reference.path}")
+                if kind == "delete" and argument and argument.get("exists") and not exists:
+                    raise NotFound(f"No document to delete: {reference.path}")
+
+            commit_time = datetime.now(timezone.utc)
+            for kind, reference, argument in writes:
+                docs = reference.parent.docs
+                if kind == "delete":
+                    docs.pop(reference.id, None)
+                    continue
+                data = {
+                    name: FakeTimestamp(commit_time) if value is firestore.SERVER_TIMESTAMP else value
+                    for name, value in argument.items()
+                }
+                if kind == "set":
+                    docs[reference.id] = data
+                else:
+                    docs[reference.id].update(data)
+            return [FakeWriteResult(commit_time) for _ in writes]
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from backend.utils.bulk_delete import BulkDeleteError, BulkDeleter
+from .fake_firestore import FakeCollectionReference, FakeFirestore
+
+@pytest.fixture
+def deleter(request):
+    deleter = BulkDeleter(name=f"test.bulk_delete.{request.node.name}", page_size=100, batch_size=50, parallelism=1)
+    yield deleter
+    asyncio.run(deleter.stop())
+
+def seed(db: FakeFirestore, count: int) -> FakeCollectionReference:
+    collection = db.collection("users/user-1/history")
+    for number in range(count):
+        collection.document(f"doc{number:04d}").set({"number": number})
+    return collection
+
+def test_batch_size_is_capped_at_firestore_limit():
+    assert BulkDeleter(name="test.bulk_delete.cap", batch_size=1000).batch_size == 500
+
+def test_deletes_in_commits_of_at_most_500(firestore_db):
+    deleter = BulkDeleter(name="test.bulk_delete.chunks", page_size=1200)
+    collection = seed(firestore_db, 1300)
+    firestore_db.batch_sizes.clear()
+
+    progress = deleter.delete(firestore_db, collection, "history:user-1")
+
+    assert progress.done
+    assert progress.deleted == 1300
+    assert progress.pages == 2
+    assert sorted(firestore_db.batch_sizes) == [100, 200, 500, 500]
+    assert collection.docs == {}
+    asyncio.run(deleter.stop())
+
+def test_failed_commit_keeps_last_id_at_last_full_page(firestore_db, deleter):
+    collection = seed(firestore_db, 250)
+    # Commits 1-2 delete the first page, commit 3 is the first batch of the second
+    firestore_db.fail_commit = lambda number: number == 3
+
+    with pytest.raises(BulkDeleteError) as raised:
+        deleter.delete(firestore_db, collection, "history:user-1")
+
+    progress = raised.value.progress
+    assert not progress.done
+    assert progress.error
+    assert progress.pages == 1
+    assert progress.last_id == "doc0099"
+    assert progress.deleted == 250 - len(collection.docs)
+    assert deleter.stats()["deleted"] == progress.deleted
+    assert deleter.stats()["errors"] == 1
+
+    firestore_db.fail_commit = None
+    resumed = deleter.delete(firestore_db, collection, "history:user-1", resume_after=progress.last_id)
+
+    assert resumed.done
+    assert collection.docs == {}
+    assert progress.deleted + resumed.deleted == 250
+
+def test_should_stop_pauses_after_a_page(firestore_db, deleter):
+    collection = seed(firestore_db, 250)
+    pages = []
+
+    progress = deleter.delete(
+        firestore_db,
+        collection,
+        "history:user-1",
+        should_stop=lambda: len(pages) >= 1,
+        on_progress=lambda progress: pages.append(progress.last_id),
+    )
+
+    assert not progress.done
+    assert progress.deleted == 100
+    assert progress.last_id == "doc0099"
+    assert len(collection.docs) == 150
+    assert deleter.stats()["paused"] == 1
+    assert deleter.progress("history:user-1") is progress
+
+    resumed = deleter.delete(firestore_db, collection, "history:user-1", resume_after=progress.last_id)
+
+    assert resumed.done
+    assert resumed.deleted == 150
+    assert resumed.pages == 2
+    assert collection.docs == {}
+
+def test_resume_does_not_scan_deleted_keys(firestore_db, deleter):
+    collection = seed(firestore_db, 150)
+    reads = firestore_db.reads
+
+    progress = deleter.delete(firestore_db, collection, "history:user-1", resume_after="doc0099")
+
+    assert progress.done
+    assert progress.deleted == 50
+    assert firestore_db.reads - reads == 1
+    assert sorted(collection.docs) == [f"doc{number:04d}" for number in range(100)]
+
+def test_stats_do_not_name_users(firestore_db, deleter):
+    deleter.delete(firestore_db, seed(firestore_db, 10), "history:user-1")
+
+    assert "user-1" not in repr(deleter.stats())
@@ -0,0 +1,118 @@
+import struct
+import time
+from backend.config.settings import settings
+from backend.utils import caching
+from backend.utils.cache_snapshot import CacheSnapshot, encode_value, write_snapshot
+from backend.utils.caching import Cache
+
+def saved_cache(path: str, name: str) -> Cache:
+    cache = Cache(ttl=60, stale_ttl=0, name=name, persist=True)
+    cache.set("fresh", {"text": "kept"})
+    cache.set("short", "short lived", ttl=5)
+    cache.set("expired", "gone", ttl=0)
+    cache.save_snapshot(path)
+    return cache
+
+def test_restore_keeps_values_and_skips_expired_entries(tmp_path):
+    path = str(tmp_path / "enhance.snapshot")
+    saved_cache(path, "test.snapshot.saved")
+    restored = Cache(ttl=3600, name="test.snapshot.restored")
+
+    assert restored.restore_snapshot(path) == 2
+    assert restored.get("fresh") == {"text": "kept"}
+    assert restored.get("short") == "short lived"
+    assert restored.get("expired") is None
+
+def test_restored_entries_keep_their_expiration(tmp_path, monkeypatch):
+    path = str(tmp_path / "enhance.snapshot")
+    saved_cache(path, "test.snapshot.ttl_saved")
+    restored = Cache(ttl=3600, name="test.snapshot.ttl_restored")
+    restored.restore_snapshot(path)
+    later = time.time() + 10
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert restored.get("short") is None
+    assert restored.get("fresh") == {"text": "kept"}
+
+def test_values_are_decoded_on_first_access(tmp_path):
+    path = str(tmp_path / "enhance.snapshot")
+    write_snapshot(path, [
+        ("a", encode_value("first", None), time.time() + 60, time.time() + 60),
+        ("b", encode_value("second", None), time.time() + 60, time.time() + 60),
+    ])
+    snapshot = CacheSnapshot.open(path)
+
+    assert len(snapshot) == 2
+    assert snapshot.take("a")[0] == "first"
+    assert snapshot.take("a") is None
+    assert len(snapshot) == 1
+    assert not snapshot.closed
+    snapshot.take("b")
+    assert snapshot.closed
+
+def test_unread_restored_entries_are_saved_again(tmp_path):
+    first_path, second_path = str(tmp_path / "first.snapshot"), str(tmp_path / "second.snapshot")
+    saved_cache(first_path, "test.snapshot.chain_saved")
+    restored = Cache(ttl=3600, name="test.snapshot.chain_restored")
+    restored.restore_snapshot(first_path)
+    restored.set("new", "value")
+
+    assert restored.save_snapshot(second_path) == 3
+
+    again = Cache(ttl=3600, name="test.snapshot.chain_again")
+    again.restore_snapshot(second_path)
+    assert again.get("fresh") == {"text": "kept"}
+    assert again.get("new") == "value"
+
+def test_deleted_keys_are_not_restored(tmp_path):
+    path = str(tmp_path / "enhance.snapshot")
+    saved_cache(path, "test.snapshot.delete_saved")
+    restored = Cache(ttl=3600, name="test.snapshot.delete_restored")
+    restored.restore_snapshot(path)
+
+    restored.delete("fresh")
+
+    assert restored.get("fresh") is None
+
+def test_tagged_entries_need_current_tags(tmp_path):
+    path = str(tmp_path / "repository.snapshot")
+    cache = Cache(ttl=60, name="test.snapshot.tags_saved")
+    cache.set("doc", "value", tags=["user:1"])
+    cache.save_snapshot(path)
+    # Without a shared tier the restoring process cannot tell whether the tag was bumped
+    restored = Cache(ttl=60, name="test.snapshot.tags_restored")
+    restored.restore_snapshot(path)
+
+    assert restored.get("doc") is None
+
+def test_corrupt_and_foreign_snapshots_are_ignored(tmp_path):
+    path = str(tmp_path / "enhance.snapshot")
+    cache = Cache(ttl=60, name="test.snapshot.corrupt")
+
+    (tmp_path / "enhance.snapshot").write_bytes(b"short")
+    assert cache.restore_snapshot(path) == 0
+    assert CacheSnapshot.open(str(tmp_path / "missing.snapshot")) is None
+
+    saved_cache(path, "test.snapshot.corrupt_saved")
+    data = bytearray((tmp_path / "enhance.snapshot").read_bytes())
+    struct.pack_into("<H", data, 4, 99)  # format version
+    (tmp_path / "enhance.snapshot").write_bytes(bytes(data))
+    assert cache.restore_snapshot(path) == 0
+
+    struct.pack_into("<H", data, 4, 1)
+    struct.pack_into("<I", data, 6, 1000)  # entry count past the end of the index
+    (tmp_path / "enhance.snapshot").write_bytes(bytes(data))
+    assert cache.restore_snapshot(path) == 0
+    assert cache.get("fresh") is None
+
+def test_only_persistent_caches_are_snapshotted(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_SNAPSHOT_DIR", str(tmp_path))
+    persistent = Cache(ttl=60, name="test.snapshot.persistent", persist=True)
+    volatile = Cache(ttl=60, name="test.snapshot.volatile")
+    persistent.set("a", "1")
+    volatile.set("a", "1")
+
+    caching.save_cache_snapshots()
+
+    assert (tmp_path / f"{persistent.name}.snapshot").exists()
+    assert not (tmp_path / f"{volatile.name}.snapshot").exists()
@@ -0,0 +1,160 @@
+import asyncio
+from backend.utils.caching import Cache, estimate_size
+
+def entry_size(key: str, value: str) -> int:
+    return estimate_size(key) + estimate_size(value)
+
+def test_lru_eviction_keeps_within_byte_budget():
+    value = "x" * 1000
+    size = entry_size("a", value)
+    cache = Cache[str](shards=1, max_entries=100, max_bytes=3 * size)
+    for key in ("a", "b", "c"):
+        cache.set(key, value)
+    assert cache.get("a") == value  # a is now the most recently used
+
+    cache.set("d", value)
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == [value] * 3
+    assert cache.size_bytes <= 3 * size
+    assert cache.stats()["evictions"] == 1
+
+def test_value_larger_than_budget_is_rejected():
+    cache = Cache[str](shards=1, max_entries=10, max_bytes=1000)
+    cache.set("big", "x" * 2000)
+
+    assert cache.get("big") is None
+    assert len(cache) == 0
+    assert cache.stats()["rejections"] == 1
+
+def test_admission_rejects_key_colder_than_victim():
+    cache = Cache[str](shards=1, max_entries=1)
+    cache.set("hot", "1")
+    for _ in range(3):
+        assert cache.get("hot") == "1"
+
+    cache.set("cold", "2")
+    assert cache.get("hot") == "1"
+    assert cache.get("cold") is None
+    assert cache.stats()["rejections"] == 1
+
+    # Once looked up more often than the victim, the key is admitted
+    for _ in range(4):
+        cache.get("cold")
+    cache.set("cold", "2")
+    assert cache.get("cold") == "2"
+    assert cache.get("hot") is None
+
+def test_expired_entry_is_a_miss():
+    cache = Cache[str]()
+    cache.set("a", "1", ttl=0)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+def test_stale_entry_is_kept_for_stale_window():
+    cache = Cache[str](stale_ttl=60)
+    cache.set("a", "1", ttl=0)
+
+    assert cache.get("a") is None
+    assert cache.get_stale("a") == "1"
+    assert len(cache) == 1
+
+def test_remove_expired_sweeps_only_expired_entries():
+    cache = Cache[str]()
+    cache.set("a", "1", ttl=0)
+    cache.set("b", "2", ttl=0)
+    cache.set("c", "3")
+
+    assert cache.remove_expired() == 2
+    assert len(cache) == 1
+    assert cache.get("c") == "3"
+
+def test_invalidate_tag_drops_only_tagged_entries():
+    cache = Cache[str]()
+    cache.set("a", "1", tags=["user:1"])
+    cache.set("b", "2", tags=["user:1", "prompts"])
+    cache.set("c", "3", tags=["user:2"])
+
+    cache.invalidate_tag("user:1")
+
+    assert cache.get("a") is None
+    assert cache.get_stale("b") is None
+    assert cache.get("c") == "3"
+    assert cache.stats()["invalidations"] == 1  # get_stale peeks without counting
+
+def test_invalidation_during_load_wins():
+    cache = Cache[str]()
+    tokens = cache.tag_versions.snapshot(["user:1"])
+    cache.invalidate_tag("user:1")
+    cache.set("a", "read before the write", tags=tokens)
+
+    assert cache.get("a") is None
+
+def test_concurrent_misses_share_one_load():
+    cache = Cache[str]()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("a", loader) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert calls == 1
+    assert cache.get("a") == "value"
+
+def test_failed_load_is_shared_and_not_cached():
+    cache = Cache[str]()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("a", loader) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("a") is None
+
+def test_none_is_not_cached():
+    cache = Cache[str]()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        return None
+
+    async def run():
+        await cache.get_or_load("a", loader)
+        await cache.get_or_load("a", loader)
+
+    asyncio.run(run())
+    assert calls == 2
+
+def test_stale_entry_is_served_while_refreshing():
+    cache = Cache[str](stale_ttl=60)
+    cache.set("a", "old", ttl=0)
+
+    async def loader():
+        return "new"
+
+    async def run():
+        served = await cache.get_or_load("a", loader)
+        await asyncio.gather(*cache._refreshing.values())
+        return served
+
+    assert asyncio.run(run()) == "old"
+    assert cache.get("a") == "new"
+    assert cache.stats()["refreshes"] == 1
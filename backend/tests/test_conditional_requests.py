@@ -0,0 +1,99 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.config.settings import settings
+from backend.core.auth import get_current_user
+from backend.core.conditional import etag_matches, make_etag
+import backend.main as main
+
+USER_ID = "user-1"
+
+PROMPT_DATA = {
+    "prompt_name": "Greeting",
+    "prompt_description": "Says hello",
+    "prompt_text": "Hello {{name}}",
+    "color": "blue",
+}
+
+@pytest.fixture
+def client(firestore_db, monkeypatch):
+    monkeypatch.setattr(settings, "CONDITIONAL_REQUESTS_ENABLED", True)
+    monkeypatch.setattr(main, "initialize_firebase", lambda: None)
+    app = main.create_app()
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    with TestClient(app) as client:
+        yield client
+
+def test_etag_matching_follows_weak_comparison():
+    etag = make_etag("v1", "/prompts", 20)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("v2", "/prompts", 20), etag)
+    assert make_etag("v1", "/prompts", 50) != etag
+
+def test_list_answers_304_without_reading_firestore(client, firestore_db):
+    client.post("/prompts", json=PROMPT_DATA)
+    first = client.get("/prompts")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    reads = firestore_db.reads
+    second = client.get("/prompts", headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert firestore_db.reads == reads
+
+def test_list_etag_changes_with_writes_and_parameters(client):
+    etag = client.get("/prompts").headers["etag"]
+
+    assert client.get("/prompts?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+    client.post("/prompts", json=PROMPT_DATA)
+    response = client.get("/prompts", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["prompts"]) == 1
+
+def test_history_list_answers_304(client):
+    etag = client.get("/history").headers["etag"]
+
+    assert client.get("/history", headers={"If-None-Match": etag}).status_code == 304
+
+def test_detail_answers_if_none_match_and_if_modified_since(client):
+    prompt_id = client.post("/prompts", json=PROMPT_DATA).json()["id"]
+    first = client.get(f"/prompts/{prompt_id}")
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+    assert client.get(f"/prompts/{prompt_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/prompts/{prompt_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    client.put(f"/prompts/{prompt_id}", json={"color": "red"})
+
+    changed = client.get(f"/prompts/{prompt_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["color"] == "red"
+
+def test_if_none_match_takes_precedence_over_if_modified_since(client):
+    prompt_id = client.post("/prompts", json=PROMPT_DATA).json()["id"]
+    last_modified = client.get(f"/prompts/{prompt_id}").headers["last-modified"]
+
+    response = client.get(
+        f"/prompts/{prompt_id}",
+        headers={"If-None-Match": '"stale"', "If-Modified-Since": last_modified},
+    )
+
+    assert response.status_code == 200
+
+def test_no_validators_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "CONDITIONAL_REQUESTS_ENABLED", False)
+
+    response = client.get("/prompts", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
@@ -0,0 +1,100 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi.testclient import TestClient
+from backend.core.auth import get_current_user
+from backend.utils.cursors import decode_cursor, encode_cursor
+import backend.main as main
+from .fake_firestore import FakeTimestamp
+
+USER_ID = "user-1"
+
+def token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+@pytest.fixture
+def client(firestore_db, monkeypatch):
+    monkeypatch.setattr(main, "initialize_firebase", lambda: None)
+    app = main.create_app()
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    with TestClient(app) as client:
+        yield client
+
+def seed_prompts(firestore_db, count: int, same_time_every: int = 3):
+    # Every same_time_every prompts share a created_at, so the ID has to break ties
+    docs = firestore_db.collection(f"users/{USER_ID}/prompts").docs
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for number in range(count):
+        created_at = FakeTimestamp(start + timedelta(minutes=number // same_time_every))
+        docs[f"p{number:03d}"] = {
+            "prompt_name": f"Prompt {number}",
+            "prompt_description": "",
+            "prompt_text": "Hi",
+            "color": "blue",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+    return docs
+
+def test_cursor_round_trip():
+    value = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(value, "doc/with=odd+chars")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (value, "doc/with=odd+chars")
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    "abc",
+    token(["a list"]),
+    token({"v": 2, "t": "2024-01-01T00:00:00", "id": "p1"}),
+    token({"v": 1, "t": "2024-01-01T00:00:00"}),
+    token({"v": 1, "t": "yesterday", "id": "p1"}),
+    token({"v": 1, "id": "p1"}),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+def test_pages_cover_every_prompt_once(client, firestore_db):
+    docs = seed_prompts(firestore_db, 10)
+    seen, cursor, pages = [], None, 0
+
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/prompts", params=params).json()
+        seen += [prompt["id"] for prompt in body["prompts"]]
+        cursor, pages = body["next_cursor"], pages + 1
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert seen == sorted(docs, key=lambda doc_id: (docs[doc_id]["created_at"].value, doc_id), reverse=True)
+
+def test_last_full_page_has_no_cursor(client, firestore_db):
+    seed_prompts(firestore_db, 4)
+
+    first = client.get("/prompts", params={"limit": 2}).json()
+    second = client.get("/prompts", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+
+    assert len(second["prompts"]) == 2
+    assert second["next_cursor"] is None
+
+def test_cursor_pages_stay_stable_across_inserts(client, firestore_db):
+    docs = seed_prompts(firestore_db, 6)
+    first = client.get("/prompts", params={"limit": 3}).json()
+    docs["p999"] = dict(docs["p005"], created_at=FakeTimestamp(datetime(2030, 1, 1, tzinfo=timezone.utc)))
+
+    second = client.get("/prompts", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    assert [prompt["id"] for prompt in second["prompts"]] == ["p002", "p001", "p000"]
+
+@pytest.mark.parametrize("path", ["/prompts", "/history"])
+def test_malformed_cursor_is_a_bad_request(client, path):
+    response = client.get(path, params={"cursor": "not a cursor!"})
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.config.settings import settings
+from backend.core import deadline
+from backend.core.exceptions import DeadlineExceededException
+from backend.core.middleware import DeadlineMiddleware
+from backend.models.prompt import Prompt
+from backend.repositories.base import BaseRepository
+from backend.services.enhance_service import EnhanceService
+from backend.services.enhancer_provider import EnhancerProvider, RuleEnhancerProvider, enhance_cache
+from backend.utils.caching import Cache
+
+USER_ID = "user-1"
+
+class SlowProvider(EnhancerProvider):
+    """
+    Provider that must not be asked once the deadline is near
+    """
+    name = "slow"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def analyze(self, text: str) -> str:
+        self.calls += 1
+        return "slow answer"
+
+def run_with_deadline(budget: float, coroutine_function):
+    async def run():
+        tokens = deadline.start(budget)
+        try:
+            return await coroutine_function(), deadline.degraded_reasons()
+        finally:
+            deadline.reset(tokens)
+    return asyncio.run(run())
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware, routes={"/slow": 30.0}, default=5.0)
+
+    @app.get("/{path:path}")
+    async def remaining(path: str):
+        if path == "degraded":
+            deadline.mark_degraded("stale-data")
+        return {"remaining": deadline.remaining()}
+
+    with TestClient(app) as client:
+        yield client
+
+def test_timeout_for_is_capped_by_the_deadline():
+    assert deadline.timeout_for(5.0) == 5.0  # no deadline outside a request
+
+    async def within():
+        return deadline.timeout_for(5.0), deadline.timeout_for(0.5)
+
+    (capped, short), _ = run_with_deadline(2.0, within)
+    assert 1.5 < capped <= 2.0
+    assert short == 0.5
+
+    async def too_late():
+        return deadline.timeout_for(5.0, reserve=1.0)
+
+    with pytest.raises(DeadlineExceededException):
+        run_with_deadline(0.5, too_late)
+
+def test_middleware_budget_from_route_header_and_default(client):
+    assert 29.0 < client.get("/slow/page").json()["remaining"] <= 30.0
+    assert 4.0 < client.get("/other").json()["remaining"] <= 5.0
+    assert 1.0 < client.get("/other", headers={"X-Request-Timeout": "2"}).json()["remaining"] <= 2.0
+    assert client.get("/other", headers={"X-Request-Timeout": "1000"}).json()["remaining"] <= settings.DEADLINE_MAX
+    assert client.get("/other", headers={"X-Request-Timeout": "soon"}).json()["remaining"] > 4.0
+
+def test_middleware_reports_degraded_responses(client):
+    assert client.get("/degraded").headers["x-degraded"] == "stale-data"
+    assert "x-degraded" not in client.get("/other").headers
+
+def test_enhancement_falls_back_to_rules_near_the_deadline():
+    enhance_cache.clear()
+    provider = SlowProvider()
+    service = EnhanceService(provider=provider, fallback_provider=RuleEnhancerProvider())
+
+    enhanced, reasons = run_with_deadline(settings.DEADLINE_RESERVE / 2, lambda: service.enhance_text("Hi"))
+
+    assert enhanced == "Hi. Please provide specific examples. Make your response clear and concise."
+    assert provider.calls == 0
+    assert reasons == ["rules-only"]
+
+    enhanced, reasons = run_with_deadline(10.0, lambda: service.enhance_text("Hi"))
+
+    assert enhanced == "slow answer"
+    assert reasons == []
+
+def test_repository_serves_stale_data_near_the_deadline(firestore_db):
+    cache = Cache(ttl=0, stale_ttl=600, name="test.deadline.stale")
+    repository = BaseRepository("prompts", Prompt, cache=cache)
+    firestore_db.collection(f"users/{USER_ID}/prompts").document("p1").set({
+        "prompt_name": "Greeting", "prompt_description": "", "prompt_text": "Hi", "color": "blue",
+    })
+    run_with_deadline(10.0, lambda: repository.get_by_id(USER_ID, "p1"))
+    reads = firestore_db.reads
+
+    prompt, reasons = run_with_deadline(settings.DEADLINE_RESERVE / 2, lambda: repository.get_by_id(USER_ID, "p1"))
+
+    assert prompt.prompt_name == "Greeting"
+    assert reasons == ["stale-data"]
+    assert firestore_db.reads == reads
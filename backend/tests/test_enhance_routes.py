@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.config.settings import settings
+from backend.core.auth import get_current_user
+from backend.services.enhancer_provider import enhance_cache
+import backend.main as main
+
+USER_ID = "user-1"
+
+PROMPTS = [
+    "Summarise the report",
+    "Summarise the report. ",
+    "Give an example, keep it concise!",
+    "Be conciſe\n",
+]
+
+@pytest.fixture
+def client(firestore_db, monkeypatch):
+    monkeypatch.setattr(main, "initialize_firebase", lambda: None)
+    enhance_cache.clear()
+    app = main.create_app()
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    with TestClient(app) as client:
+        yield client
+
+@pytest.mark.parametrize("text", PROMPTS)
+def test_buffered_and_streamed_enhancements_match(client, text):
+    buffered = client.post("/enhance", json={"text": text})
+    streamed = client.post("/enhance/stream", content=text.encode("utf-8"))
+
+    assert buffered.status_code == streamed.status_code == 200
+    assert buffered.json()["enhancedText"] == streamed.text
+
+def test_oversized_prompt_is_rejected(client):
+    text = "x" * (settings.ENHANCE_MAX_PROMPT_CHARS + 1)
+
+    response = client.post("/enhance", json={"text": text})
+
+    assert response.status_code == 422
+
+def test_oversized_prompt_can_be_streamed(client, monkeypatch):
+    monkeypatch.setattr(settings, "ENHANCE_STREAM_CHUNK_SIZE", 1000)
+    text = "word " * (settings.ENHANCE_MAX_PROMPT_CHARS // 5 + 1) + "example"
+
+    response = client.post("/enhance/stream", content=text.encode("utf-8"))
+
+    assert response.status_code == 200
+    assert response.text == text + ". Make your response clear and concise."
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from backend.config.settings import settings
+from backend.core.auth import get_current_user
+from backend.models.history import HistoryEntry
+from backend.repositories.base import BaseRepository
+from backend.utils.caching import Cache
+import backend.main as main
+
+USER_ID = "user-1"
+
+PROMPT_DATA = {
+    "prompt_name": "Greeting",
+    "prompt_description": "Says hello",
+    "prompt_text": "Hello {{name}}",
+    "color": "blue",
+}
+
+@pytest.fixture
+def client(firestore_db, monkeypatch):
+    monkeypatch.setattr(main, "initialize_firebase", lambda: None)
+    app = main.create_app()
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    with TestClient(app) as client:
+        yield client
+
+def seed_history(firestore_db, count: int):
+    docs = firestore_db.collection(f"users/{USER_ID}/history").docs
+    for number in range(count):
+        docs[f"h{number}"] = {"original_prompt": f"prompt {number}", "enhanced_prompt": f"PROMPT {number}"}
+
+def test_prompts_by_id_keep_order_in_one_read(client, firestore_db):
+    first, second, third = (client.post("/prompts", json=dict(PROMPT_DATA, prompt_name=name)).json()["id"] for name in "abc")
+    reads = firestore_db.reads
+
+    body = client.get("/prompts", params={"ids": f"{third}, unknown,{first},{third}"}).json()
+
+    assert [prompt["id"] for prompt in body["prompts"]] == [third, first]
+    assert body["missing_ids"] == ["unknown"]
+    assert body["next_cursor"] is None
+    assert firestore_db.reads == reads + 1
+
+def test_prompts_by_id_reject_bad_id_lists(client, monkeypatch):
+    monkeypatch.setattr(settings, "REPOSITORY_GET_MANY_MAX_IDS", 2)
+
+    assert client.get("/prompts", params={"ids": " , "}).status_code == 400
+    assert client.get("/prompts", params={"ids": "a,b,c"}).status_code == 400
+    assert client.get("/prompts", params={"ids": "a", "cursor": "x"}).status_code == 400
+
+def test_history_lookup_keeps_order_in_one_read(client, firestore_db):
+    seed_history(firestore_db, 3)
+    reads = firestore_db.reads
+
+    response = client.post("/history/lookup", json={"ids": ["h2", "gone", "h0"]})
+
+    assert response.status_code == 200
+    assert [entry["id"] for entry in response.json()["history"]] == ["h2", "h0"]
+    assert response.json()["missing_ids"] == ["gone"]
+    assert firestore_db.reads == reads + 1
+
+def test_history_lookup_needs_ids(client):
+    assert client.post("/history/lookup", json={"ids": []}).status_code == 422
+
+def test_cached_and_missing_documents_are_not_read_again(firestore_db):
+    repository = BaseRepository("history", HistoryEntry, cache=Cache(ttl=60, name="test.get_many"))
+    seed_history(firestore_db, 2)
+
+    async def lookup_twice():
+        first = await repository.get_many(USER_ID, ["h0", "gone"])
+        reads = firestore_db.reads
+        second = await repository.get_many(USER_ID, ["gone", "h0", "h1"])
+        return first, second, firestore_db.reads - reads
+
+    (found, missing), (found_again, missing_again), reads = asyncio.run(lookup_twice())
+
+    assert [doc.id for doc in found] == ["h0"] and missing == ["gone"]
+    assert [doc.id for doc in found_again] == ["h0", "h1"] and missing_again == ["gone"]
+    assert reads == 1  # only h1
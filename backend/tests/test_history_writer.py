@@ -0,0 +1,219 @@
+import asyncio
+from typing import List, Tuple
+from backend.models.history import HistoryEntry
+from backend.services.enhance_service import EnhanceService
+from backend.services.enhancer_provider import RuleEnhancerProvider
+from backend.services.history_writer import HistoryWriter
+
+class FakeHistoryRepository:
+    """
+    Stands in for HistoryRepository; create_batch fails while fail_next > 0
+    """
+    def __init__(self, fail_next: int = 0):
+        self.fail_next = fail_next
+        self.batches: List[List[Tuple[str, str]]] = []
+        self.direct: List[Tuple[str, str]] = []
+        self.gate: asyncio.Event = None
+
+    @property
+    def written(self) -> List[str]:
+        return [prompt for batch in self.batches for _, prompt in batch]
+
+    async def create(self, user_id: str, entry: HistoryEntry) -> HistoryEntry:
+        self.direct.append((user_id, entry.original_prompt))
+        return entry
+
+    async def create_batch(self, items: List[Tuple[str, HistoryEntry]]) -> List[HistoryEntry]:
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise RuntimeError("commit failed")
+        self.batches.append([(user_id, entry.original_prompt) for user_id, entry in items])
+        return [entry for _, entry in items]
+
+def make_writer(repository: FakeHistoryRepository, **kwargs) -> HistoryWriter:
+    options = {"flush_interval": 60.0, "flush_size": 100, "enabled": True, "journal_path": None, "name": None}
+    options.update(kwargs)
+    return HistoryWriter(repository=repository, **options)
+
+async def submit_all(writer: HistoryWriter, prompts: List[str]) -> List[bool]:
+    return [await writer.submit("user-1", prompt, prompt.upper()) for prompt in prompts]
+
+def test_submit_writes_directly_until_started():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository)
+
+    assert asyncio.run(submit_all(writer, ["a"])) == [True]
+    assert repository.direct == [("user-1", "a")]
+    assert writer.written_direct == 1
+
+def test_stop_drains_the_queue_in_order():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository)
+
+    async def run():
+        writer.start()
+        accepted = await submit_all(writer, ["a", "b", "c"])
+        assert repository.batches == []  # nothing is due before the flush interval
+        await writer.stop()
+        return accepted
+
+    assert asyncio.run(run()) == [True] * 3
+    assert repository.written == ["a", "b", "c"]
+    assert not writer.running
+    assert writer.stats()["queued"] == 0
+
+def test_full_batch_is_flushed_without_waiting_for_interval():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository, flush_size=2)
+
+    async def run():
+        writer.start()
+        await submit_all(writer, ["a", "b"])
+        await asyncio.sleep(0.05)
+        written = list(repository.written)
+        await writer.stop()
+        return written
+
+    assert asyncio.run(run()) == ["a", "b"]
+
+def test_drop_oldest_overflow():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository, max_entries=2, overflow="drop_oldest")
+
+    async def run():
+        writer.start()
+        accepted = await submit_all(writer, ["a", "b", "c"])
+        await writer.stop()
+        return accepted
+
+    assert asyncio.run(run()) == [True] * 3
+    assert repository.written == ["b", "c"]
+    assert writer.dropped == 1
+
+def test_drop_newest_overflow():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository, max_entries=2, overflow="drop_newest")
+
+    async def run():
+        writer.start()
+        accepted = await submit_all(writer, ["a", "b", "c"])
+        await writer.stop()
+        return accepted
+
+    assert asyncio.run(run()) == [True, True, False]
+    assert repository.written == ["a", "b"]
+    assert writer.dropped == 1
+
+def test_block_overflow_waits_for_room_then_gives_up():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository, max_entries=1, flush_size=1, overflow="block", block_timeout=0.1)
+
+    async def run():
+        repository.gate = asyncio.Event()
+        writer.start()
+        # "b" waits until the flusher takes "a"; "c" times out while "a" is still being written
+        accepted = await submit_all(writer, ["a", "b", "c"])
+        repository.gate.set()
+        await writer.stop()
+        return accepted
+
+    assert asyncio.run(run()) == [True, True, False]
+    assert repository.written == ["a", "b"]
+    assert writer.dropped == 1
+
+def test_failed_flush_is_retried():
+    repository = FakeHistoryRepository(fail_next=1)
+    writer = make_writer(repository, flush_interval=0.01, max_retries=3)
+
+    async def run():
+        writer.start()
+        await submit_all(writer, ["a", "b"])
+        await writer.stop()
+
+    asyncio.run(run())
+    assert repository.written == ["a", "b"]
+    assert writer.failed_flushes == 1
+    assert writer.dropped == 0
+
+def test_entries_are_dropped_after_max_retries():
+    repository = FakeHistoryRepository(fail_next=100)
+    writer = make_writer(repository, flush_interval=0.01, max_retries=2)
+
+    async def run():
+        writer.start()
+        await submit_all(writer, ["a", "b"])
+        await writer.stop()
+
+    asyncio.run(run())
+    assert repository.written == []
+    assert writer.failed_flushes == 2
+    assert writer.dropped == 2
+    assert writer.stats()["queued"] == 0
+
+def test_journal_replays_unacknowledged_entries_after_crash(tmp_path):
+    journal_path = str(tmp_path / "history.journal")
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository, flush_size=2, journal_path=journal_path)
+
+    async def crash():
+        writer.start()
+        await asyncio.sleep(0)  # let the flusher start waiting
+        await submit_all(writer, ["a", "b", "c"])
+        while writer.flushes < 1:
+            await asyncio.sleep(0.01)
+        # The process dies with "c" still queued: no stop(), no final flush
+        writer._task.cancel()
+
+    asyncio.run(crash())
+    assert repository.written == ["a", "b"]
+
+    restarted_repository = FakeHistoryRepository()
+    restarted = make_writer(restarted_repository, journal_path=journal_path)
+
+    async def restart():
+        restarted.start()
+        await restarted.stop()
+
+    asyncio.run(restart())
+    assert restarted_repository.batches == [[("user-1", "c")]]
+
+    # Everything is acknowledged now, so nothing is replayed again
+    assert make_writer(FakeHistoryRepository(), journal_path=journal_path)._journal.replay() == []
+
+def test_dropped_entries_are_acknowledged_in_journal(tmp_path):
+    journal_path = str(tmp_path / "history.journal")
+    writer = make_writer(FakeHistoryRepository(), max_entries=1, overflow="drop_oldest", journal_path=journal_path)
+
+    async def crash():
+        writer.start()
+        await submit_all(writer, ["a", "b"])
+        writer._task.cancel()
+
+    asyncio.run(crash())
+    replayed = make_writer(FakeHistoryRepository(), journal_path=journal_path)._journal.replay()
+    assert [pending.entry.original_prompt for pending in replayed] == ["b"]
+
+def test_batch_enhancement_is_queued_in_the_writer():
+    repository = FakeHistoryRepository()
+    writer = make_writer(repository)
+    service = EnhanceService(provider=RuleEnhancerProvider())
+    service.history_writer = writer
+
+    async def run():
+        writer.start()
+        outcomes = await service.enhance_batch(["a", "b", "a"], "user-1")
+        assert writer.stats()["queued"] == 2
+        await writer.stop()
+        return outcomes
+
+    outcomes = asyncio.run(run())
+
+    assert [enhanced for enhanced, _ in outcomes] == [
+        "a. Please provide specific examples. Make your response clear and concise.",
+        "b. Please provide specific examples. Make your response clear and concise.",
+        "a. Please provide specific examples. Make your response clear and concise.",
+    ]
+    assert repository.batches == [[("user-1", "a"), ("user-1", "b")]]
+    assert repository.direct == []
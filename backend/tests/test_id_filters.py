@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from backend.config.settings import settings
+from backend.models.prompt import Prompt
+from backend.repositories.base import BaseRepository
+from backend.utils.bloom_filter import BloomFilter
+from backend.utils.caching import Cache
+from .fake_firestore import FakeTimestamp
+
+USER_ID = "user-1"
+
+def new_prompt(name: str = "Greeting") -> Prompt:
+    return Prompt(prompt_name=name, prompt_description="", prompt_text="Hi", color="blue")
+
+def make_repository(name: str) -> BaseRepository:
+    return BaseRepository("prompts", Prompt, cache=Cache(ttl=60, name=f"test.id_filters.{name}"))
+
+def seed_prompt(firestore_db, doc_id: str) -> None:
+    firestore_db.collection(f"users/{USER_ID}/prompts").docs[doc_id] = {
+        "prompt_name": doc_id, "prompt_description": "", "prompt_text": "Hi", "color": "blue",
+        "created_at": FakeTimestamp(datetime.now(timezone.utc)),
+    }
+
+@pytest.fixture
+def id_filters_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "REPOSITORY_ID_FILTER_ENABLED", True)
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    for number in range(1000):
+        bloom.add(f"doc{number}")
+
+    assert all(f"doc{number}" in bloom for number in range(1000))
+    false_positives = sum(f"other{number}" in bloom for number in range(10000))
+    assert false_positives < 300
+    assert 0.005 < bloom.expected_false_positive_rate() < 0.02
+
+def test_missing_document_is_not_read_again(firestore_db):
+    repository = make_repository("negative")
+
+    async def lookups():
+        first = await repository.get_by_id(USER_ID, "gone")
+        reads = firestore_db.reads
+        second = await repository.get_by_id(USER_ID, "gone")
+        with pytest.raises(ValueError):
+            await repository.update(USER_ID, "gone", new_prompt())
+        with pytest.raises(ValueError):
+            await repository.delete(USER_ID, "gone")
+        return first, second, firestore_db.reads - reads
+
+    first, second, reads = asyncio.run(lookups())
+
+    assert first is None and second is None
+    assert reads == 0
+
+def test_missing_document_is_read_again_after_the_ttl(firestore_db, monkeypatch):
+    monkeypatch.setattr(settings, "REPOSITORY_NEGATIVE_CACHE_TTL", 0)
+    repository = make_repository("negative_ttl")
+
+    async def lookups():
+        await repository.get_by_id(USER_ID, "late")
+        seed_prompt(firestore_db, "late")
+        return await repository.get_by_id(USER_ID, "late")
+
+    assert asyncio.run(lookups()).prompt_name == "late"
+
+def test_bulk_delete_forgets_missing_documents(firestore_db):
+    repository = make_repository("negative_delete_all")
+
+    async def lookups():
+        await repository.get_by_id(USER_ID, "late")
+        seed_prompt(firestore_db, "late")
+        await repository.delete_all(USER_ID)
+        seed_prompt(firestore_db, "late")
+        return await repository.get_by_id(USER_ID, "late")
+
+    assert asyncio.run(lookups()).prompt_name == "late"
+
+def test_unknown_ids_are_rejected_after_a_complete_listing(firestore_db, id_filters_enabled):
+    repository = make_repository("filter")
+    seed_prompt(firestore_db, "p1")
+
+    async def lookups():
+        await repository.get_all(USER_ID)
+        reads = firestore_db.reads
+        unknown = await repository.get_by_id(USER_ID, "unknown")
+        _, missing = await repository.get_many(USER_ID, ["other"])
+        return unknown, missing, firestore_db.reads - reads
+
+    unknown, missing, reads = asyncio.run(lookups())
+
+    assert unknown is None and missing == ["other"]
+    assert reads == 0
+    assert repository.id_filters.rejections == 2
+
+def test_created_ids_pass_the_filter(firestore_db, id_filters_enabled):
+    repository = make_repository("filter_create")
+
+    async def create_and_read():
+        await repository.get_all(USER_ID)
+        created = await repository.create(USER_ID, new_prompt())
+        return created.id, await repository.get_by_id(USER_ID, created.id)
+
+    created_id, found = asyncio.run(create_and_read())
+
+    assert found is not None and found.id == created_id
+    assert repository.id_filters.is_current(USER_ID)
+
+def test_filter_is_not_trusted_after_a_write_elsewhere(firestore_db, id_filters_enabled):
+    repository = make_repository("filter_stale")
+
+    async def lookups():
+        await repository.get_all(USER_ID)
+        # Another worker sharing the tag versions writes a document
+        seed_prompt(firestore_db, "p2")
+        repository.versions.bump(repository._list_tag(USER_ID))
+        return await repository.get_by_id(USER_ID, "p2")
+
+    assert asyncio.run(lookups()).prompt_name == "p2"
+    assert not repository.id_filters.is_current(USER_ID)
+
+def test_partial_listings_do_not_build_a_filter(firestore_db, id_filters_enabled):
+    repository = make_repository("filter_partial")
+    seed_prompt(firestore_db, "p1")
+    seed_prompt(firestore_db, "p2")
+
+    asyncio.run(repository.get_all(USER_ID, limit=1))
+
+    assert not repository.id_filters.is_current(USER_ID)
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from backend.services.enhancer_provider import EnhancerProvider, NearDuplicateProvider, RuleEnhancerProvider, enhance_cache
+
+PROMPT = "Summarise the quarterly sales figures for the north region team"
+
+class EchoProvider(EnhancerProvider):
+    """
+    Transferable provider counting its calls
+    """
+    name = "echo"
+    transferable = True
+
+    def __init__(self):
+        self.calls = 0
+
+    async def analyze(self, text: str) -> str:
+        self.calls += 1
+        return f"Enhanced: {text}"
+
+@pytest.fixture(autouse=True)
+def empty_enhance_cache():
+    enhance_cache.clear()
+    yield
+    enhance_cache.clear()
+
+def test_rule_analyses_are_not_reused_for_similar_prompts():
+    provider = NearDuplicateProvider(RuleEnhancerProvider(), name="near_dup_rules")
+
+    async def enhance_both():
+        return await provider.enhance(PROMPT), await provider.enhance(PROMPT + ".")
+
+    first, second = asyncio.run(enhance_both())
+
+    assert first == PROMPT + ". Please provide specific examples. Make your response clear and concise."
+    assert second == PROMPT + ". Please provide specific examples. Make your response clear and concise."
+    assert provider.near_hits == provider.exact_hits == 0
+    assert provider.skipped == 2
+
+def test_transferable_analyses_are_reused_for_similar_prompts():
+    inner = EchoProvider()
+    provider = NearDuplicateProvider(inner, verify_rate=0, name="near_dup_echo")
+
+    async def enhance_both():
+        return await provider.enhance(PROMPT), await provider.enhance(PROMPT + ".")
+
+    first, second = asyncio.run(enhance_both())
+
+    assert first == second == f"Enhanced: {PROMPT}"
+    assert inner.calls == 1
+    assert provider.near_hits == 1
+
+def test_long_prompts_bypass_the_layer():
+    inner = EchoProvider()
+    provider = NearDuplicateProvider(inner, max_chars=len(PROMPT), name="near_dup_long")
+
+    asyncio.run(provider.enhance(PROMPT))
+
+    assert provider.skipped == 1
+    assert provider.lookups == 0
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from backend.core.auth import get_current_user
+from backend.models.history import HistoryEntry
+from backend.models.prompt import Prompt
+from backend.repositories.history_repository import HistoryRepository
+from backend.repositories.prompt_repository import PromptRepository
+from backend.services.prompt_service import PromptService
+import backend.main as main
+
+USER_ID = "user-1"
+
+PROMPT_DATA = {
+    "prompt_name": "Greeting",
+    "prompt_description": "Says hello",
+    "prompt_text": "Hello {{name}}",
+    "color": "blue",
+}
+
+def make_prompt(**changes) -> Prompt:
+    return Prompt(**{**PROMPT_DATA, **changes})
+
+@pytest.fixture
+def client(firestore_db, monkeypatch):
+    monkeypatch.setattr(main, "initialize_firebase", lambda: None)
+    app = main.create_app()
+    app.dependency_overrides[get_current_user] = lambda: USER_ID
+    with TestClient(app) as client:
+        yield client
+
+def count_rpcs(db, coroutine):
+    reads, writes = db.reads, db.writes
+    result = asyncio.run(coroutine)
+    return result, db.reads - reads, db.writes - writes
+
+def test_update_is_one_write_without_read(firestore_db):
+    repository = PromptRepository()
+    created = asyncio.run(repository.create(USER_ID, make_prompt()))
+
+    updated, reads, writes = count_rpcs(
+        firestore_db, repository.update(USER_ID, created.id, make_prompt(color="red"), ["color"])
+    )
+
+    assert (reads, writes) == (0, 1)
+    assert updated.id == created.id
+    stored = firestore_db.collection(f"users/{USER_ID}/prompts").docs[created.id]
+    assert stored["color"] == "red"
+    assert stored["prompt_name"] == "Greeting"
+
+def test_delete_is_one_write_without_read(firestore_db):
+    repository = HistoryRepository()
+    created = asyncio.run(repository.create(USER_ID, HistoryEntry(original_prompt="a", enhanced_prompt="b", user_id=USER_ID)))
+
+    _, reads, writes = count_rpcs(firestore_db, repository.delete(USER_ID, created.id))
+
+    assert (reads, writes) == (0, 1)
+    assert firestore_db.collection(f"users/{USER_ID}/history").docs == {}
+
+def test_update_of_missing_document_raises_value_error(firestore_db):
+    repository = PromptRepository()
+    reads, writes = firestore_db.reads, firestore_db.writes
+
+    with pytest.raises(ValueError):
+        asyncio.run(repository.update(USER_ID, "missing", make_prompt()))
+
+    assert (firestore_db.reads - reads, firestore_db.writes - writes) == (0, 1)
+    assert firestore_db.collection(f"users/{USER_ID}/prompts").docs == {}
+
+def test_delete_of_missing_document_raises_value_error(firestore_db):
+    repository = HistoryRepository()
+    reads, writes = firestore_db.reads, firestore_db.writes
+
+    with pytest.raises(ValueError):
+        asyncio.run(repository.delete(USER_ID, "missing"))
+
+    assert (firestore_db.reads - reads, firestore_db.writes - writes) == (0, 1)
+
+def test_full_prompt_update_is_not_read_back(firestore_db):
+    service = PromptService()
+    created = asyncio.run(service.create_prompt(USER_ID, dict(PROMPT_DATA)))
+
+    updated, reads, writes = count_rpcs(
+        firestore_db, service.update_prompt(USER_ID, created.id, {**PROMPT_DATA, "prompt_text": "Bye {{name}}"})
+    )
+
+    assert (reads, writes) == (0, 1)
+    assert updated.prompt_text == "Bye {{name}}"
+    assert [variable.name for variable in updated.variables] == ["name"]
+
+def test_partial_prompt_update_is_one_write_without_read(firestore_db):
+    service = PromptService()
+    created = asyncio.run(service.create_prompt(USER_ID, dict(PROMPT_DATA)))
+
+    updated, reads, writes = count_rpcs(firestore_db, service.update_prompt(USER_ID, created.id, {"color": "red"}))
+
+    assert (reads, writes) == (0, 1)
+    assert updated.model_fields_set == {"id", "updated_at", "color"}
+    assert (updated.id, updated.color) == (created.id, "red")
+    stored = firestore_db.collection(f"users/{USER_ID}/prompts").docs[created.id]
+    assert (stored["color"], stored["prompt_name"]) == ("red", "Greeting")
+    assert [variable["name"] for variable in stored["variables"]] == ["name"]
+
+def test_routes_answer_404_for_missing_documents(client):
+    assert client.put("/prompts/missing", json=PROMPT_DATA).status_code == 404
+    assert client.put("/prompts/missing", json={"color": "red"}).status_code == 404
+    assert client.delete("/prompts/missing").status_code == 404
+    assert client.delete("/history/missing").status_code == 404
+
+def test_routes_update_and_delete_existing_prompt(client, firestore_db):
+    prompt_id = client.post("/prompts", json=PROMPT_DATA).json()["id"]
+
+    response = client.put(f"/prompts/{prompt_id}", json={"prompt_name": "Hi"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"id", "updated_at", "prompt_name"}
+    assert response.json()["prompt_name"] == "Hi"
+    assert client.get(f"/prompts/{prompt_id}").json()["prompt_text"] == "Hello {{name}}"
+
+    assert client.delete(f"/prompts/{prompt_id}").status_code == 204
+    assert client.delete(f"/prompts/{prompt_id}").status_code == 404
@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from backend.services.enhancer_provider import RuleEnhancerProvider, enhance_cache
+from backend.services.rule_engine import DEFAULT_RULES, KeywordMatcher, Rule, RuleEngine, rule_engine
+
+def baseline_enhance(text: str) -> str:
+    # The enhancement as it shipped before the rule engine
+    enhanced_text = text
+    if not enhanced_text.endswith((".", "!", "?")):
+        enhanced_text += "."
+    if "example" not in enhanced_text.lower():
+        enhanced_text += " Please provide specific examples."
+    if "clear" not in enhanced_text.lower() and "concise" not in enhanced_text.lower():
+        enhanced_text += " Make your response clear and concise."
+    return enhanced_text
+
+PROMPTS = [
+    "",
+    "Summarise the report",
+    "Summarise the report.",
+    "Summarise the report. ",
+    "Summarise the report.\n",
+    "Summarise  the\treport",
+    "Why?",
+    "Stop!",
+    "Give an EXAMPLE of recursion",
+    "Keep it Clear",
+    "Be conciſe",
+    "Show an examplé please",
+    "Summarise the report。",
+    "Explain the north region team",
+    "Explain the north region team.",
+]
+
+@pytest.fixture(autouse=True)
+def empty_enhance_cache():
+    enhance_cache.clear()
+    yield
+    enhance_cache.clear()
+
+@pytest.mark.parametrize("text", PROMPTS)
+def test_rule_engine_matches_baseline(text):
+    assert rule_engine.apply(text) == baseline_enhance(text)
+
+@pytest.mark.parametrize("text", PROMPTS)
+def test_provider_matches_baseline(text):
+    provider = RuleEnhancerProvider()
+    assert asyncio.run(provider.enhance(text)) == baseline_enhance(text)
+
+def test_prompts_differing_in_whitespace_are_not_shared():
+    provider = RuleEnhancerProvider()
+
+    first = asyncio.run(provider.enhance("Summarise the report."))
+    second = asyncio.run(provider.enhance("Summarise the report. "))
+
+    assert first == "Summarise the report. Please provide specific examples. Make your response clear and concise."
+    assert second == "Summarise the report. . Please provide specific examples. Make your response clear and concise."
+
+@pytest.mark.parametrize("text", PROMPTS)
+@pytest.mark.parametrize("size", [1, 3, 7])
+def test_chunked_scan_matches_baseline(text, size):
+    scanner = rule_engine.scanner()
+    for start in range(0, len(text), size):
+        scanner.feed(text[start:start + size])
+
+    assert rule_engine.apply(text, scanner.finish()) == baseline_enhance(text)
+
+def test_custom_rules_apply_in_order_and_see_earlier_appends():
+    engine = RuleEngine([
+        Rule("ask_for_code", " Include code.", when_present=("python", "sql")),
+        Rule("explain_code", " Explain the code.", when_present=("code",)),
+        Rule("question_mark", "?", unless_endswith=("?", ".")),
+        Rule("no_bullets", " Avoid bullet points.", when_missing=("bullet",)),
+    ], version=7)
+
+    assert engine.apply("Write Python") == "Write Python Include code. Explain the code. Avoid bullet points."
+    assert engine.apply("Use bullets") == "Use bullets?"
+    assert engine.version == 7
+
+def test_large_keyword_sets_match_like_small_ones():
+    keywords = [f"keyword{number}" for number in range(40)]
+    matcher = KeywordMatcher(keywords)
+    substring = KeywordMatcher(keywords[:5])
+    text = "keyword3 and keyword39 but not keyword"
+
+    assert matcher.find(text) == {3, 39}
+    assert substring.find(text) == {3}
+    assert substring.kind == "substring"
+
+def test_keyword_split_across_chunks_is_found():
+    scanner = rule_engine.scanner()
+    for chunk in ("Show an exa", "mple, keep it con", "cise"):
+        scanner.feed(chunk)
+
+    assert rule_engine.apply("", scanner.finish()) == "."
+    assert scanner.length == len("Show an example, keep it concise")
+
+def test_stats_count_rule_hits():
+    engine = RuleEngine(DEFAULT_RULES)
+    engine.apply("Be clear.")
+    engine.apply("Give an example")
+
+    stats = engine.stats()
+
+    assert stats["calls"] == 2
+    assert {name: rule["hits"] for name, rule in stats["rules"].items()} == {
+        "terminal_punctuation": 1,
+        "specific_examples": 1,
+        "clear_and_concise": 1,
+    }
@@ -0,0 +1,50 @@
+import os
+from backend.utils.caching import TagVersions
+from backend.utils.shared_cache import SharedMemoryCache
+
+def test_same_geometry_shares_the_table(tmp_path):
+    path = str(tmp_path / "cache")
+    first = SharedMemoryCache(path, slots=64, slot_size=256)
+    first.set("key", "value", 60)
+
+    second = SharedMemoryCache(path, slots=64, slot_size=256)
+
+    assert second.get("key")[0] == "value"
+    first.close()
+    second.close()
+
+def test_new_geometry_replaces_file_without_touching_old_mapping(tmp_path):
+    path = str(tmp_path / "cache")
+    old = SharedMemoryCache(path, slots=64, slot_size=256)
+    old.set("key", "value", 60)
+    old_inode = os.stat(path).st_ino
+
+    new = SharedMemoryCache(path, slots=16, slot_size=128)
+
+    assert os.stat(path).st_ino != old_inode
+    assert os.path.getsize(path) == new.size
+    assert new.get("key") is None
+    # The old mapping still covers a whole file
+    assert old.get("key")[0] == "value"
+    old.set("other", "value", 60)
+    assert sorted(os.listdir(tmp_path)) == ["cache"]
+    old.close()
+    new.close()
+
+def test_tag_versions_reuse_shared_token_for_local_ttl(tmp_path):
+    shared = SharedMemoryCache(str(tmp_path / "cache"), slots=64, slot_size=256)
+    reader = TagVersions("versions", max_tags=10, l2=shared, local_ttl=60)
+    writer = TagVersions("versions", max_tags=10, l2=shared, local_ttl=60)
+    token = reader.current("tag")
+    hits = shared.hits
+
+    assert reader.current("tag") == token
+    assert shared.hits == hits
+
+    bumped = writer.bump("tag")
+    assert writer.current("tag") == bumped
+    assert reader.current("tag") == token  # until its copy is local_ttl old
+
+    reader.local_ttl = 0
+    assert reader.current("tag") == bumped
+    shared.close()
@@ -0,0 +1,77 @@
+import asyncio
+from backend.core import deadline
+from backend.core.exceptions import DeadlineExceededException
+from backend.models.prompt import Prompt
+from backend.repositories.prompt_repository import PromptRepository
+from backend.utils.caching import Cache, SingleFlight
+
+async def with_deadline(budget: float, coroutine):
+    tokens = deadline.start(budget)
+    try:
+        return await coroutine
+    finally:
+        deadline.reset(tokens)
+
+def test_shared_load_is_bound_to_no_callers_deadline():
+    flight = SingleFlight()
+    seen = []
+
+    async def load():
+        seen.append(deadline.remaining())
+        await asyncio.sleep(0.2)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(
+            with_deadline(0.05, flight.do("key", load)),
+            with_deadline(5.0, flight.do("key", load)),
+            return_exceptions=True,
+        )
+
+    short, long = asyncio.run(run())
+    assert isinstance(short, DeadlineExceededException)
+    assert long == "value"
+    assert seen == [None]
+    assert (flight.calls, flight.coalesced, flight.timeouts) == (1, 1, 1)
+
+def test_get_or_load_waiter_keeps_its_own_deadline():
+    cache = Cache[str]()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(
+            with_deadline(5.0, cache.get_or_load("a", loader)),
+            with_deadline(0.05, cache.get_or_load("a", loader)),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(run())
+    assert first == "value"
+    assert isinstance(second, DeadlineExceededException)
+    assert calls == 1
+    assert cache.get("a") == "value"
+
+def test_concurrent_repository_reads_share_one_firestore_read(firestore_db):
+    repository = PromptRepository()
+    assert repository.cache is None
+    created = asyncio.run(repository.create("user-1", Prompt(
+        prompt_name="n", prompt_description="d", prompt_text="t", color="c",
+    )))
+    reads = firestore_db.reads
+
+    async def run():
+        return await asyncio.gather(
+            with_deadline(5.0, repository.get_by_id("user-1", created.id)),
+            with_deadline(2.0, repository.get_by_id("user-1", created.id)),
+            repository.get_by_id("user-1", created.id),
+        )
+
+    results = asyncio.run(run())
+    assert [prompt.id for prompt in results] == [created.id] * 3
+    assert firestore_db.reads - reads == 1
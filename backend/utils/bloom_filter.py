@@ -0,0 +1,211 @@
+from typing import Any, Dict, Iterable, Mapping, Optional
+from collections import OrderedDict
+import hashlib
+import math
+import threading
+from .caching import TagVersions, cache_registry
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings.
+
+    Membership tests may return false positives at roughly the configured
+    rate once `capacity` items were added, but never false negatives.
+    Items cannot be removed.
+    """
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(1, capacity)
+        false_positive_rate = min(max(false_positive_rate, 1e-9), 0.5)
+
+        self.capacity = capacity
+        self.bit_count = max(8, math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.bit_count + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.bit_count
+
+    def add(self, item: str) -> None:
+        """
+        Add an item to the filter
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    def expected_false_positive_rate(self) -> float:
+        """
+        False-positive rate expected for the number of items added so far
+        """
+        return (1 - math.exp(-self.hash_count * self.count / self.bit_count)) ** self.hash_count
+
+class _KeyedFilter:
+    """
+    Bloom filter of one key together with the tag tokens it was built under
+    """
+    __slots__ = ("bloom", "tokens")
+
+    def __init__(self, bloom: BloomFilter, tokens: Dict[str, str]):
+        self.bloom = bloom
+        self.tokens = tokens
+
+class KeyedBloomFilters:
+    """
+    Bounded LRU map of Bloom filters, e.g. of existing document IDs per user.
+
+    Each filter is built from a complete listing and stores the tag tokens
+    taken before that listing was read. A filter is only consulted while
+    its tokens are current, so any write that invalidates the tags (in any
+    worker sharing the tag versions) makes it fall back to a real lookup.
+    """
+    def __init__(
+        self,
+        tag_versions: TagVersions,
+        false_positive_rate: float,
+        max_keys: int,
+        name: Optional[str] = None,
+    ):
+        self.tag_versions = tag_versions
+        self.false_positive_rate = false_positive_rate
+        self.max_keys = max_keys
+        self._filters: "OrderedDict[str, _KeyedFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.builds = 0
+        self.checks = 0
+        self.rejections = 0
+        self.false_positives = 0
+
+        self.name = cache_registry.register(name, self)
+
+    def _current(self, key: str) -> Optional[_KeyedFilter]:
+        with self._lock:
+            keyed = self._filters.get(key)
+            if keyed is not None:
+                self._filters.move_to_end(key)
+        if keyed is None:
+            return None
+        if not self.tag_versions.is_current(keyed.tokens):
+            self.discard(key)
+            return None
+        return keyed
+
+    def build(self, key: str, items: Iterable[str], tokens: Mapping[str, str]) -> None:
+        """
+        Replace the filter of a key with one built from a complete listing
+
+        Args:
+            key: Filter key
+            items: Every item that currently exists for the key
+            tokens: Tag tokens snapshotted before the listing was read
+        """
+        items = list(items)
+        # Leave room for items added after the build before the rate degrades
+        bloom = BloomFilter(max(64, len(items) * 2), self.false_positive_rate)
+        for item in items:
+            bloom.add(item)
+
+        with self._lock:
+            self._filters[key] = _KeyedFilter(bloom, dict(tokens))
+            self._filters.move_to_end(key)
+            while len(self._filters) > self.max_keys:
+                self._filters.popitem(last=False)
+            self.builds += 1
+
+    def is_current(self, key: str) -> bool:
+        """
+        Whether the key has a filter that is still valid
+        """
+        return self._current(key) is not None
+
+    def add(self, key: str, item: str, tokens: Mapping[str, str]) -> None:
+        """
+        Add an item written by this process and move the filter to new tag tokens.
+        Only call this if the filter was current right before the write's invalidation.
+        """
+        with self._lock:
+            keyed = self._filters.get(key)
+            if keyed is None:
+                return
+            if keyed.bloom.count >= keyed.bloom.capacity:
+                # Over capacity the false-positive rate climbs; wait for the next rebuild
+                del self._filters[key]
+                return
+            keyed.bloom.add(item)
+            keyed.tokens = dict(tokens)
+
+    def retag(self, key: str, tokens: Mapping[str, str]) -> None:
+        """
+        Move a filter to new tag tokens after a write that kept its items valid
+        """
+        with self._lock:
+            keyed = self._filters.get(key)
+            if keyed is not None:
+                keyed.tokens = dict(tokens)
+
+    def discard(self, key: str) -> None:
+        """
+        Drop the filter of a key
+        """
+        with self._lock:
+            self._filters.pop(key, None)
+
+    def might_contain(self, key: str, item: str) -> Optional[bool]:
+        """
+        Check an item against the key's filter
+
+        Returns:
+            False if the item certainly does not exist, True if it may exist,
+            None if there is no valid filter for the key
+        """
+        keyed = self._current(key)
+        if keyed is None:
+            return None
+
+        self.checks += 1
+        if item in keyed.bloom:
+            return True
+        self.rejections += 1
+        return False
+
+    def note_missing(self, key: str, item: str) -> None:
+        """
+        Record that an item the filter let through turned out not to exist
+        """
+        keyed = self._current(key)
+        if keyed is not None and item in keyed.bloom:
+            self.false_positives += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the filter counters
+        """
+        with self._lock:
+            filters = list(self._filters.values())
+        expected = [keyed.bloom.expected_false_positive_rate() for keyed in filters]
+        absent = self.rejections + self.false_positives
+        return {
+            "type": "bloom_filter",
+            "filters": len(filters),
+            "bytes": sum(keyed.bloom.size_bytes for keyed in filters),
+            "max_filters": self.max_keys,
+            "builds": self.builds,
+            "checks": self.checks,
+            "rejections": self.rejections,
+            "false_positives": self.false_positives,
+            "false_positive_rate": self.false_positive_rate,
+            "expected_false_positive_rate": sum(expected) / len(expected) if expected else 0.0,
+            "observed_false_positive_rate": self.false_positives / absent if absent else 0.0,
+        }
@@ -0,0 +1,248 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from datetime import datetime
+import asyncio
+import functools
+import threading
+import logging
+from google.cloud.firestore_v1.field_path import FieldPath
+from ..config.settings import settings
+from .caching import cache_registry
+
+# Logger for bulk deletes
+logger = logging.getLogger("bulk_delete")
+
+class BulkDeleteProgress:
+    """
+    Progress of one bulk delete.
+
+    Documents are deleted in key order, a page at a time, and last_id only
+    moves past a page once every batch of it is committed. Passing last_id as
+    resume_after continues the same delete without scanning what is already
+    gone.
+    """
+    __slots__ = ("key", "deleted", "batches", "pages", "last_id", "done", "error", "started_at", "finished_at")
+
+    def __init__(self, key: str, last_id: Optional[str] = None):
+        self.key = key
+        self.deleted = 0
+        self.batches = 0
+        self.pages = 0
+        self.last_id = last_id
+        self.done = False
+        self.error: Optional[str] = None
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class BulkDeleteError(Exception):
+    """
+    A bulk delete failed; progress tells how far it got and where to resume
+    """
+    def __init__(self, message: str, progress: BulkDeleteProgress):
+        super().__init__(message)
+        self.progress = progress
+
+class BulkDeleter:
+    """
+    Deletes every document a query matches with chunked WriteBatch commits.
+
+    The query is read a page of document keys at a time (no fields are
+    transferred), each page is split into batches of at most batch_size
+    deletes, and the batches are committed in parallel on a thread pool that
+    all bulk deletes share, so parallelism also caps the write rate they put
+    on Firestore together. The latest progress of each delete is kept by key
+    for status reporting through progress(); the keys name users, so only
+    the totals are shown at /debug/caches.
+
+    delete() blocks; call it from a thread such as the Firestore executor.
+    """
+    def __init__(
+        self,
+        name: str,
+        batch_size: int = settings.FIRESTORE_BATCH_SIZE,
+        page_size: int = settings.BULK_DELETE_PAGE_SIZE,
+        parallelism: int = settings.BULK_DELETE_PARALLELISM,
+        max_jobs: int = 1000,
+    ):
+        self.batch_size = min(batch_size, 500)
+        self.page_size = page_size
+        self.parallelism = max(1, parallelism)
+        self.max_jobs = max_jobs
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._jobs: "OrderedDict[str, BulkDeleteProgress]" = OrderedDict()
+
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.paused = 0
+        self.errors = 0
+        self.deleted = 0
+        self.batches = 0
+        self.name = cache_registry.register(name, self)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.parallelism, thread_name_prefix=self.name.replace(".", "-")
+                    )
+        return self._executor
+
+    def _track(self, progress: BulkDeleteProgress) -> None:
+        with self._lock:
+            self._jobs.pop(progress.key, None)
+            self._jobs[progress.key] = progress
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def progress(self, key: str) -> Optional[BulkDeleteProgress]:
+        """
+        Latest progress of the delete started under key, if any
+        """
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _commit(self, db: Any, refs: List[Any], timeout: float) -> int:
+        batch = db.batch()
+        for ref in refs:
+            batch.delete(ref)
+        batch.commit(timeout=timeout)
+        return len(refs)
+
+    def delete(
+        self,
+        db: Any,
+        query: Any,
+        key: str,
+        resume_after: Optional[str] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_progress: Optional[Callable[[BulkDeleteProgress], None]] = None,
+        timeout: float = settings.FIRESTORE_TIMEOUT,
+    ) -> BulkDeleteProgress:
+        """
+        Delete every document the query matches
+
+        Args:
+            db: Firestore client the batches are created on
+            query: Collection or query to empty
+            key: Name of the delete for progress reporting, e.g. "history:<user_id>"
+            resume_after: last_id of an earlier run of the same delete
+            should_stop: Checked before each page; returning True pauses the delete
+            on_progress: Called after each page
+            timeout: Seconds per Firestore call
+
+        Returns:
+            Progress; done is False if the delete was paused by should_stop or shutdown
+
+        Raises:
+            BulkDeleteError: A page could not be read or a batch failed
+        """
+        progress = BulkDeleteProgress(key, resume_after)
+        self._track(progress)
+        with self._lock:
+            self.running += 1
+            self.started += 1
+
+        document_id = FieldPath.document_id()
+        scan = query.select([document_id]).order_by(document_id).limit(self.page_size)
+        try:
+            while not self._stopping.is_set() and not (should_stop and should_stop()):
+                page = scan if progress.last_id is None else scan.start_after({document_id: progress.last_id})
+                refs = [snapshot.reference for snapshot in page.stream(timeout=timeout)]
+                if not refs:
+                    progress.done = True
+                    break
+
+                futures = [
+                    self._get_executor().submit(self._commit, db, refs[start:start + self.batch_size], timeout)
+                    for start in range(0, len(refs), self.batch_size)
+                ]
+                finished, pending = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in pending:
+                    future.cancel()
+                # Batches already running are still counted
+                finished, _ = wait(futures)
+                committed = [future for future in finished if not future.cancelled() and future.exception() is None]
+                deleted = sum(future.result() for future in committed)
+                progress.deleted += deleted
+                progress.batches += len(committed)
+                with self._lock:
+                    self.deleted += deleted
+                    self.batches += len(committed)
+                for future in finished:
+                    if not future.cancelled() and future.exception() is not None:
+                        raise future.exception()
+
+                progress.pages += 1
+                progress.last_id = refs[-1].id
+                if on_progress:
+                    on_progress(progress)
+                if len(refs) < self.page_size:
+                    progress.done = True
+                    break
+
+        except Exception as e:
+            progress.error = str(e)
+            with self._lock:
+                self.errors += 1
+            logger.error(f"Bulk delete {key} failed after {progress.deleted} documents: {str(e)}")
+            raise BulkDeleteError(f"Bulk delete {key} failed after {progress.deleted} documents: {str(e)}", progress) from e
+
+        finally:
+            progress.finished_at = datetime.now()
+            with self._lock:
+                self.running -= 1
+
+        with self._lock:
+            if progress.done:
+                self.completed += 1
+            else:
+                self.paused += 1
+        if progress.done:
+            logger.info(f"Bulk delete {key} deleted {progress.deleted} documents in {progress.batches} batches")
+        else:
+            logger.info(f"Bulk delete {key} paused after {progress.deleted} documents, resumes after {progress.last_id}")
+        return progress
+
+    async def stop(self) -> None:
+        """
+        Pause the running deletes after their current page and stop the threads
+        """
+        self._stopping.set()
+        try:
+            while self.running:
+                await asyncio.sleep(0.05)
+            executor, self._executor = self._executor, None
+            if executor is not None:
+                await asyncio.get_running_loop().run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+                logger.info(f"Bulk deleter {self.name} stopped")
+        finally:
+            self._stopping.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the deletes run so far
+        """
+        return {
+            "type": "bulk_delete",
+            "parallelism": self.parallelism,
+            "batch_size": self.batch_size,
+            "page_size": self.page_size,
+            "running": self.running,
+            "started": self.started,
+            "completed": self.completed,
+            "paused": self.paused,
+            "errors": self.errors,
+            "deleted": self.deleted,
+            "batches": self.batches,
+        }
+
+# Bulk deletes of Firestore collections, shared by the repositories and the legacy Firebase code
+bulk_deleter = BulkDeleter(name="firestore.bulk_delete")
@@ -0,0 +1,144 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import hashlib
+import inspect
+import unicodedata
+
+try:
+    import xxhash
+except ImportError:  # optional, blake2b is used when it is not installed
+    xxhash = None
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for use in cache keys: Unicode NFC, collapsed whitespace, stripped ends
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Normalized text
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def _new_hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+def _feed(hasher, value: Any) -> None:
+    """
+    Feed a value into the hasher with a type tag and length prefix,
+    so that e.g. "1" and 1 or ("ab", "c") and ("a", "bc") never collide
+    """
+    if isinstance(value, str):
+        tag, data = b"s", value.encode("utf-8", "surrogatepass")
+    elif isinstance(value, (bytes, bytearray)):
+        tag, data = b"b", bytes(value)
+    elif value is None or isinstance(value, (bool, int, float)):
+        tag, data = b"n", repr(value).encode()
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b"l" + len(value).to_bytes(8, "little"))
+        for item in value:
+            _feed(hasher, item)
+        return
+    elif isinstance(value, dict):
+        hasher.update(b"d" + len(value).to_bytes(8, "little"))
+        for key in sorted(value, key=repr):
+            _feed(hasher, key)
+            _feed(hasher, value[key])
+        return
+    else:
+        tag, data = b"r", repr(value).encode()
+
+    hasher.update(tag + len(data).to_bytes(8, "little"))
+    hasher.update(data)
+
+class KeyBuilder:
+    """
+    Deterministic cache key builder for use as `cached(..., key_func=...)`.
+
+    Selected arguments are hashed directly (xxh3-128 when xxhash is installed,
+    blake2b otherwise) and prefixed with a namespace and version, giving keys
+    like "enhance:v1:<digest>" that are identical across processes and restarts.
+    `self` and `cls` are never part of the key.
+    """
+    def __init__(
+        self,
+        namespace: str,
+        version: int = 1,
+        include: Optional[Sequence[str]] = None,
+        normalize: Iterable[str] = (),
+        normalizer: Callable[[str], str] = normalize_text,
+    ):
+        """
+        Args:
+            namespace: Key prefix, usually the cached operation name
+            version: Bump to invalidate keys when the cached computation changes
+            include: Argument names to hash (all arguments except self/cls if None)
+            normalize: Names of text arguments passed through the normalizer before hashing
+            normalizer: Text normalization function
+        """
+        self.namespace = namespace
+        self.version = version
+        self.include = list(include) if include is not None else None
+        self.normalize = frozenset(normalize)
+        self.normalizer = normalizer
+        self.prefix = f"{namespace}:v{version}:"
+
+        self._positional: List[str] = []
+        self._defaults: Dict[str, Any] = {}
+        self._fields: List[str] = list(self.include or [])
+        self._var_args = False
+        self._var_kwargs = False
+        self._bound = False
+
+    def for_function(self, func: Callable) -> "KeyBuilder":
+        """
+        Bind the builder to the signature of the function whose calls it keys
+
+        Returns:
+            A new builder that maps positional arguments to parameter names
+        """
+        bound = KeyBuilder(self.namespace, self.version, self.include, self.normalize, self.normalizer)
+        bound._bound = True
+        parameters = list(inspect.signature(func).parameters.values())
+        if parameters and parameters[0].name in ("self", "cls"):
+            bound._positional.append(parameters[0].name)
+            parameters = parameters[1:]
+
+        for parameter in parameters:
+            if parameter.kind == parameter.VAR_POSITIONAL:
+                bound._var_args = True
+                continue
+            if parameter.kind == parameter.VAR_KEYWORD:
+                bound._var_kwargs = True
+                continue
+            if parameter.kind != parameter.KEYWORD_ONLY:
+                bound._positional.append(parameter.name)
+            if parameter.default is not parameter.empty:
+                bound._defaults[parameter.name] = parameter.default
+            if self.include is None:
+                bound._fields.append(parameter.name)
+        return bound
+
+    def __call__(self, *args, **kwargs) -> str:
+        if not self._bound:
+            raise TypeError("KeyBuilder must be bound with for_function() before use")
+
+        values = dict(zip(self._positional, args))
+        values.update(kwargs)
+
+        hasher = _new_hasher()
+        for name in self._fields:
+            value = values.get(name, self._defaults.get(name))
+            if name in self.normalize and isinstance(value, str):
+                value = self.normalizer(value)
+            _feed(hasher, value)
+
+        if self.include is None:
+            if self._var_args:
+                _feed(hasher, args[len(self._positional):])
+            if self._var_kwargs:
+                _feed(hasher, {k: v for k, v in kwargs.items() if k not in self._fields})
+
+        return self.prefix + hasher.hexdigest()
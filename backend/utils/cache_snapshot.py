@@ -0,0 +1,236 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import logging
+
+# Logger for cache snapshot operations
+logger = logging.getLogger("cache_snapshot")
+
+# File header: magic, format version, entry count, index offset, write time
+_HEADER = struct.Struct("<4sHIQd")
+_HEADER_SIZE = 64
+_MAGIC = b"PECP"
+_FORMAT_VERSION = 1
+
+# Index record: value offset, value length, expiration time, stale-until time, key length
+_RECORD = struct.Struct("<QIddH")
+
+# A snapshot entry: key, pickled (data, tags) payload, expiration time, stale-until time
+SnapshotEntry = Tuple[str, bytes, float, float]
+
+def encode_value(data: Any, tags: Optional[Dict[str, str]]) -> bytes:
+    """
+    Serialize a cached value and its tag tokens for a snapshot
+    """
+    return pickle.dumps((data, tags), protocol=pickle.HIGHEST_PROTOCOL)
+
+def write_snapshot(path: str, entries: Iterable[SnapshotEntry]) -> int:
+    """
+    Atomically write a cache snapshot.
+
+    Values are written first and followed by the index of keys, so the file
+    can be memory-mapped and values decoded individually. The file is written
+    under a temporary name, flushed to disk and renamed over `path`, so
+    readers see either the previous or the new snapshot, never a partial one.
+
+    Args:
+        path: Snapshot file path
+        entries: Entries to write
+
+    Returns:
+        Number of entries written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+
+    count = 0
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(b"\0" * _HEADER_SIZE)
+            index = []
+            offset = _HEADER_SIZE
+            for key, payload, expires_at, stale_until in entries:
+                key_bytes = key.encode()
+                if len(key_bytes) > 0xFFFF or len(payload) > 0xFFFFFFFF:
+                    continue
+                f.write(payload)
+                index.append(_RECORD.pack(offset, len(payload), expires_at, stale_until, len(key_bytes)) + key_bytes)
+                offset += len(payload)
+                count += 1
+
+            f.write(b"".join(index))
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, count, offset, time.time()))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+    return count
+
+class CacheSnapshot:
+    """
+    Read-only, memory-mapped cache snapshot.
+
+    Opening a snapshot only reads its key index; values stay in the mapped
+    file until they are taken, so restoring does not grow with value size.
+    Each value can be taken once. The mapping is released when every value
+    has been taken or close() is called.
+    """
+    def __init__(self, path: str, mapped: mmap.mmap, index: Dict[str, Tuple[int, int, float, float]]):
+        self.path = path
+        self._mmap = mapped
+        self._index = index
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str) -> Optional["CacheSnapshot"]:
+        """
+        Open a snapshot file
+
+        Args:
+            path: Snapshot file path
+
+        Returns:
+            Snapshot, or None if the file is missing, unreadable or of another format version
+        """
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < _HEADER_SIZE:
+                    logger.warning(f"Skipping truncated cache snapshot {path}")
+                    return None
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Error opening cache snapshot {path}: {str(e)}")
+            return None
+
+        magic, version, count, index_offset, written_at = _HEADER.unpack_from(mapped, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            logger.warning(f"Skipping cache snapshot {path} with unsupported format {magic!r} v{version}")
+            mapped.close()
+            return None
+
+        index: Dict[str, Tuple[int, int, float, float]] = {}
+        now = time.time()
+        try:
+            position = index_offset
+            for _ in range(count):
+                value_offset, value_len, expires_at, stale_until, key_len = _RECORD.unpack_from(mapped, position)
+                position += _RECORD.size
+                key = mapped[position:position + key_len].decode()
+                position += key_len
+                if stale_until > now and value_offset + value_len <= index_offset:
+                    index[key] = (value_offset, value_len, expires_at, stale_until)
+        except (struct.error, UnicodeDecodeError) as e:
+            logger.warning(f"Skipping corrupt cache snapshot {path}: {str(e)}")
+            mapped.close()
+            return None
+
+        logger.info(f"Opened cache snapshot {path} with {len(index)} live entries written at {written_at:.0f}")
+        snapshot = cls(path, mapped, index)
+        if not index:
+            snapshot.close()
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _read_raw(self, key: str, remove: bool) -> Optional[SnapshotEntry]:
+        with self._lock:
+            record = self._index.pop(key, None) if remove else self._index.get(key)
+            if record is None or self._mmap.closed:
+                return None
+            value_offset, value_len, expires_at, stale_until = record
+            payload = self._mmap[value_offset:value_offset + value_len]
+            if not self._index:
+                self._mmap.close()
+        return key, payload, expires_at, stale_until
+
+    def take(self, key: str) -> Optional[Tuple[Any, Optional[Dict[str, str]], float, float]]:
+        """
+        Remove a value from the snapshot and decode it
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of data, tag tokens, expiration and stale-until time, or None
+        """
+        raw = self._read_raw(key, remove=True)
+        if raw is None:
+            return None
+
+        _, payload, expires_at, stale_until = raw
+        if stale_until <= time.time():
+            return None
+        try:
+            data, tags = pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache snapshot entry: {str(e)}")
+            return None
+        return data, tags, expires_at, stale_until
+
+    def discard(self, key: str) -> None:
+        """
+        Drop a value without decoding it
+        """
+        with self._lock:
+            self._index.pop(key, None)
+            if not self._index:
+                self._mmap.close()
+
+    def discard_prefix(self, prefix: str) -> None:
+        """
+        Drop every value whose key starts with the prefix
+        """
+        with self._lock:
+            for key in [key for key in self._index if key.startswith(prefix)]:
+                del self._index[key]
+            if not self._index:
+                self._mmap.close()
+
+    def remaining(self) -> Iterable[SnapshotEntry]:
+        """
+        Iterate over the values not taken yet, without decoding or removing them
+        """
+        now = time.time()
+        with self._lock:
+            keys = list(self._index)
+        for key in keys:
+            raw = self._read_raw(key, remove=False)
+            if raw is not None and raw[3] > now:
+                yield raw
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap.closed
+
+    def close(self) -> None:
+        """
+        Release the mapped file
+        """
+        with self._lock:
+            self._index.clear()
+            if not self._mmap.closed:
+                self._mmap.close()
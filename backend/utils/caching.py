@@ -1,101 +1,1165 @@
-from typing import Dict, Any, TypeVar, Generic, Callable, Awaitable, Optional
+from typing import Dict, Any, TypeVar, Generic, Callable, Awaitable, Optional, Hashable, List, Tuple, Iterable, Mapping, Union
+from collections import OrderedDict
+import asyncio
+import contextvars
+import threading
+import weakref
+import sys
 import time
-import hashlib
 import functools
+import itertools
+import secrets
+import os
 import logging
 from ..config.settings import settings
+from ..core import deadline
+from ..core.exceptions import DeadlineExceededException
+from .shared_cache import SharedMemoryCache, get_shared_cache
+from .cache_keys import KeyBuilder
+from .cache_snapshot import CacheSnapshot, encode_value, write_snapshot
 
 # Logger for cache operations
 logger = logging.getLogger("cache")
 
 T = TypeVar('T')
 
+_sweeper_task: Optional[asyncio.Task] = None
+_snapshot_task: Optional[asyncio.Task] = None
+
+class CacheRegistry:
+    """
+    Registry of named caches and related components that expose stats().
+    Entries are held weakly so short-lived caches do not leak.
+    """
+    def __init__(self):
+        self._items: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+
+    def register(self, name: Optional[str], item: Any) -> str:
+        """
+        Register an item under a name, generating one if None
+
+        Returns:
+            Name the item was registered under
+        """
+        with self._lock:
+            if not name:
+                name = f"{type(item).__name__.lower()}-{next(self._counter)}"
+            self._items[name] = item
+        return name
+
+    def items(self) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return sorted(self._items.items())
+
+    def caches(self) -> List["Cache"]:
+        return [item for _, item in self.items() if isinstance(item, Cache)]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Collect stats of every registered item
+        """
+        return {name: item.stats() for name, item in self.items()}
+
+# Every cache registers itself here; the sweeper and /debug/caches use it
+cache_registry = CacheRegistry()
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Approximate the memory footprint of a cached value in bytes
+
+    Args:
+        value: Value to measure
+        _depth: Current recursion depth (internal)
+
+    Returns:
+        Approximate size in bytes
+    """
+    size = sys.getsizeof(value)
+    if _depth > 4:
+        return size
+
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+        return size
+    if isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _depth + 1)
+        return size
+
+    # Pydantic models and plain objects keep their fields in __dict__
+    fields = getattr(value, "__dict__", None)
+    if isinstance(fields, dict):
+        size += estimate_size(fields, _depth + 1)
+    return size
+
+class FrequencySketch:
+    """
+    Count-min sketch with small saturating counters used by the admission policy.
+    Counters are halved periodically so that old popularity fades away.
+    """
+    _SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+    _MAX_COUNT = 15
+
+    def __init__(self, capacity: int):
+        width = 16
+        while width < capacity * 2:
+            width <<= 1
+        self._mask = width - 1
+        self._width = width
+        self._table = bytearray(width * len(self._SEEDS))
+        self._additions = 0
+        self._sample_size = width * 10
+
+    def _indexes(self, key: Hashable):
+        h = hash(key)
+        for row, seed in enumerate(self._SEEDS):
+            yield row * self._width + ((((h * seed) >> 16) ^ h) & self._mask)
+
+    def increment(self, key: Hashable) -> None:
+        """
+        Record one access to the key
+        """
+        table = self._table
+        for index in self._indexes(key):
+            if table[index] < self._MAX_COUNT:
+                table[index] += 1
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        """
+        Estimated access frequency of the key
+        """
+        table = self._table
+        return min(table[index] for index in self._indexes(key))
+
+    def _age(self) -> None:
+        """
+        Halve all counters
+        """
+        table = self._table
+        for index in range(len(table)):
+            table[index] >>= 1
+        self._additions //= 2
+
+class TagVersions:
+    """
+    Current version token of every invalidation tag.
+
+    Invalidating a tag just replaces its token, which is O(1); entries that
+    were stored with the old token are treated as missing from then on.
+    With a shared tier the tokens live there, so an invalidation in one
+    worker is seen by all workers on the host; each worker reuses a token it
+    read for local_ttl seconds instead of reading the shared tier on every
+    tagged hit, so another worker's invalidation can take that long to show.
+    Otherwise they are kept in a bounded local LRU map; a forgotten tag
+    simply gets a new token, which can only cause extra misses, never stale
+    hits.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_tags: int,
+        l2: Optional[SharedMemoryCache] = None,
+        ttl: int = 86400,
+        local_ttl: float = settings.CACHE_L2_TAG_LOCAL_TTL,
+    ):
+        self.name = name
+        self.max_tags = max_tags
+        self.l2 = l2
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._tokens: "OrderedDict[str, str]" = OrderedDict()
+        # Tokens read from the shared tier and when they were read
+        self._shared_tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _l2_key(self, tag: str) -> str:
+        return f"{self.name}:tag:{tag}"
+
+    def _remember_shared(self, tag: str, token: str) -> None:
+        with self._lock:
+            self._shared_tokens[tag] = (token, time.monotonic())
+            self._shared_tokens.move_to_end(tag)
+            while len(self._shared_tokens) > self.max_tags:
+                self._shared_tokens.popitem(last=False)
+
+    def current(self, tag: str) -> str:
+        """
+        Get the current token of a tag, creating one if the tag is unknown
+        """
+        if self.l2 is not None:
+            with self._lock:
+                remembered = self._shared_tokens.get(tag)
+            if remembered is not None and time.monotonic() - remembered[1] < self.local_ttl:
+                return remembered[0]
+            shared = self.l2.get(self._l2_key(tag))
+            if shared is None:
+                return self.bump(tag)
+            self._remember_shared(tag, shared[0])
+            return shared[0]
+
+        with self._lock:
+            token = self._tokens.get(tag)
+            if token is not None:
+                self._tokens.move_to_end(tag)
+                return token
+        return self.bump(tag)
+
+    def bump(self, tag: str) -> str:
+        """
+        Replace the token of a tag, invalidating every entry stored under it
+        """
+        token = secrets.token_hex(8)
+        if self.l2 is not None:
+            self.l2.set(self._l2_key(tag), token, self.ttl)
+            self._remember_shared(tag, token)
+            return token
+
+        with self._lock:
+            self._tokens[tag] = token
+            self._tokens.move_to_end(tag)
+            while len(self._tokens) > self.max_tags:
+                self._tokens.popitem(last=False)
+        return token
+
+    def snapshot(self, tags: Iterable[str]) -> Dict[str, str]:
+        """
+        Capture the current tokens of the given tags
+        """
+        return {tag: self.current(tag) for tag in tags}
+
+    def is_current(self, tokens: Optional[Mapping[str, str]]) -> bool:
+        """
+        Check that none of the tags has been invalidated since the snapshot
+        """
+        if not tokens:
+            return True
+        return all(self.current(tag) == token for tag, token in tokens.items())
+
+class _CacheEntry:
+    """
+    Cached value with its soft and hard expiration times, approximate size,
+    tag tokens and number of fresh hits
+    """
+    __slots__ = ("data", "timestamp", "expires_at", "stale_until", "size", "tags", "hits")
+
+    def __init__(
+        self,
+        data: Any,
+        timestamp: float,
+        expires_at: float,
+        stale_until: float,
+        size: int,
+        tags: Optional[Dict[str, str]] = None,
+    ):
+        self.data = data
+        self.timestamp = timestamp
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size
+        self.tags = tags
+        self.hits = 0
+
+class _CacheShard:
+    """
+    Independently locked LRU segment of a cache
+    """
+    __slots__ = (
+        "lock", "entries", "bytes", "max_entries", "max_bytes", "sketch",
+        "hits", "stale_hits", "misses", "expirations", "invalidations", "evictions", "rejections", "sets",
+    )
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sketch = FrequencySketch(max_entries)
+
+        # Counters are only updated with the lock held
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.sets = 0
+
+    def remove(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def is_full(self, extra_entries: int, extra_bytes: int) -> bool:
+        return (
+            len(self.entries) + extra_entries > self.max_entries or
+            self.bytes + extra_bytes > self.max_bytes
+        )
+
 class Cache(Generic[T]):
     """
-    Simple in-memory cache with TTL
+    Bounded in-memory cache with TTL.
+
+    Entries live in lock-protected shards, each an LRU ordered dict with an
+    entry and byte budget. When a shard is full, a new key is only admitted
+    if it is accessed at least as often as the LRU victim it would replace,
+    so one-off keys cannot flush frequently used entries.
+
+    An optional shared second tier (L2) is consulted on local misses and
+    written through on set, so worker processes on the same host share
+    results. L2 keys are prefixed with the cache name.
+
+    Entries may carry invalidation tags; invalidate_tag() drops every entry
+    stored under a tag in O(1) (see TagVersions).
+
+    `ttl` is the soft TTL: get() only returns entries younger than it. With a
+    `stale_ttl`, entries are kept that much longer and get_or_load() serves
+    them while one background task refreshes them (stale-while-revalidate).
+    Frequently read entries are also refreshed shortly before they go stale.
+
+    Caches created with `persist=True` are written to a snapshot file
+    periodically and on shutdown, and restored lazily on startup (see
+    save_snapshot() and restore_snapshot()).
     """
-    def __init__(self, ttl: int = settings.CACHE_TTL):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        ttl: int = settings.CACHE_TTL,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.CACHE_MAX_BYTES,
+        shards: int = settings.CACHE_SHARDS,
+        name: Optional[str] = None,
+        l2: Optional[SharedMemoryCache] = None,
+        stale_ttl: int = 0,
+        refresh_ahead: float = settings.CACHE_REFRESH_AHEAD,
+        refresh_ahead_min_hits: int = settings.CACHE_REFRESH_AHEAD_MIN_HITS,
+        persist: bool = False,
+    ):
+        if l2 is not None and not name:
+            raise ValueError("A cache with a shared tier needs a name")
+
+        # Round the shard count up to a power of two so the shard can be picked by masking
+        shard_count = 1
+        while shard_count < max(1, shards):
+            shard_count <<= 1
+
         self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_ahead = refresh_ahead
+        self.refresh_ahead_min_hits = refresh_ahead_min_hits
+        self.l2 = l2
+        self.persist = persist
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._shard_mask = shard_count - 1
+        self._shards: List[_CacheShard] = [
+            _CacheShard(
+                max_entries=max(1, -(-max_entries // shard_count)),
+                max_bytes=max(1, max_bytes // shard_count),
+            )
+            for _ in range(shard_count)
+        ]
+
+        # Latency totals and refresh counters are updated without locking and are approximate
+        self._get_ns = 0
+        self._get_calls = 0
+        self._set_ns = 0
+        self._set_calls = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+
+        self.name = cache_registry.register(name, self)
+        self.tag_versions = TagVersions(
+            self.name, max_tags=max_entries * 4, l2=l2, ttl=max((ttl + stale_ttl) * 2, 86400)
+        )
+        self._flight: Optional[SingleFlight] = None
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._snapshot: Optional[CacheSnapshot] = None
+
+    def _shard_for(self, key: str) -> _CacheShard:
+        return self._shards[hash(key) & self._shard_mask]
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    @property
+    def size_bytes(self) -> int:
+        """
+        Approximate number of bytes held by the cache
+        """
+        return sum(shard.bytes for shard in self._shards)
 
     def get(self, key: str) -> Optional[T]:
         """
         Get value from cache if it exists and is not expired
         """
-        if key in self.cache:
-            cache_data = self.cache[key]
-            if time.time() - cache_data["timestamp"] < self.ttl:
-                logger.debug(f"Cache hit for key: {key}")
-                return cache_data["data"]
-            else:
-                logger.debug(f"Cache expired for key: {key}")
-        else:
-            logger.debug(f"Cache miss for key: {key}")
-        return None
+        entry = self._lookup(key, allow_stale=False)
+        return entry.data if entry is not None else None
 
-    def set(self, key: str, data: T) -> None:
+    def get_stale(self, key: str) -> Optional[T]:
+        """
+        Get the last value held in process for a key, however old
+
+        For fallbacks when a fresh value cannot be loaded in time: entries past
+        their soft TTL and stale window are returned as long as they have not
+        been looked up or swept since, but never entries invalidated by a
+        write. This is a peek; the entry is not removed or reordered and no
+        hit or miss is counted.
+        """
+        shard = self._shard_for(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+        # Tag tokens may be read from L2, so they are compared without the shard lock
+        if entry is None or not self.tag_versions.is_current(entry.tags):
+            return None
+        return entry.data
+
+    def _lookup(self, key: str, allow_stale: bool) -> Optional[_CacheEntry]:
+        """
+        Find a valid entry in L1, then L2
+
+        Args:
+            key: Cache key
+            allow_stale: Also return entries past the soft TTL but within the stale window
+
+        Returns:
+            Entry or None
+        """
+        started = time.perf_counter_ns()
+        try:
+            now = time.time()
+            shard = self._shard_for(key)
+            with shard.lock:
+                shard.sketch.increment(key)
+                entry = shard.entries.get(key)
+                if entry is not None and entry.stale_until <= now:
+                    shard.remove(key)
+                    shard.expirations += 1
+                    entry = None
+
+            # Tag tokens may be read from L2, so they are compared without the shard lock
+            current = entry is None or self.tag_versions.is_current(entry.tags)
+
+            with shard.lock:
+                if entry is not None:
+                    if shard.entries.get(key) is not entry:
+                        # Replaced or removed while the tags were compared
+                        entry = None
+                    elif not current:
+                        shard.remove(key)
+                        shard.invalidations += 1
+                        entry = None
+                    elif entry.expires_at > now:
+                        shard.entries.move_to_end(key)
+                        shard.hits += 1
+                        entry.hits += 1
+                        return entry
+
+                if self.l2 is None and (entry is not None or self._snapshot is None):
+                    if entry is not None and allow_stale:
+                        shard.entries.move_to_end(key)
+                        shard.stale_hits += 1
+                        return entry
+                    shard.misses += 1
+                    return None
+
+            stale_entry = entry
+            if entry is None and self._snapshot is not None:
+                restored = self._restore_entry(key, now)
+                if restored is not None:
+                    if restored.expires_at > now:
+                        with shard.lock:
+                            shard.hits += 1
+                        return restored
+                    stale_entry = restored
+
+            # Another worker may have refreshed a locally stale entry
+            shared = self.l2.get(self._l2_key(key)) if self.l2 is not None else None
+            if shared is not None:
+                (data, tags, expires_at), stale_until = shared
+                if self.tag_versions.is_current(tags):
+                    entry = self._set_local(key, data, expires_at, stale_until, tags)
+                    if entry is None:
+                        entry = _CacheEntry(data, now, expires_at, stale_until, 0, tags)
+                    if entry.expires_at > now:
+                        with shard.lock:
+                            shard.hits += 1
+                        return entry
+                    stale_entry = entry
+
+            with shard.lock:
+                if stale_entry is not None and allow_stale:
+                    shard.stale_hits += 1
+                    return stale_entry
+                shard.misses += 1
+            return None
+        finally:
+            self._get_ns += time.perf_counter_ns() - started
+            self._get_calls += 1
+
+    def set(
+        self,
+        key: str,
+        data: T,
+        ttl: Optional[int] = None,
+        tags: Union[Iterable[str], Mapping[str, str], None] = None,
+    ) -> None:
         """
         Set value in cache with current timestamp
+
+        Args:
+            key: Cache key
+            data: Value to cache
+            ttl: Soft time to live in seconds (defaults to the cache TTL)
+            tags: Invalidation tags, or a TagVersions snapshot taken before the
+                  value was read so that a concurrent invalidation is not lost
         """
-        self.cache[key] = {
-            "data": data,
-            "timestamp": time.time()
-        }
-        logger.debug(f"Cache set for key: {key}")
+        started = time.perf_counter_ns()
+        ttl = self.ttl if ttl is None else ttl
+        if tags is not None and not isinstance(tags, Mapping):
+            tags = self.tag_versions.snapshot(tags)
+        tags = dict(tags) if tags else None
+
+        expires_at = time.time() + ttl
+        self._set_local(key, data, expires_at, expires_at + self.stale_ttl, tags)
+        if self.l2 is not None:
+            self.l2.set(self._l2_key(key), (data, tags, expires_at), ttl + self.stale_ttl)
+        self._set_ns += time.perf_counter_ns() - started
+        self._set_calls += 1
+
+    def _l2_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _restore_entry(self, key: str, now: float) -> Optional[_CacheEntry]:
+        """
+        Move an entry from the restored snapshot into the in-process tier
+
+        Returns:
+            Entry, or None if the snapshot has no valid value for the key
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if snapshot.closed:
+            self._snapshot = None
+            return None
+
+        restored = snapshot.take(key)
+        if restored is None:
+            return None
+
+        data, tags, expires_at, stale_until = restored
+        if not self.tag_versions.is_current(tags):
+            return None
+        entry = self._set_local(key, data, expires_at, stale_until, tags)
+        if entry is None:
+            entry = _CacheEntry(data, now, expires_at, stale_until, 0, tags)
+        return entry
+
+    def save_snapshot(self, path: str) -> int:
+        """
+        Write the live entries, including restored ones not read yet, to a snapshot file
+
+        Args:
+            path: Snapshot file path
+
+        Returns:
+            Number of entries written
+        """
+        now = time.time()
+        live: List[Tuple[str, _CacheEntry]] = []
+        for shard in self._shards:
+            with shard.lock:
+                live.extend((key, entry) for key, entry in shard.entries.items() if entry.stale_until > now)
+
+        def entries():
+            written = set()
+            for key, entry in live:
+                try:
+                    payload = encode_value(entry.data, entry.tags)
+                except Exception as e:
+                    logger.debug(f"Skipping unpicklable entry in cache {self.name}: {str(e)}")
+                    continue
+                written.add(key)
+                yield key, payload, entry.expires_at, entry.stale_until
+
+            snapshot = self._snapshot
+            if snapshot is not None:
+                for raw in snapshot.remaining():
+                    if raw[0] not in written:
+                        yield raw
+
+        count = write_snapshot(path, entries())
+        logger.debug(f"Saved {count} entries of cache {self.name} to {path}")
+        return count
+
+    def restore_snapshot(self, path: str) -> int:
+        """
+        Restore entries from a snapshot file lazily: only the keys are read
+        now, each value is decoded and moved into the cache on first access
+
+        Args:
+            path: Snapshot file path
+
+        Returns:
+            Number of restorable entries
+        """
+        snapshot = CacheSnapshot.open(path)
+        if snapshot is None or snapshot.closed:
+            return 0
+
+        if self._snapshot is not None:
+            self._snapshot.close()
+        self._snapshot = snapshot
+        logger.info(f"Restored {len(snapshot)} entries of cache {self.name} from {path}")
+        return len(snapshot)
+
+    def _set_local(
+        self,
+        key: str,
+        data: T,
+        expires_at: float,
+        stale_until: float,
+        tags: Optional[Dict[str, str]] = None,
+    ) -> Optional[_CacheEntry]:
+        """
+        Store value in the in-process tier, evicting LRU entries as needed
+
+        Returns:
+            Stored entry, or None if it was too large or not admitted
+        """
+        now = time.time()
+        size = estimate_size(key) + estimate_size(data)
+        entry = _CacheEntry(data, now, expires_at, stale_until, size, tags)
+
+        shard = self._shard_for(key)
+        with shard.lock:
+            shard.sets += 1
+            if size > shard.max_bytes:
+                shard.remove(key)
+                shard.rejections += 1
+                return None
+
+            existing = shard.entries.get(key)
+            if existing is not None:
+                shard.remove(key)
+            elif shard.is_full(1, size) and not self._admit(shard, key, now):
+                shard.rejections += 1
+                return None
+
+            while shard.entries and shard.is_full(1, size):
+                victim_key = next(iter(shard.entries))
+                shard.remove(victim_key)
+                shard.evictions += 1
+
+            shard.entries[key] = entry
+            shard.bytes += size
+        return entry
+
+    def _admit(self, shard: _CacheShard, key: str, now: float) -> bool:
+        """
+        Decide whether a new key may evict the shard's LRU entry.
+        Must be called with the shard lock held.
+        """
+        victim_key = next(iter(shard.entries), None)
+        if victim_key is None or shard.entries[victim_key].stale_until <= now:
+            return True
+        return shard.sketch.estimate(key) >= shard.sketch.estimate(victim_key)
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a single entry from cache
+        """
+        shard = self._shard_for(key)
+        with shard.lock:
+            shard.remove(key)
+        if self._snapshot is not None:
+            self._snapshot.discard(key)
+        if self.l2 is not None:
+            self.l2.delete(self._l2_key(key))
+
+    def invalidate_tag(self, *tags: str) -> None:
+        """
+        Invalidate every entry stored under any of the tags
+        """
+        for tag in tags:
+            self.tag_versions.bump(tag)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+    ) -> T:
+        """
+        Read-through lookup: return the cached value or load, cache and return it.
+        Concurrent misses for the same key share one load; None results are not cached.
+
+        A stale entry is returned immediately while one background task reloads
+        it; if that reload fails the stale value keeps being served until the
+        stale window ends. Hot entries are reloaded shortly before going stale.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument coroutine function producing the value
+            ttl: Soft time to live in seconds (defaults to the cache TTL)
+            tags: Invalidation tags for the entry
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        tags = tuple(tags)
+        entry = self._lookup(key, allow_stale=True)
+        if entry is not None:
+            now = time.time()
+            if entry.expires_at <= now or self._should_refresh_ahead(entry, now):
+                self._refresh_in_background(key, loader, ttl, tags)
+            return entry.data
+
+        return await self._get_flight().do(key, functools.partial(self._load, key, loader, ttl, tags))
+
+    def _get_flight(self) -> "SingleFlight":
+        if self._flight is None:
+            self._flight = SingleFlight(name=f"single_flight:{self.name}")
+        return self._flight
+
+    def _should_refresh_ahead(self, entry: _CacheEntry, now: float) -> bool:
+        """
+        Whether a fresh entry is read often enough and close enough to its
+        soft expiry to be reloaded before anyone sees it stale
+        """
+        if self.refresh_ahead <= 0 or entry.hits < self.refresh_ahead_min_hits:
+            return False
+        return entry.expires_at - now < (entry.expires_at - entry.timestamp) * self.refresh_ahead
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: Optional[int],
+        tags: Tuple[str, ...],
+    ) -> None:
+        if key in self._refreshing:
+            return
+        # Outside the caller's context, so the refresh is not bound to the deadline of the request that found the entry stale
+        self._refreshing[key] = asyncio.get_running_loop().create_task(
+            self._refresh(key, loader, ttl, tags), context=contextvars.Context()
+        )
+
+    async def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        ttl: Optional[int],
+        tags: Tuple[str, ...],
+    ) -> None:
+        try:
+            await self._get_flight().do(key, functools.partial(self._load, key, loader, ttl, tags))
+            self._refreshes += 1
+        except Exception as e:
+            # Keep serving the stale value until the stale window ends
+            self._refresh_errors += 1
+            logger.warning(f"Background refresh failed for cache {self.name}: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[T]], ttl: Optional[int], tags: Tuple[str, ...]) -> T:
+        # Snapshot tag tokens before reading so an invalidation during the read wins
+        tokens = self.tag_versions.snapshot(tags)
+        value = await loader()
+        if value is not None:
+            self.set(key, value, ttl=ttl, tags=tokens)
+        return value
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Remove all local entries whose key starts with the prefix
+
+        Returns:
+            Number of removed entries
+        """
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                keys_to_remove = [key for key in shard.entries if key.startswith(prefix)]
+                for key in keys_to_remove:
+                    shard.remove(key)
+                removed += len(keys_to_remove)
+
+        if self._snapshot is not None:
+            self._snapshot.discard_prefix(prefix)
+        if self.l2 is not None:
+            self.l2.clear(prefix=self._l2_key(prefix))
+        return removed
 
     def clear(self) -> None:
         """
         Clear all cache
         """
-        self.cache.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.bytes = 0
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+        if self.l2 is not None:
+            self.l2.clear(prefix=f"{self.name}:")
         logger.debug("Cache cleared")
 
-    def remove_expired(self) -> None:
+    def remove_expired(self) -> int:
         """
         Remove all expired cache entries
+
+        Returns:
+            Number of removed entries
         """
         current_time = time.time()
-        keys_to_remove = [
-            key for key, data in self.cache.items()
-            if current_time - data["timestamp"] >= self.ttl
-        ]
-        for key in keys_to_remove:
-            del self.cache[key]
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                keys_to_remove = [
+                    key for key, entry in shard.entries.items()
+                    if entry.stale_until <= current_time
+                ]
+                for key in keys_to_remove:
+                    shard.remove(key)
+                shard.expirations += len(keys_to_remove)
+                removed += len(keys_to_remove)
+
+        if removed:
+            logger.debug("Removed %d expired entries from cache %s", removed, self.name)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the cache counters
+
+        Returns:
+            Dictionary with sizes, hit/miss/eviction counters and average latencies
+        """
+        totals = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "expirations": 0, "invalidations": 0,
+            "evictions": 0, "rejections": 0, "sets": 0,
+        }
+        entries = 0
+        size_bytes = 0
+        for shard in self._shards:
+            with shard.lock:
+                for counter in totals:
+                    totals[counter] += getattr(shard, counter)
+                entries += len(shard.entries)
+                size_bytes += shard.bytes
 
-        if keys_to_remove:
-            logger.debug(f"Removed {len(keys_to_remove)} expired cache entries")
+        lookups = totals["hits"] + totals["stale_hits"] + totals["misses"]
+        result = {
+            "type": "cache",
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "entries": entries,
+            "bytes": size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **totals,
+            "refreshes": self._refreshes,
+            "refresh_errors": self._refresh_errors,
+            "refreshing": len(self._refreshing),
+            "snapshot_pending": len(self._snapshot) if self._snapshot is not None else 0,
+            "hit_rate": (totals["hits"] + totals["stale_hits"]) / lookups if lookups else 0.0,
+            "avg_get_us": self._get_ns / self._get_calls / 1000 if self._get_calls else 0.0,
+            "avg_set_us": self._set_ns / self._set_calls / 1000 if self._set_calls else 0.0,
+        }
+        if self.l2 is not None:
+            result["l2"] = self.l2.stats()
+        return result
+
+async def _sweep_caches(interval: float) -> None:
+    """
+    Periodically remove expired entries from every live cache
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for cache in cache_registry.caches():
+            try:
+                cache.remove_expired()
+            except Exception as e:
+                logger.error(f"Error sweeping cache: {str(e)}")
 
-def cached(cache: Cache, key_func: Optional[Callable] = None):
+def start_cache_sweeper(interval: float = settings.CACHE_SWEEP_INTERVAL) -> asyncio.Task:
+    """
+    Start the background task that evicts expired cache entries
+
+    Args:
+        interval: Seconds between sweeps
+
+    Returns:
+        Sweeper task
+    """
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.get_running_loop().create_task(_sweep_caches(interval))
+        logger.info(f"Cache sweeper started with interval {interval}s")
+    return _sweeper_task
+
+async def stop_cache_sweeper() -> None:
+    """
+    Stop the background cache sweeper task
+    """
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+        logger.info("Cache sweeper stopped")
+
+def snapshot_path(cache: Cache) -> str:
+    """
+    Snapshot file path of a persistent cache
+    """
+    return os.path.join(settings.CACHE_SNAPSHOT_DIR, f"{cache.name}.snapshot")
+
+def restore_cache_snapshots() -> int:
+    """
+    Lazily restore every persistent cache from its snapshot, if snapshots are enabled
+
+    Returns:
+        Number of restorable entries
+    """
+    if not settings.CACHE_SNAPSHOT_DIR:
+        return 0
+
+    restored = 0
+    for cache in cache_registry.caches():
+        if cache.persist:
+            try:
+                restored += cache.restore_snapshot(snapshot_path(cache))
+            except Exception as e:
+                logger.error(f"Error restoring cache {cache.name}: {str(e)}")
+    return restored
+
+def save_cache_snapshots() -> int:
+    """
+    Write a snapshot of every persistent cache, if snapshots are enabled
+
+    Returns:
+        Number of entries written
+    """
+    if not settings.CACHE_SNAPSHOT_DIR:
+        return 0
+
+    saved = 0
+    for cache in cache_registry.caches():
+        if cache.persist:
+            try:
+                saved += cache.save_snapshot(snapshot_path(cache))
+            except Exception as e:
+                logger.error(f"Error saving snapshot of cache {cache.name}: {str(e)}")
+    return saved
+
+async def _snapshot_caches(interval: float) -> None:
+    """
+    Periodically snapshot persistent caches without blocking the event loop
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        await loop.run_in_executor(None, save_cache_snapshots)
+
+def start_cache_snapshots(interval: float = settings.CACHE_SNAPSHOT_INTERVAL) -> Optional[asyncio.Task]:
+    """
+    Restore persistent caches and start the background task that snapshots them
+
+    Args:
+        interval: Seconds between snapshots
+
+    Returns:
+        Snapshot task, or None if snapshots are disabled
+    """
+    global _snapshot_task
+    if not settings.CACHE_SNAPSHOT_DIR:
+        return None
+
+    if _snapshot_task is None or _snapshot_task.done():
+        restore_cache_snapshots()
+        _snapshot_task = asyncio.get_running_loop().create_task(_snapshot_caches(interval))
+        logger.info(f"Cache snapshots enabled in {settings.CACHE_SNAPSHOT_DIR} every {interval}s")
+    return _snapshot_task
+
+async def stop_cache_snapshots() -> None:
+    """
+    Stop the background snapshot task and write a final snapshot
+    """
+    global _snapshot_task
+    if _snapshot_task is None:
+        return
+
+    _snapshot_task.cancel()
+    try:
+        await _snapshot_task
+    except asyncio.CancelledError:
+        pass
+    _snapshot_task = None
+
+    save_cache_snapshots()
+    logger.info("Cache snapshots saved")
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight call.
+
+    The first caller starts the call as a task; callers arriving while it
+    is running await the same task and share its result or exception.
+    Nothing is remembered once the call completes.
+
+    The task runs in an empty context, so it is bound to no caller's request
+    deadline and is not cancelled with any caller. Each caller instead waits
+    for it only until its own deadline.
+    """
+    def __init__(self, name: Optional[str] = None):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.name = cache_registry.register(name, self)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the coalescing counters
+        """
+        return {
+            "type": "single_flight",
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+        }
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func once for all concurrent callers with the same key
+
+        Args:
+            key: Key identifying the call
+            func: Zero-argument coroutine function performing the call
+
+        Returns:
+            Result of the shared call
+
+        Raises:
+            DeadlineExceededException: The caller's deadline passed before the call finished
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.get_running_loop().create_task(func(), context=contextvars.Context())
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+
+        # Shield the shared call so one cancelled or timed out caller does not cancel it for the others
+        left = deadline.remaining()
+        if left is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(left, 0))
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            self.timeouts += 1
+            raise DeadlineExceededException()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+def single_flight(key_func: Optional[Callable] = None):
+    """
+    Decorator coalescing concurrent calls with the same arguments
+
+    Args:
+        key_func: Function to generate the coalescing key from function arguments
+                  If None, the arguments themselves are used. A key of None runs
+                  the call on its own, in the caller's context.
+    """
+    def decorator(func: Callable[..., Awaitable[T]]):
+        flight = SingleFlight(name=f"single_flight:{func.__module__}.{func.__qualname__}")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if key_func:
+                key = key_func(*args, **kwargs)
+            else:
+                key = (args, tuple(sorted(kwargs.items())))
+            if key is None:
+                return await func(*args, **kwargs)
+            return await flight.do(key, lambda: func(*args, **kwargs))
+
+        wrapper.single_flight = flight
+        return wrapper
+    return decorator
+
+def cached(cache: Cache, key_func: Optional[Callable] = None, coalesce: bool = True):
     """
     Decorator for caching function results
 
     Args:
         cache: Cache instance to use
-        key_func: Function to generate cache key from function arguments
-                  If None, a hash of the arguments will be used
+        key_func: Function to generate cache key from function arguments, usually a KeyBuilder
+                  If None, a KeyBuilder over all arguments except self is used
+        coalesce: Share one in-flight call between concurrent misses for the same key
     """
     def decorator(func: Callable[..., Awaitable[T]]):
+        flight = SingleFlight(name=f"single_flight:{cache.name}:{func.__qualname__}")
+        make_key = key_func or KeyBuilder(f"{func.__module__}.{func.__qualname__}")
+        if isinstance(make_key, KeyBuilder):
+            make_key = make_key.for_function(func)
+
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                # Default to hash of arguments
-                args_str = str(args) + str(kwargs)
-                cache_key = hashlib.md5(args_str.encode()).hexdigest()
+            cache_key = make_key(*args, **kwargs)
 
             # Check cache
             cached_result = cache.get(cache_key)
             if cached_result is not None:
                 return cached_result
 
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            cache.set(cache_key, result)
-            return result
+            # Execute function and cache result. Errors are propagated to
+            # every coalesced caller but never cached.
+            async def load():
+                result = await func(*args, **kwargs)
+                cache.set(cache_key, result)
+                return result
+
+            if not coalesce:
+                return await load()
+            return await flight.do(cache_key, load)
+
+        wrapper.single_flight = flight
         return wrapper
     return decorator
 
 # Create global cache instances
-response_cache = Cache[Any](ttl=settings.CACHE_TTL)
+response_cache = Cache[Any](ttl=settings.CACHE_TTL, name="response", l2=get_shared_cache())
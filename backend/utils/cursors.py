@@ -0,0 +1,43 @@
+from typing import Tuple
+from datetime import datetime
+import base64
+import binascii
+import json
+
+# Bumped when the token layout changes, so old tokens are rejected instead of misread
+_CURSOR_VERSION = 1
+
+def encode_cursor(value: datetime, doc_id: str) -> str:
+    """
+    Build an opaque keyset pagination cursor
+
+    Args:
+        value: Sort field value (created_at or timestamp) of the last returned document
+        doc_id: ID of the last returned document, the tie-breaker for equal values
+
+    Returns:
+        URL-safe token
+    """
+    payload = json.dumps({"v": _CURSOR_VERSION, "t": value.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    """
+    Read a cursor built by encode_cursor
+
+    Args:
+        token: Cursor token
+
+    Returns:
+        Sort field value and document ID to start after
+
+    Raises:
+        ValueError: The token is not a valid cursor
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if payload.get("v") != _CURSOR_VERSION or not isinstance(payload.get("id"), str):
+            raise ValueError("unsupported cursor")
+        return datetime.fromisoformat(payload["t"]), payload["id"]
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token[:64]}") from e
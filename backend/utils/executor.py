@@ -0,0 +1,141 @@
+from typing import Any, Callable, Dict, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import logging
+from ..config.settings import settings
+from .caching import cache_registry
+
+# Logger for blocking call executors
+logger = logging.getLogger("executor")
+
+R = TypeVar('R')
+
+class BlockingExecutor:
+    """
+    Dedicated thread pool for blocking calls made from async code.
+
+    The Firestore SDK is synchronous; calling it on the event loop stalls
+    every other request in the worker for the length of the RPC. Calls are
+    run here instead, in a copy of the caller's context so that contextvars
+    such as the request deadline are visible to them, and the time each call
+    waited for a free thread and ran is recorded for /debug/caches.
+
+    With workers=0 calls run inline on the event loop, as before the
+    executor existed.
+    """
+    def __init__(self, workers: int, name: str, slow_call_ms: float = 1000.0):
+        self.workers = workers
+        self.thread_name_prefix = name.replace(".", "-")
+        self.slow_call_ms = slow_call_ms
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.slow_calls = 0
+        self._wait_ns = 0
+        self._max_wait_ns = 0
+        self._run_ns = 0
+        self.name = cache_registry.register(name, self)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.thread_name_prefix)
+        return self._executor
+
+    async def run(self, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Run a blocking function in the pool
+
+        Args:
+            func: Function to call
+            args: Positional arguments
+            kwargs: Keyword arguments
+
+        Returns:
+            The function's result; its exceptions are raised here
+        """
+        if self.workers <= 0:
+            return func(*args, **kwargs)
+
+        self.submitted += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        submitted = time.perf_counter_ns()
+        context = contextvars.copy_context()
+
+        def call() -> R:
+            started = time.perf_counter_ns()
+            wait_ns = started - submitted
+            with self._lock:
+                self.running += 1
+                self._wait_ns += wait_ns
+                self._max_wait_ns = max(self._max_wait_ns, wait_ns)
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                run_ns = time.perf_counter_ns() - started
+                slow = run_ns > self.slow_call_ms * 1e6
+                with self._lock:
+                    self.running -= 1
+                    self._run_ns += run_ns
+                    self.slow_calls += slow
+                if slow:
+                    logger.warning(f"Slow blocking call in {self.name}: {getattr(func, '__qualname__', func)} took {run_ns / 1e6:.0f}ms")
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+            self.completed += 1
+            return result
+
+        except Exception:
+            self.errors += 1
+            raise
+
+        finally:
+            self.in_flight -= 1
+
+    async def stop(self) -> None:
+        """
+        Wait for the running calls and stop the threads; the next call starts them again
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+            logger.info(f"Executor {self.name} stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the pool load and call timings
+        """
+        started = self.submitted - (self.in_flight - self.running)
+        finished = self.completed + self.errors
+        return {
+            "type": "thread_pool",
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "running": self.running,
+            "queued": self.in_flight - self.running,
+            "peak_in_flight": self.peak_in_flight,
+            "saturation": self.running / self.workers if self.workers > 0 else 0.0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "errors": self.errors,
+            "slow_calls": self.slow_calls,
+            "avg_wait_ms": self._wait_ns / started / 1e6 if started else 0.0,
+            "max_wait_ms": self._max_wait_ns / 1e6,
+            "avg_run_ms": self._run_ns / finished / 1e6 if finished else 0.0,
+        }
+
+# Thread pool for Firestore SDK calls made by the repositories
+firestore_executor = BlockingExecutor(settings.FIRESTORE_EXECUTOR_WORKERS, name="firestore.executor")
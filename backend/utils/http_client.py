@@ -0,0 +1,46 @@
+from typing import Optional
+import logging
+import httpx
+from ..config.settings import settings
+
+# Logger for outgoing HTTP
+logger = logging.getLogger("http_client")
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide HTTP client for outgoing requests
+
+    One client is shared so that every caller draws from the same connection
+    pool and reuses kept-alive connections. Per-request timeouts override the
+    defaults set here.
+
+    Returns:
+        Shared async HTTP client
+    """
+    global _http_client
+
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        )
+        logger.info(f"HTTP client created with up to {settings.HTTP_MAX_CONNECTIONS} connections")
+
+    return _http_client
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client and its pooled connections
+    """
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("HTTP client closed")
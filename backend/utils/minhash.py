@@ -0,0 +1,163 @@
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict
+import hashlib
+import random
+import struct
+import threading
+
+# Mersenne prime modulus of the universal hash functions that simulate permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+Signature = Tuple[int, ...]
+
+def shingles(text: str, size: int) -> Set[str]:
+    """
+    Word shingles of a normalized text, case-insensitive
+
+    Args:
+        text: Normalized text (single spaces between words)
+        size: Words per shingle
+
+    Returns:
+        Set of shingles; a text shorter than one shingle is its own only shingle
+    """
+    words = text.casefold().split(" ")
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[start:start + size]) for start in range(len(words) - size + 1)}
+
+def _hash_shingle(shingle: str) -> int:
+    return struct.unpack("<I", hashlib.blake2b(shingle.encode("utf-8", "surrogatepass"), digest_size=4).digest())[0]
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Choose the LSH banding for a similarity threshold
+
+    Two signatures become candidates when all rows of at least one band agree,
+    which happens with probability 1 - (1 - s^rows)^bands for Jaccard
+    similarity s. The banding whose S-curve midpoint (1/bands)^(1/rows) is
+    closest to just below the threshold is chosen, so few pairs above the
+    threshold are missed; candidates are then checked against the threshold.
+
+    Args:
+        num_perm: Signature length
+        threshold: Jaccard similarity threshold
+
+    Returns:
+        Number of bands and rows per band
+    """
+    target = threshold * 0.9
+    best: Optional[Tuple[float, int, int]] = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        distance = abs(midpoint - target)
+        if best is None or distance < best[0]:
+            best = (distance, bands, rows)
+    return best[1], best[2]
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets.
+
+    Each of num_perm universal hash functions (a * x + b) mod p stands in for
+    a random permutation; the fraction of equal positions in two signatures
+    estimates the Jaccard similarity of the sets.
+    """
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, items: Iterable[str]) -> Signature:
+        hashes = [_hash_shingle(item) for item in items]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._params
+        )
+
+def similarity(first: Signature, second: Signature) -> float:
+    """
+    Estimated Jaccard similarity of the sets behind two signatures
+    """
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+class MinHashLSH:
+    """
+    LSH index of MinHash signatures, bounded to max_entries in LRU order.
+
+    Thread-safe; query() returns the most similar indexed key whose estimated
+    similarity reaches the threshold.
+    """
+    def __init__(self, num_perm: int, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self._tables: List[Dict[Signature, Set[Hashable]]] = [{} for _ in range(self.bands)]
+        self._signatures: "OrderedDict[Hashable, Signature]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: Signature):
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def add(self, key: Hashable, signature: Signature) -> None:
+        """
+        Index a signature under a key, evicting the least recently used key if full
+        """
+        with self._lock:
+            if key in self._signatures:
+                self._signatures.move_to_end(key)
+                return
+            while len(self._signatures) >= self.max_entries:
+                self._remove(next(iter(self._signatures)))
+                self.evictions += 1
+            self._signatures[key] = signature
+            for band, band_key in self._band_keys(signature):
+                self._tables[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._tables[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._tables[band][band_key]
+
+    def query(self, signature: Signature) -> Optional[Tuple[Hashable, float]]:
+        """
+        Find the indexed key most similar to a signature
+
+        Returns:
+            Key and estimated similarity, or None if no key reaches the threshold
+        """
+        with self._lock:
+            candidates: Set[Hashable] = set()
+            for band, band_key in self._band_keys(signature):
+                candidates.update(self._tables[band].get(band_key, ()))
+
+            best: Optional[Tuple[Hashable, float]] = None
+            for key in candidates:
+                score = similarity(signature, self._signatures[key])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (key, score)
+            if best is not None:
+                self._signatures.move_to_end(best[0])
+            return best
@@ -0,0 +1,340 @@
+from typing import Any, Dict, Optional, Tuple
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import logging
+from ..config.settings import settings
+
+# Logger for shared cache operations
+logger = logging.getLogger("shared_cache")
+
+# File header: magic, format version, slot size, slot count, ways per bucket
+_HEADER = struct.Struct("<4sHIIH")
+_HEADER_SIZE = 64
+_MAGIC = b"PESC"
+_FORMAT_VERSION = 1
+
+# Slot header: key hash, expiration time, last access time, value length, key length
+_SLOT = struct.Struct("<QddIH")
+
+# Number of in-process lock stripes guarding buckets between threads
+_LOCK_STRIPES = 64
+
+class SharedMemoryCache:
+    """
+    Host-wide cache shared by all worker processes through a memory-mapped file.
+
+    The file is a fixed-size, set-associative hash table: a key hashes to one
+    bucket of `ways` fixed-size slots. Values are pickled into the slot together
+    with the key and their expiration time. A full bucket evicts its expired or
+    least recently accessed slot. Buckets are locked with byte-range file locks
+    between processes and with striped thread locks inside a process.
+    """
+    def __init__(self, path: str, slots: int, slot_size: int, ways: int = 8):
+        if slot_size <= _SLOT.size:
+            raise ValueError(f"Slot size must be larger than {_SLOT.size} bytes")
+
+        self.path = path
+        self.ways = max(1, ways)
+        self.buckets = max(1, slots // self.ways)
+        self.slot_size = slot_size
+        self.slot_count = self.buckets * self.ways
+        self.size = _HEADER_SIZE + self.slot_count * self.slot_size
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.rejected = 0
+
+        self._thread_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._fd = self._open_file()
+        self._mmap = mmap.mmap(self._fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+
+    def _open_file(self) -> int:
+        """
+        Open the table, replacing the file unless another process already laid
+        it out with the same geometry
+
+        A file of another geometry is never truncated or resized in place:
+        processes still mapping it would get SIGBUS past its new end. A new
+        file is laid out next to it and renamed over it instead, and those
+        processes keep using the old one until they restart.
+        """
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, self.slot_size, self.slot_count, self.ways)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                stat = os.fstat(fd)
+                # Unless another process replaced the file while this one waited for the lock
+                if stat.st_ino == os.stat(self.path).st_ino:
+                    if stat.st_size == self.size and os.pread(fd, _HEADER.size, 0) == header:
+                        return fd
+                    self._replace_file(header)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _replace_file(self, header: bytes) -> None:
+        """
+        Atomically replace the file with an empty table of this geometry
+        """
+        logger.info(f"Initializing shared cache at {self.path} ({self.size} bytes)")
+        fd, temp_path = tempfile.mkstemp(prefix=".shared-cache-", dir=os.path.dirname(self.path) or ".")
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, header, 0)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        finally:
+            os.close(fd)
+
+    def _bucket_range(self, key_hash: int) -> Tuple[int, int]:
+        bucket = key_hash % self.buckets
+        start = _HEADER_SIZE + bucket * self.ways * self.slot_size
+        return bucket, start
+
+    def _lock(self, bucket: int, start: int) -> threading.Lock:
+        thread_lock = self._thread_locks[bucket % _LOCK_STRIPES]
+        thread_lock.acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.ways * self.slot_size, start)
+        return thread_lock
+
+    def _unlock(self, thread_lock: threading.Lock, start: int) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, self.ways * self.slot_size, start)
+        thread_lock.release()
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # Zero marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _find(self, start: int, key_hash: int, key: bytes) -> Optional[int]:
+        for way in range(self.ways):
+            offset = start + way * self.slot_size
+            slot_hash, _, _, _, key_len = _SLOT.unpack_from(self._mmap, offset)
+            if slot_hash != key_hash or key_len != len(key):
+                continue
+            key_offset = offset + _SLOT.size
+            if self._mmap[key_offset:key_offset + key_len] == key:
+                return offset
+        return None
+
+    def _clear_slot(self, offset: int) -> None:
+        _SLOT.pack_into(self._mmap, offset, 0, 0.0, 0.0, 0, 0)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Get value from the shared cache
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of value and its expiration time, or None if missing or expired
+        """
+        key_bytes = key.encode()
+        key_hash = self._hash(key_bytes)
+        bucket, start = self._bucket_range(key_hash)
+        now = time.time()
+
+        lock = self._lock(bucket, start)
+        try:
+            offset = self._find(start, key_hash, key_bytes)
+            if offset is None:
+                self.misses += 1
+                return None
+
+            _, expires_at, _, value_len, key_len = _SLOT.unpack_from(self._mmap, offset)
+            if expires_at <= now:
+                self._clear_slot(offset)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            struct.pack_into("<d", self._mmap, offset + 16, now)
+            value_offset = offset + _SLOT.size + key_len
+            payload = self._mmap[value_offset:value_offset + value_len]
+        finally:
+            self._unlock(lock, start)
+
+        try:
+            value = pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable shared cache entry: {str(e)}")
+            self.delete(key)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value, expires_at
+
+    def set(self, key: str, data: Any, ttl: float) -> bool:
+        """
+        Store value in the shared cache
+
+        Args:
+            key: Cache key
+            data: Picklable value
+            ttl: Time to live in seconds
+
+        Returns:
+            True if the value was stored, False if it does not fit in a slot
+        """
+        key_bytes = key.encode()
+        try:
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Value for key {key} cannot be shared: {str(e)}")
+            self.rejected += 1
+            return False
+
+        if _SLOT.size + len(key_bytes) + len(payload) > self.slot_size or len(key_bytes) > 0xFFFF:
+            self.rejected += 1
+            return False
+
+        key_hash = self._hash(key_bytes)
+        bucket, start = self._bucket_range(key_hash)
+        now = time.time()
+
+        lock = self._lock(bucket, start)
+        try:
+            offset = self._find(start, key_hash, key_bytes)
+            if offset is None:
+                offset = self._choose_victim(start, now)
+
+            _SLOT.pack_into(self._mmap, offset, key_hash, now + ttl, now, len(payload), len(key_bytes))
+            key_offset = offset + _SLOT.size
+            self._mmap[key_offset:key_offset + len(key_bytes)] = key_bytes
+            value_offset = key_offset + len(key_bytes)
+            self._mmap[value_offset:value_offset + len(payload)] = payload
+            return True
+        finally:
+            self._unlock(lock, start)
+
+    def _choose_victim(self, start: int, now: float) -> int:
+        """
+        Pick an empty, expired or least recently accessed slot in the bucket.
+        Must be called with the bucket locked.
+        """
+        victim_offset = start
+        victim_access = None
+        for way in range(self.ways):
+            offset = start + way * self.slot_size
+            slot_hash, expires_at, last_access, _, _ = _SLOT.unpack_from(self._mmap, offset)
+            if slot_hash == 0:
+                return offset
+            if expires_at <= now:
+                self.expirations += 1
+                return offset
+            if victim_access is None or last_access < victim_access:
+                victim_offset = offset
+                victim_access = last_access
+
+        self.evictions += 1
+        return victim_offset
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a single entry from the shared cache
+        """
+        key_bytes = key.encode()
+        key_hash = self._hash(key_bytes)
+        bucket, start = self._bucket_range(key_hash)
+
+        lock = self._lock(bucket, start)
+        try:
+            offset = self._find(start, key_hash, key_bytes)
+            if offset is not None:
+                self._clear_slot(offset)
+        finally:
+            self._unlock(lock, start)
+
+    def clear(self, prefix: Optional[str] = None) -> None:
+        """
+        Remove entries from the shared cache
+
+        Args:
+            prefix: Only remove keys starting with this prefix (all keys if None)
+        """
+        prefix_bytes = prefix.encode() if prefix else b""
+        for bucket in range(self.buckets):
+            start = _HEADER_SIZE + bucket * self.ways * self.slot_size
+            lock = self._lock(bucket, start)
+            try:
+                for way in range(self.ways):
+                    offset = start + way * self.slot_size
+                    if prefix_bytes:
+                        key_offset = offset + _SLOT.size
+                        if self._mmap[key_offset:key_offset + len(prefix_bytes)] != prefix_bytes:
+                            continue
+                    self._clear_slot(offset)
+            finally:
+                self._unlock(lock, start)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of this process's view of the shared cache counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "type": "shared_cache",
+            "path": self.path,
+            "slots": self.slot_count,
+            "slot_size": self.slot_size,
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "rejections": self.rejected,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """
+        Unmap the shared file
+        """
+        self._mmap.close()
+        os.close(self._fd)
+
+_shared_cache: Optional[SharedMemoryCache] = None
+
+def _default_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "prompt-enhancer-cache")
+
+def get_shared_cache() -> Optional[SharedMemoryCache]:
+    """
+    Get the host-wide shared cache if it is enabled in settings
+
+    Returns:
+        Shared cache instance or None
+    """
+    global _shared_cache
+
+    if not settings.CACHE_L2_ENABLED:
+        return None
+
+    if _shared_cache is None:
+        try:
+            _shared_cache = SharedMemoryCache(
+                path=settings.CACHE_L2_PATH or _default_path(),
+                slots=settings.CACHE_L2_SLOTS,
+                slot_size=settings.CACHE_L2_SLOT_SIZE,
+                ways=settings.CACHE_L2_WAYS,
+            )
+        except Exception as e:
+            logger.error(f"Error opening shared cache, continuing without it: {str(e)}")
+            return None
+
+    return _shared_cache
@@ -0,0 +1,24 @@
+from typing import Any, Dict, Optional
+from firebase_admin import firestore
+
+def stored_document(data: Dict[str, Any], write_result: Any, doc_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the document Firestore stored from the data written and the write's result
+
+    SERVER_TIMESTAMP fields are set to the commit time, which is the
+    update_time of the WriteResult, so the stored values are known without
+    reading the document back.
+
+    Args:
+        data: Data passed to set() or update()
+        write_result: WriteResult returned by the write
+        doc_id: Document ID to add as "id"
+
+    Returns:
+        The stored fields, with server timestamps resolved
+    """
+    update_time = write_result.update_time
+    stored = {name: update_time if value is firestore.SERVER_TIMESTAMP else value for name, value in data.items()}
+    if doc_id is not None:
+        stored["id"] = doc_id
+    return stored